@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Measure the memory allocated to merge a record into the inferred schema,
+and the memory the schema takes.
+
+usage: python benchmarks/bench_alloc.py [--records N] [--width N]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+import getschema
+from getschema import lattice
+
+
+def _wide(width, i):
+    return {"col%d" % k: (str(i) if k % 2 else i + 0.5) for k in range(width)}
+
+
+def _nested(width, i):
+    record = {"id": i}
+    for level in range(width // 10):
+        record = {"level": level, "name": "n%d" % i, "child": record}
+    return record
+
+
+def _arrays(width, i):
+    return {"tags": ["t%d" % k for k in range(width)],
+            "items": [{"id": k, "price": "%d.5" % k} for k in range(width)]}
+
+
+def _size(root):
+    """Size of the nodes or dicts and lists of a schema, without the strings
+    they share with the records
+    """
+    size = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        size += sys.getsizeof(obj)
+        if type(obj) is dict:
+            stack.extend(v for v in obj.values() if type(v) is not str)
+        elif type(obj) is list:
+            stack.extend(v for v in obj if type(v) is not str)
+        elif type(obj) is lattice.Node:
+            stack.extend(v for v in (obj.properties, obj.items)
+                         if v is not None)
+    return size
+
+
+def _measure(name, records, array_items):
+    acc = getschema.SchemaAccumulator(array_items=array_items)
+    acc.add(records[0])
+    start = time.perf_counter()
+    acc.add_many(records[1:])
+    elapsed = time.perf_counter() - start
+
+    # Peak of the memory allocated while merging each record, i.e. the
+    # garbage made per record once the schema has settled
+    acc = getschema.SchemaAccumulator(array_items=array_items)
+    acc.add(records[0])
+    tracemalloc.start()
+    peaks = []
+    for record in records[1:]:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        acc.add(record)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+
+    tracemalloc.stop()
+    print("%-7s array_items=%-5s %9.0f records/s  "
+          "peak per record: %7.0f bytes (max %d)  "
+          "schema: %d bytes as nodes, %d as dicts" %
+          (name, array_items, (len(records) - 1) / elapsed,
+           sum(peaks) / len(peaks), max(peaks), _size(acc._root),
+           _size(acc.schema)))
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_alloc")
+    parser.add_argument("--records", "-r", default=2000, type=int)
+    parser.add_argument("--width", "-w", default=200, type=int)
+    args = parser.parse_args()
+
+    for name, make in (("wide", _wide), ("nested", _nested),
+                       ("arrays", _arrays)):
+        records = [make(args.width, i) for i in range(args.records)]
+        for array_items in (1, None):
+            _measure(name, records, array_items)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Measure the inference on long arrays with different array_items.
+
+usage: python benchmarks/bench_arrays.py [--items N] [--records N]
+"""
+import argparse
+import time
+
+import getschema
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_arrays")
+    parser.add_argument("--items", "-n", default=10000, type=int)
+    parser.add_argument("--records", "-r", default=20, type=int)
+    args = parser.parse_args()
+    n = args.items
+
+    shapes = {
+        "integers": lambda i: list(range(1, n + 1)),
+        "widening": lambda i: list(range(1, n)) + [1.5],
+        "early string": lambda i: ["a"] + list(range(1, n)),
+        "objects": lambda i: [{"id": k, "name": "n%d" % k} for k in range(n)],
+    }
+    for name, make in shapes.items():
+        records = [{"values": make(i)} for i in range(args.records)]
+        for array_items in (1, 100, None):
+            start = time.perf_counter()
+            schema = getschema.infer_schema(records, array_items=array_items)
+            elapsed = time.perf_counter() - start
+            items = schema["properties"]["values"]["items"]
+            print("%-13s array_items=%-5s %10.0f items/s  items type: %s" %
+                  (name, array_items, args.records * n / elapsed,
+                   items["type"][1]))
+
+
+if __name__ == "__main__":
+    main()
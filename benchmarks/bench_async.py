@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Compare converting the records of a paginated async source inline with
+afix_stream, which converts them on a pool while the next pages are fetched.
+
+The fake source downloads each page in small steps on the event loop, as
+reading an HTTP response does, so a download stalls while the loop is
+blocked by the conversion.
+
+usage: python benchmarks/bench_async.py [--pages N] [--page-size N]
+                                        [--latency SECONDS] [--prefetch N]
+"""
+import argparse
+import asyncio
+import time
+
+import getschema
+
+STEPS = 20
+
+
+def _record(i):
+    return {
+        "id": str(i),
+        "name": "name %d" % i,
+        "price": "%d.5" % i,
+        "created_at": "2021-06-04T09:00:00",
+        "active": "true",
+        "nested": {"a": str(i), "b": [str(i), str(i + 1)]},
+    }
+
+
+async def _download(page, page_size, latency):
+    for _ in range(STEPS):
+        await asyncio.sleep(latency / STEPS)
+    start = page * page_size
+    return [_record(i) for i in range(start, start + page_size)]
+
+
+async def source(pages, page_size, latency, prefetch):
+    """Yield the records of the pages, downloading up to prefetch pages
+    concurrently
+    """
+    tasks = []
+    next_page = 0
+    while next_page < pages or tasks:
+        while next_page < pages and len(tasks) < prefetch:
+            tasks.append(asyncio.ensure_future(
+                _download(next_page, page_size, latency)))
+            next_page += 1
+        for record in await tasks.pop(0):
+            yield record
+
+
+async def source_only(args):
+    async for _ in source(args.pages, args.page_size, args.latency,
+                          args.prefetch):
+        pass
+
+
+async def inline(args, schema):
+    fixer = getschema.compile_fixer(schema)
+    count = 0
+    async for record in source(args.pages, args.page_size, args.latency,
+                               args.prefetch):
+        fixer(record)
+        count += 1
+    return count
+
+
+async def stream(args, schema, executor, workers):
+    count = 0
+    async for _ in getschema.afix_stream(
+            source(args.pages, args.page_size, args.latency, args.prefetch),
+            schema, executor=executor, workers=workers):
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_async")
+    parser.add_argument("--pages", "-n", default=40, type=int)
+    parser.add_argument("--page-size", "-s", default=2000, type=int)
+    parser.add_argument("--latency", "-l", default=0.05, type=float)
+    parser.add_argument("--prefetch", "-p", default=4, type=int)
+    args = parser.parse_args()
+
+    schema = getschema.infer_schema([_record(i) for i in range(100)])
+    total = args.pages * args.page_size
+
+    start = time.perf_counter()
+    asyncio.run(source_only(args))
+    fetch = time.perf_counter() - start
+    print("fetch only:           %6.2f s" % fetch)
+
+    for name, run in (
+            ("inline", lambda: inline(args, schema)),
+            ("afix_stream thread", lambda: stream(args, schema, "thread", 1)),
+            ("afix_stream process",
+             lambda: stream(args, schema, "process", 2))):
+        start = time.perf_counter()
+        count = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+        assert(count == total)
+        print("%-20s  %6.2f s  %9.0f records/s" %
+              (name + ":", elapsed, total / elapsed))
+
+
+if __name__ == "__main__":
+    main()
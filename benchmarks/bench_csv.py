@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Compare the row by row and the columnar CSV inference.
+
+usage: python benchmarks/bench_csv.py [--records N] [--columns N]
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+import getschema
+from getschema.columnar import accumulate_csv
+
+
+def write_csv(filename, n, width):
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["col_%d" % c for c in range(width)])
+        for i in range(n):
+            row = []
+            for c in range(width):
+                kind = c % 5
+                if kind == 0:
+                    row.append(str(i % 1000 + 1))
+                elif kind == 1:
+                    row.append("%d.%d" % (i % 100, c))
+                elif kind == 2:
+                    row.append("0%04d" % (i % 100))
+                elif kind == 3:
+                    row.append("2021-06-%02d" % (i % 28 + 1))
+                else:
+                    row.append("label %d" % (i % 10))
+            writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_csv")
+    parser.add_argument("--records", "-n", default=50000, type=int)
+    parser.add_argument("--columns", "-c", default=50, type=int)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "records.csv")
+        write_csv(filename, args.records, args.columns)
+
+        start = time.perf_counter()
+        with open(filename) as f:
+            reader = csv.DictReader(f)
+            getschema.SchemaAccumulator().add_many(
+                dict(row) for row in reader).finalize()
+        row_wise = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(filename) as f:
+            accumulate_csv(f).finalize()
+        columnar = time.perf_counter() - start
+
+    print("row by row: %10.0f rec/s  columnar: %10.0f rec/s  (x%.1f)" %
+          (args.records / row_wise, args.records / columnar,
+           row_wise / columnar))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks of the date-time detection and parsing.
+
+usage: python benchmarks/bench_datetime.py [--values N]
+"""
+import argparse
+import re
+import time
+
+from dateutil import parser as dateutil_parser
+
+from getschema.dates import detect_format, is_datetime_str, parse_datetime
+
+
+def legacy_is_datetime(obj):
+    return re.match(
+        "(19|20)\\d\\d-(0[1-9]|1[012])-([1-9]|0[1-9]|[12][0-9]|3[01])",
+        obj) is not None
+
+
+def timeit(func, values):
+    start = time.perf_counter()
+    for value in values:
+        func(value)
+    return len(values) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_datetime")
+    parser.add_argument("--values", "-n", default=200000, type=int)
+    args = parser.parse_args()
+    n = args.values
+
+    samples = {
+        "dates": ["2021-06-%02d" % (i % 28 + 1) for i in range(n)],
+        "timestamps": ["2021-06-%02dT%02d:%02d:%02dZ" %
+                       (i % 28 + 1, i % 24, i % 60, (i // 60) % 60)
+                       for i in range(n)],
+        "non-dates": ["value %d" % i for i in range(n)],
+        "numbers": [str(i * 7) for i in range(n)],
+    }
+
+    print("is_datetime (rec/s)")
+    for name, values in samples.items():
+        old = timeit(legacy_is_datetime, values)
+        new = timeit(is_datetime_str, values)
+        print("  %-12s legacy: %10.0f  new: %10.0f  (x%.1f)" %
+              (name, old, new, new / old))
+
+    print("parse (rec/s)")
+    for name in ("dates", "timestamps"):
+        values = samples[name][:n // 10]
+        old = timeit(dateutil_parser.parse, values)
+        new = timeit(parse_datetime, values)
+        print("  %-12s dateutil: %10.0f  new: %10.0f  (x%.1f)" %
+              (name, old, new, new / old))
+
+    print("detect_format (rec/s)")
+    for name, values in samples.items():
+        print("  %-12s %10.0f" % (name, timeit(detect_format, values)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Measure the inference and fix_type on deeply nested documents.
+
+usage: python benchmarks/bench_deep.py [--depths N,N,...] [--records N]
+"""
+import argparse
+import time
+
+import getschema
+
+
+def _nested(depth, i):
+    record = {"id": str(i), "amount": "%d.5" % i}
+    for level in range(depth):
+        record = {"level": level, "child": record, "tags": [str(level)]}
+    return record
+
+
+def _measure(func, records):
+    start = time.perf_counter()
+    results = [func(r) for r in records]
+    return len(results) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_deep")
+    parser.add_argument("--depths", "-d", default="10,500,2000,10000")
+    parser.add_argument("--records", "-r", default=20, type=int)
+    args = parser.parse_args()
+
+    for depth in [int(d) for d in args.depths.split(",")]:
+        records = [_nested(depth, i) for i in range(args.records)]
+        start = time.perf_counter()
+        schema = getschema.infer_schema(records)
+        infer = args.records / (time.perf_counter() - start)
+        fix_type = _measure(lambda r: getschema.fix_type(r, schema), records)
+        # The compiled fixer calls itself once per level
+        try:
+            fixer = getschema.compile_fixer(schema)
+            compiled = "%8.1f" % _measure(fixer, records)
+        except RecursionError:
+            compiled = "%8s" % "n/a"
+        print("depth %-6d infer %8.1f  fix_type %8.1f  compile_fixer %s"
+              "  records/s" % (depth, infer, fix_type, compiled))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Measure how fix_file scales with the number of workers on NDJSON.
+
+usage: python benchmarks/bench_fix_file.py [--records N] [--max-workers N]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import getschema
+from getschema import jsonlib
+
+
+def write_ndjson(filename, n):
+    with open(filename, "w") as f:
+        for i in range(n):
+            record = {
+                "id": str(i),
+                "name": "name %d" % i,
+                "price": "%d.5" % i,
+                "created_at": "2021-06-04T09:00:00",
+                "active": "true",
+                "nested": {"a": str(i), "b": [str(i), str(i + 1)]},
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_fix_file")
+    parser.add_argument("--records", "-n", default=200000, type=int)
+    parser.add_argument("--max-workers", "-w", default=os.cpu_count(),
+                        type=int)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "records.ndjson")
+        output = os.path.join(tmp_dir, "output.ndjson")
+        write_ndjson(filename, args.records)
+        schema = getschema.infer_from_file(filename, "ndjson",
+                                           sample="head")
+
+        # With the same JSON library as getschema
+        start = time.perf_counter()
+        with open(filename) as f:
+            fixer = getschema.compile_fixer(schema)
+            with open(output, "w") as out:
+                for line in f:
+                    out.write(jsonlib.dumps(
+                        fixer(jsonlib.loads(line))) + "\n")
+        base = time.perf_counter() - start
+        print("record by record:      %10.0f rec/s" % (args.records / base))
+
+        workers = 1
+        while workers <= args.max_workers:
+            for ordered in (True, False):
+                start = time.perf_counter()
+                getschema.fix_file(filename, schema, output, workers=workers,
+                                   ordered=ordered)
+                elapsed = time.perf_counter() - start
+                print("workers: %3d %-9s %10.0f rec/s  speedup: x%.2f" %
+                      (workers, "ordered" if ordered else "unordered",
+                       args.records / elapsed, base / elapsed))
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Compare fix_type with compile_fixer and fix_types on wide and nested
+records, and fix_types with and without passthrough on records that already
+have the types.
+
+usage: python benchmarks/bench_fix_type.py [--records N]
+"""
+import argparse
+import time
+import tracemalloc
+
+import getschema
+
+
+def wide_record(i, width=200):
+    record = {}
+    for c in range(width):
+        kind = c % 4
+        if kind == 0:
+            record["int_%d" % c] = str(i + c + 1)
+        elif kind == 1:
+            record["num_%d" % c] = "%d.5" % (i + c)
+        elif kind == 2:
+            record["bool_%d" % c] = bool((i + c) % 2)
+        else:
+            record["str_%d" % c] = "value %d" % c
+    return record
+
+
+def nested_record(i, depth=4, fanout=3):
+    def build(level):
+        if level == depth:
+            return {"id": str(i), "value": "%d.25" % i,
+                    "updated": "2021-06-01T09:00:00"}
+        return {"node_%d" % n: build(level + 1) for n in range(fanout)} | {
+            "items": [str(i + k) for k in range(5)]}
+    return build(0)
+
+
+def run(name, records):
+    schema = getschema.infer_schema(records[:100])
+
+    # Keep the results in all cases as fix_types returns a list
+    start = time.perf_counter()
+    _ = [getschema.fix_type(record, schema) for record in records]
+    plain = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fixer = getschema.compile_fixer(schema)
+    _ = [fixer(record) for record in records]
+    compiled = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _ = getschema.fix_types(records, schema)
+    batch = time.perf_counter() - start
+
+    n = len(records)
+    print("%-8s fix_type: %9.0f rec/s  compile_fixer: %9.0f rec/s (x%.1f)  "
+          "fix_types: %9.0f rec/s (x%.1f)" %
+          (name, n / plain, n / compiled, plain / compiled, n / batch,
+           plain / batch))
+
+
+def _fix_types(records, schema, passthrough):
+    start = time.perf_counter()
+    getschema.fix_types(records, schema, passthrough=passthrough)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    _ = getschema.fix_types(records, schema, passthrough=passthrough)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run_typed(name, records):
+    schema = getschema.infer_schema(records[:100])
+    typed = getschema.fix_types(records, schema)
+    converted, converted_peak = _fix_types(typed, schema, False)
+    kept, kept_peak = _fix_types(typed, schema, True)
+    n = len(records)
+    print("%-8s typed records  fix_types: %9.0f rec/s (peak %5.1f MB)  "
+          "passthrough: %9.0f rec/s (peak %5.1f MB)" %
+          (name, n / converted, converted_peak / 1e6, n / kept,
+           kept_peak / 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_fix_type")
+    parser.add_argument("--records", "-n", default=2000, type=int)
+    args = parser.parse_args()
+    run("wide", [wide_record(i) for i in range(args.records)])
+    run("nested", [nested_record(i) for i in range(args.records)])
+    run_typed("wide", [wide_record(i) for i in range(args.records)])
+    run_typed("nested", [nested_record(i) for i in range(args.records)])
+
+
+if __name__ == "__main__":
+    main()
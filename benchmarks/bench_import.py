@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Measure the startup time of `import getschema` and of the CLI, and check
+that the heavy modules are only imported on the code paths that need them.
+
+Each run is a new interpreter. The import time is the cumulative time of
+getschema in `python -X importtime` (median of the runs), with the slowest
+modules it imports. The CLI time is the wall time of `getschema --help`
+less that of an empty interpreter.
+
+Exits with 1 if the import takes longer than --max-ms or a heavy module is
+imported, so that it can guard against regressions.
+
+usage: python benchmarks/bench_import.py [--runs N] [--top N] [--max-ms MS]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Imported only for YAML input, record_level, date-times that need
+# dateutil, afix_stream, the process pools, profiling, the compressed files
+# and the JSON backends
+HEAVY = ["yaml", "jsonpath_ng", "dateutil", "email.utils", "asyncio",
+         "concurrent.futures", "multiprocessing", "cProfile", "gzip", "bz2",
+         "lzma", "zstandard", "orjson", "ujson", "argparse"]
+
+
+def _env():
+    env = dict(os.environ)
+    # Measure with the compiled bytecode, as installed packages are
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def importtime():
+    """Return the cumulative microseconds of getschema and of the modules
+    imported by it in one import
+    """
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import getschema"],
+        check=True, stderr=subprocess.PIPE, text=True, env=_env()).stderr
+    # A module is listed after the ones it imports, which are indented more
+    times = {}
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("  "):
+            times[name.strip()] = int(cumulative)
+        elif name.strip() == "getschema":
+            times["getschema"] = int(cumulative)
+            return times
+        else:
+            # Imported at the start of the interpreter
+            times = {}
+    raise ValueError("getschema not found in the output of -X importtime")
+
+
+def wall_time(code, args=()):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code] + list(args), check=True,
+                   stdout=subprocess.DEVNULL, env=_env())
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_import")
+    parser.add_argument("--runs", "-n", default=10, type=int)
+    parser.add_argument("--top", default=10, type=int)
+    parser.add_argument("--max-ms", default=None, type=float)
+    args = parser.parse_args()
+
+    # Write the bytecode first
+    importtime()
+    runs = [importtime() for _ in range(args.runs)]
+    total = statistics.median(r["getschema"] for r in runs) / 1000
+    print("import getschema: %6.1f ms (median of %d)" % (total, args.runs))
+    names = set().union(*runs)
+    slowest = sorted(
+        ((statistics.median(r.get(name, 0) for r in runs), name)
+         for name in names if name != "getschema"), reverse=True)
+    for us, name in slowest[:args.top]:
+        print("  %6.1f ms  %s" % (us / 1000, name))
+
+    cli = "import sys; sys.argv[0] = 'getschema'; import getschema; " \
+        "getschema.main()"
+    empty = statistics.median(wall_time("pass") for _ in range(args.runs))
+    help_time = statistics.median(wall_time(cli, ["--help"])
+                                  for _ in range(args.runs))
+    print("getschema --help: %6.1f ms over an empty interpreter" %
+          ((help_time - empty) * 1000))
+
+    check = ("import sys, getschema; print(' '.join(m for m in %r "
+             "if m in sys.modules))" % HEAVY)
+    loaded = subprocess.run([sys.executable, "-c", check], check=True,
+                            stdout=subprocess.PIPE, text=True).stdout.split()
+    failed = False
+    if loaded:
+        print("heavy modules imported: %s" % ", ".join(loaded))
+        failed = True
+    if args.max_ms is not None and total > args.max_ms:
+        print("slower than %.1f ms" % args.max_ms)
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Compare the installed JSON backends (see getschema.jsonlib) on reading
+the records of an NDJSON file, inferring from it and converting it with
+fix_file, and check that they give the same results.
+
+usage: python benchmarks/bench_json.py [--records N]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import getschema
+from getschema import jsonlib, readers
+
+
+def _record(i):
+    return {
+        "id": i,
+        "name": "name %d" % i,
+        "price": "%d.5" % i,
+        "amount": i * 0.25,
+        "created_at": "2021-06-04T09:00:00",
+        "tags": ["a", "b", "c"],
+        "nested": {"a": i, "b": [i, i + 1], "c": {"d": str(i), "e": "é"}},
+    }
+
+
+def _time(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_json")
+    parser.add_argument("--records", "-n", default=200000, type=int)
+    args = parser.parse_args()
+
+    backends = []
+    for name in jsonlib.BACKENDS:
+        try:
+            jsonlib.use_backend(name)
+        except ImportError:
+            print("%-7s not installed" % name)
+            continue
+        backends.append(name)
+    default = jsonlib.use_backend()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "records.ndjson")
+        with open(filename, "w") as f:
+            for i in range(args.records):
+                f.write(json.dumps(_record(i)) + "\n")
+        output = os.path.join(tmp_dir, "output.ndjson")
+
+        results = {}
+        for name in backends:
+            jsonlib.use_backend(name)
+            with readers.map_file(filename) as mm:
+                read, records = _time(
+                    lambda: list(readers.iter_ndjson_mapped(mm)))
+            infer, schema = _time(
+                lambda: getschema.infer_from_file(filename, "ndjson"))
+            fix, _ = _time(
+                lambda: getschema.fix_file(filename, schema, output))
+            with open(output) as f:
+                fixed = f.read()
+            results[name] = (records, schema, fixed)
+            n = args.records
+            print("%-7s read: %9.0f rec/s  infer: %9.0f rec/s  "
+                  "fix_file: %9.0f rec/s" %
+                  (name, n / read, n / infer, n / fix))
+        jsonlib.use_backend(default)
+
+    first = results[backends[0]]
+    for name in backends[1:]:
+        assert repr(results[name]) == repr(first), "%s differs" % name
+    print("same results on %s (default: %s)" % (", ".join(backends), default))
+
+
+if __name__ == "__main__":
+    main()
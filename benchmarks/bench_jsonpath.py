@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Measure the record_level (jsonpath) extraction with and without the cache.
+
+usage: python benchmarks/bench_jsonpath.py [--records N]
+"""
+import argparse
+import time
+
+import jsonpath_ng
+
+import getschema
+from getschema.impl import _get_jsonpath
+
+
+def uncached_get_jsonpath(raw, path):
+    # What _get_jsonpath used to do for every record
+    jsonpath_expr = jsonpath_ng.parse(path)
+    return [match.value for match in jsonpath_expr.find(raw)]
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_jsonpath")
+    parser.add_argument("--records", "-n", default=1000000, type=int)
+    args = parser.parse_args()
+    n = args.records
+
+    records = [{"data": {"record": {"id": i, "name": "name %d" % i}}}
+               for i in range(n)]
+    for path in ("$.data.record", "$.data[*].record"):
+        # The uncached parse is slow. Extrapolate from a sample.
+        sample = records[:max(1, n // 100)]
+        start = time.perf_counter()
+        for record in sample:
+            uncached_get_jsonpath(record, path)
+        old = len(sample) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for record in records:
+            _get_jsonpath(record, path)
+        new = n / (time.perf_counter() - start)
+        print("%-18s uncached: %10.0f rec/s  cached: %10.0f rec/s  (x%.0f)" %
+              (path, old, new, new / old))
+
+    start = time.perf_counter()
+    getschema.infer_schema(records, record_level="$.data.record")
+    elapsed = time.perf_counter() - start
+    print("infer_schema with record_level: %.0f rec/s" % (n / elapsed))
+    print("cache: %s" % getschema.jsonpath_cache_info())
+
+
+if __name__ == "__main__":
+    main()
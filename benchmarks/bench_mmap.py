@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Compare reading the files through buffered text I/O with reading them
+from the memory-mapped files: the speed and the peak resident memory of the
+inference from JSON arrays, NDJSON and CSV.
+
+usage: python benchmarks/bench_mmap.py [--records N]
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from getschema import readers
+from getschema.columnar import accumulate_csv
+from getschema.impl import SchemaAccumulator
+
+
+def _record(i):
+    return {
+        "id": i,
+        "name": "name %d" % i,
+        "price": "%d.5" % i,
+        "created_at": "2021-06-04T09:00:00",
+        "nested": {"a": i, "b": [i, i + 1], "c": {"d": str(i)}},
+    }
+
+
+def write_files(tmp_dir, n):
+    with open(os.path.join(tmp_dir, "records.ndjson"), "w") as f:
+        for i in range(n):
+            f.write(json.dumps(_record(i)) + "\n")
+    with open(os.path.join(tmp_dir, "records.json"), "w") as f:
+        f.write("[\n")
+        for i in range(n):
+            f.write((",\n" if i else "") + json.dumps(_record(i)))
+        f.write("\n]\n")
+    with open(os.path.join(tmp_dir, "records.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "price", "created_at"])
+        for i in range(n):
+            writer.writerow([i, "name %d" % i, "%d.5" % i,
+                             "2021-06-04T09:00:00"])
+
+
+def _infer(fmt, reader, filename):
+    if reader == "text":
+        with open(filename) as f:
+            if fmt == "json":
+                return SchemaAccumulator().add_many(
+                    readers.iter_json_array(f))
+            if fmt == "ndjson":
+                return SchemaAccumulator().add_many(readers.iter_ndjson(f))
+            return accumulate_csv(f)
+    with readers.map_file(filename) as mm:
+        if fmt == "json":
+            return SchemaAccumulator().add_many(
+                readers.iter_json_array(readers.MappedTextReader(mm)))
+        if fmt == "ndjson":
+            return SchemaAccumulator().add_many(
+                readers.iter_ndjson_mapped(mm))
+        return accumulate_csv(readers.iter_mapped_text(mm))
+
+
+def measure(fmt, reader, filename):
+    """Run in a child process so that the peak memory is its own"""
+    start = time.perf_counter()
+    _infer(fmt, reader, filename)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print("%f %d" % (elapsed, peak))
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_mmap")
+    parser.add_argument("--records", "-n", default=300000, type=int)
+    parser.add_argument("--measure", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_files(tmp_dir, args.records)
+        for fmt in ("json", "ndjson", "csv"):
+            filename = os.path.join(tmp_dir, "records." + fmt)
+            size = os.path.getsize(filename) / 1e6
+            for reader in ("text", "mmap"):
+                out = subprocess.run(
+                    [sys.executable, __file__, "--measure", fmt, reader,
+                     filename],
+                    check=True, stdout=subprocess.PIPE, text=True).stdout
+                elapsed, peak = out.split()
+                print("%-6s %6.1f MB  %-4s %8.3f s  %10.0f rec/s  "
+                      "peak RSS: %7.1f MB" %
+                      (fmt, size, reader, float(elapsed),
+                       args.records / float(elapsed), int(peak) / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Measure how parallel inference scales with the number of workers.
+
+usage: python benchmarks/bench_parallel.py [--records N] [--max-workers N]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import getschema
+
+
+def write_ndjson(filename, n):
+    with open(filename, "w") as f:
+        for i in range(n):
+            record = {
+                "id": i,
+                "name": "name %d" % i,
+                "price": "%d.5" % i,
+                "created_at": "2021-06-04T09:00:00",
+                "nested": {"a": i, "b": [i, i + 1], "c": {"d": str(i)}},
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_parallel")
+    parser.add_argument("--records", "-n", default=200000, type=int)
+    parser.add_argument("--max-workers", "-w", default=os.cpu_count(),
+                        type=int)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "records.ndjson")
+        write_ndjson(filename, args.records)
+
+        base = None
+        workers = 1
+        while workers <= args.max_workers:
+            start = time.perf_counter()
+            getschema.infer_from_file(filename, "ndjson", workers=workers)
+            elapsed = time.perf_counter() - start
+            base = base or elapsed
+            print("workers: %3d  %10.0f rec/s  speedup: x%.2f" %
+                  (workers, args.records / elapsed, base / elapsed))
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Benchmark inference, merging, fix_type and the file readers on synthetic
+records of several shapes, and compare the results with a saved baseline.
+
+Shapes:
+- wide: Flat records of many columns of strings, numbers and booleans
+- nested: Deeply nested objects
+- arrays: Long arrays of scalars and objects
+- dates: Dates and date-times in several formats
+- numeric: Numbers as strings, as read from CSV
+- mixed: Columns whose type changes between the records
+
+Cases:
+- infer: infer_schema on the records
+- merge: SchemaAccumulator.merge of the accumulators of chunks of the
+  records (only the merges are timed)
+- fix_type: fix_type on each record
+- fix_types: fix_types on all the records
+- read_json, read_ndjson, read_csv: infer_from_file (CSV only for the
+  flat shapes)
+
+Each case is timed (best of --repeat) and run once more under tracemalloc
+for the peak memory allocated. The rates are only comparable on the same
+machine, so save a baseline before a change and compare with it after:
+
+  python benchmarks/bench_suite.py --output baseline.json
+  python benchmarks/bench_suite.py --baseline baseline.json
+
+The comparison exits with 1 when a case is slower than the baseline by more
+than --tolerance.
+
+usage: python benchmarks/bench_suite.py [--records N] [--repeat N]
+                                        [--shapes SHAPE [SHAPE ...]]
+                                        [--cases CASE [CASE ...]]
+                                        [--output FILE] [--baseline FILE]
+                                        [--tolerance RATIO] [--no-memory]
+"""
+import argparse
+import csv
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import getschema
+
+# Records per accumulator merged
+MERGE_CHUNK = 10
+
+
+def _wide(rnd, i, width=100):
+    record = {}
+    for c in range(width):
+        kind = c % 4
+        if kind == 0:
+            record["int_%d" % c] = rnd.randint(0, 100000)
+        elif kind == 1:
+            record["num_%d" % c] = "%d.%d" % (rnd.randint(0, 1000), c)
+        elif kind == 2:
+            record["bool_%d" % c] = bool(rnd.getrandbits(1))
+        else:
+            record["str_%d" % c] = "value %d" % rnd.randint(0, 100)
+    return record
+
+
+def _nested(rnd, i, depth=12):
+    record = {"id": i, "leaf": str(rnd.random())}
+    for level in range(depth):
+        record = {"level": level, "name": "n%d" % i,
+                  "score": "%d.5" % rnd.randint(0, 100), "child": record}
+    return record
+
+
+def _arrays(rnd, i, length=100):
+    return {"id": i,
+            "tags": ["t%d" % rnd.randint(0, 50) for _ in range(length)],
+            "values": [rnd.randint(0, 1000) for _ in range(length)],
+            "items": [{"id": k, "price": "%d.5" % rnd.randint(0, 100)}
+                      for k in range(length // 10)]}
+
+
+def _dates(rnd, i, width=20):
+    day = "2021-%02d-%02d" % (rnd.randint(1, 12), rnd.randint(1, 28))
+    clock = "%02d:%02d:%02d" % (rnd.randint(0, 23), rnd.randint(0, 59),
+                                rnd.randint(0, 59))
+    formats = (day, day + "T" + clock, day + " " + clock,
+               day + "T" + clock + "Z", day + "T" + clock + ".123+09:00")
+    return {"date_%d" % c: formats[c % len(formats)] for c in range(width)}
+
+
+def _numeric(rnd, i, width=50):
+    record = {}
+    for c in range(width):
+        if c % 2:
+            record["col_%d" % c] = str(rnd.randint(0, 100000))
+        else:
+            record["col_%d" % c] = "%d.%02d" % (rnd.randint(0, 1000),
+                                                rnd.randint(0, 99))
+    return record
+
+
+def _mixed(rnd, i, width=30):
+    values = (lambda: rnd.randint(0, 100), lambda: rnd.random(),
+              lambda: str(rnd.randint(0, 100)), lambda: "x%d" % i,
+              lambda: None, lambda: bool(rnd.getrandbits(1)))
+    return {"col_%d" % c: rnd.choice(values)() for c in range(width)}
+
+
+# name: (generator, records per --records, flat)
+SHAPES = {
+    "wide": (_wide, 0.2, True),
+    "nested": (_nested, 0.5, False),
+    "arrays": (_arrays, 0.1, False),
+    "dates": (_dates, 1, True),
+    "numeric": (_numeric, 0.4, True),
+    "mixed": (_mixed, 1, True),
+}
+CASES = ["infer", "merge", "fix_type", "fix_types", "read_json",
+         "read_ndjson", "read_csv"]
+
+
+def make_records(shape, n):
+    make = SHAPES[shape][0]
+    rnd = random.Random(shape)
+    return [make(rnd, i) for i in range(n)]
+
+
+def write_files(tmp_dir, shape, records):
+    files = {}
+    files["json"] = os.path.join(tmp_dir, shape + ".json")
+    with open(files["json"], "w") as f:
+        json.dump(records, f)
+    files["ndjson"] = os.path.join(tmp_dir, shape + ".ndjson")
+    with open(files["ndjson"], "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    if SHAPES[shape][2]:
+        files["csv"] = os.path.join(tmp_dir, shape + ".csv")
+        with open(files["csv"], "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
+    return files
+
+
+def _partials(records):
+    """Accumulators of chunks of the records, to be merged"""
+    partials = []
+    for start in range(0, len(records), MERGE_CHUNK):
+        acc = getschema.SchemaAccumulator()
+        acc.add_many(records[start:start + MERGE_CHUNK])
+        partials.append(acc)
+    return partials
+
+
+def prepare(case, records, files):
+    """Return the function to time, or None when the case does not apply to
+    the shape
+    """
+    if case == "infer":
+        return lambda: getschema.infer_schema(records)
+    if case == "merge":
+        partials = _partials(records)
+
+        def merge():
+            acc = getschema.SchemaAccumulator()
+            for partial in partials:
+                acc.merge(partial)
+            return acc
+        return merge
+    if case in ("fix_type", "fix_types"):
+        schema = getschema.infer_schema(records)
+        if case == "fix_types":
+            return lambda: getschema.fix_types(records, schema)
+        return lambda: [getschema.fix_type(record, schema)
+                        for record in records]
+    fmt = case[len("read_"):]
+    if fmt not in files:
+        return None
+    return lambda: getschema.infer_from_file(files[fmt], fmt)
+
+
+def measure(func, repeat, memory):
+    """Return the best time of the runs and the peak memory allocated in
+    a run (None if not measured)
+    """
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak
+
+
+def run(args):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for shape in args.shapes:
+            n = max(1, int(args.records * SHAPES[shape][1]))
+            records = make_records(shape, n)
+            files = write_files(tmp_dir, shape, records)
+            for case in args.cases:
+                func = prepare(case, records, files)
+                if func is None:
+                    continue
+                seconds, peak = measure(func, args.repeat, args.memory)
+                result = {"shape": shape, "case": case, "records": n,
+                          "seconds": seconds, "records_per_sec": n / seconds,
+                          "peak_bytes": peak}
+                results.append(result)
+                print("%-8s %-11s %7d records %8.3f s %10.0f records/s%s" %
+                      (shape, case, n, seconds, n / seconds,
+                       "" if peak is None else
+                       "  peak: %7.1f MB" % (peak / 1e6)))
+            del records
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print the rates relative to the baseline. Returns the number of the
+    cases slower than the baseline by more than tolerance.
+    """
+    base = {(r["shape"], r["case"]): r for r in baseline["results"]}
+    regressions = 0
+    print("\ncompared with the baseline:")
+    for result in results:
+        old = base.get((result["shape"], result["case"]))
+        if old is None:
+            continue
+        ratio = result["records_per_sec"] / old["records_per_sec"]
+        mark = ""
+        if ratio < 1 - tolerance:
+            mark = "  SLOWER"
+            regressions += 1
+        memory = ""
+        if result["peak_bytes"] and old.get("peak_bytes"):
+            memory = "  peak memory x%.2f" % (result["peak_bytes"] /
+                                             old["peak_bytes"])
+        print("%-8s %-11s speed x%.2f%s%s" %
+              (result["shape"], result["case"], ratio, memory, mark))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_suite")
+    parser.add_argument("--records", "-n", default=20000, type=int,
+                        help="Number of the records, scaled down for the "
+                        "larger shapes")
+    parser.add_argument("--repeat", "-r", default=3, type=int)
+    parser.add_argument("--shapes", nargs="+", default=list(SHAPES),
+                        choices=list(SHAPES))
+    parser.add_argument("--cases", nargs="+", default=CASES, choices=CASES)
+    parser.add_argument("--output", "-o", default=None,
+                        help="Write the results to this JSON file")
+    parser.add_argument("--baseline", "-b", default=None,
+                        help="Compare with the results saved by --output")
+    parser.add_argument("--tolerance", default=0.1, type=float,
+                        help="Slowdown ratio allowed against the baseline")
+    parser.add_argument("--no-memory", dest="memory", default=True,
+                        action="store_false",
+                        help="Skip the run under tracemalloc")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "args": {"records": args.records,
+                                "repeat": args.repeat},
+                       "results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,173 @@
 #!/usr/bin/env python3
-import argparse
-import simplejson as json
+import contextlib, json, os, sys
 from .impl import *
+from .aio import afix_stream
+from .bulk import ERROR_ACTIONS, fix_file
+from .cache import evict_cache
+from .evolve import CHANGES, diff_schemas, evolve_from_file, evolve_schema
+from .fixer import INVALID_ACTIONS, compile_fixer, fix_types, iter_fix_types
+from .stats import collect_stats
 
 # JSON schema follows:
 # https://json-schema.org/
 COMMAND = "getschema"
 
 
+def _add_stats_arguments(parser):
+    parser.add_argument("--stats", default=False, action="store_true",
+                        help="Print the counts and the time spent by phase to stderr (with --jobs 1)")
+    parser.add_argument("--profile", default=None, type=str,
+                        help="Run cProfile and write its stats to this file")
+
+
+def _check_stats(parser, args):
+    # The workers of a process pool are not counted
+    if args.stats and args.jobs != 1:
+        parser.error("--stats counts only a single process: use --jobs 1")
+
+
+@contextlib.contextmanager
+def _stats(args):
+    if not args.stats and not args.profile:
+        yield
+        return
+    with collect_stats(args.profile) as stats:
+        yield
+    if args.stats:
+        print(json.dumps(stats.to_dict(), indent=2), file=sys.stderr)
+
+
+def fix_main(argv):
+    """
+    Entry point of getschema fix
+    """
+    import argparse
+    parser = argparse.ArgumentParser(COMMAND + " fix")
+    parser.add_argument("data", type=str, help="record file to convert")
+    parser.add_argument("--schema", "-S", required=True, type=str,
+                        help="JSON schema file to convert the records to")
+    parser.add_argument("--output", "-o", default="-", type=str,
+                        help="NDJSON file to write to (stdout by default)")
+    parser.add_argument("--type", "-t", default="ndjson", type=str,
+                        help="Record format (json, ndjson, csv)")
+    parser.add_argument("--jobs", "-j", default=1, type=int,
+                        help="Number of processes to convert with (0 for the number of CPUs)")
+    parser.add_argument("--unordered", "-u", default=False, action="store_true",
+                        help="Write the records as they are converted instead of in the original order")
+    parser.add_argument("--on_error", "-e", default="raise", type=str,
+                        choices=ERROR_ACTIONS,
+                        help="Stop at or skip the records that cannot be converted")
+    parser.add_argument("--on_invalid_property", default="raise", type=str,
+                        choices=INVALID_ACTIONS,
+                        help="What to do with a value that cannot be converted")
+    parser.add_argument("--drop_unknown_properties", default=False,
+                        action="store_true",
+                        help="Drop the properties not in the schema")
+    parser.add_argument("--lower", "-l", default=False, action="store_true",
+                        help="Convert the keys to lower case")
+    parser.add_argument("--replace_special", "-r", default=None, type=str,
+                        help="Replace special characters in the keys with the specified string")
+    parser.add_argument("--snakecase", "-n", default=False, action="store_true",
+                        help="Convert the keys to 'snake_case'")
+    parser.add_argument("--date_to_datetime", default=False,
+                        action="store_true",
+                        help="Convert the dates to date-times")
+    parser.add_argument("--passthrough", default=False, action="store_true",
+                        help="Skip converting the records that already have the types")
+    _add_stats_arguments(parser)
+    args = parser.parse_args(argv)
+    _check_stats(parser, args)
+
+    with open(args.schema) as f:
+        schema = json.load(f)
+    with _stats(args):
+        fix_file(args.data, schema, args.output, args.type.lower(),
+                 args.jobs, not args.unordered, args.on_error,
+                 on_invalid_property=args.on_invalid_property,
+                 drop_unknown_properties=args.drop_unknown_properties,
+                 lower=args.lower, replace_special=args.replace_special,
+                 snake_case=args.snakecase,
+                 date_to_datetime=args.date_to_datetime,
+                 passthrough=args.passthrough)
+
+
+def evolve_main(argv):
+    """
+    Entry point of getschema evolve
+    """
+    import argparse
+    parser = argparse.ArgumentParser(COMMAND + " evolve")
+    parser.add_argument("data", type=str, help="file of the new records")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--schema", "-S", default=None, type=str,
+                        help="JSON schema file to evolve")
+    source.add_argument("--state", default=None, type=str,
+                        help="Inference state file to evolve and update instead (created if missing), for the same result as inferring from all the records")
+    parser.add_argument("--output", "-o", default=None, type=str,
+                        help="Write the evolved schema to this file and print only the changes")
+    parser.add_argument("--indent", "-i", default=2, type=int,
+                        help="Number of spaces for indentation")
+    parser.add_argument("--type", "-t", default="json", type=str,
+                        help="Record format (json, ndjson, yaml, csv)")
+    parser.add_argument("--skip", "-s", default=0, type=int,
+                        help="Skip first n records. Don't skip the header row.")
+    parser.add_argument("--lower", "-l", default=False, action="store_true",
+                        help="Convert the keys to lower case")
+    parser.add_argument("--replace_special", "-r", default=None, type=str,
+                        help="Replace special characters in the keys with the specified string")
+    parser.add_argument("--snakecase", "-n", default=False, action="store_true",
+                        help="Convert the keys to 'snake_case'")
+    parser.add_argument("--jobs", "-j", default=1, type=int,
+                        help="Number of processes to infer with (0 for the number of CPUs)")
+    parser.add_argument("--array_items", "-a", default=1, type=int,
+                        help="Number of items of each array to infer the item type from (0 for all)")
+    _add_stats_arguments(parser)
+    args = parser.parse_args(argv)
+    _check_stats(parser, args)
+
+    if args.schema:
+        with open(args.schema) as f:
+            schema = json.load(f)
+    elif os.path.exists(args.state):
+        with open(args.state) as f:
+            schema = SchemaAccumulator.from_dict(json.load(f))
+    else:
+        schema = SchemaAccumulator(
+            lower=args.lower, replace_special=args.replace_special,
+            snake_case=args.snakecase, array_items=args.array_items or None)
+    with _stats(args):
+        evolved, changes = evolve_from_file(
+            args.data, schema, args.type.lower(), args.skip, args.lower,
+            args.replace_special, args.snakecase, args.jobs,
+            args.array_items or None)
+    if args.state:
+        with open(args.state, "w") as f:
+            json.dump(schema.to_dict(), f)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(evolved, f, indent=args.indent)
+        print(json.dumps(changes, indent=args.indent))
+    else:
+        print(json.dumps({"schema": evolved, "changes": changes},
+                         indent=args.indent))
+
+
 def main():
     """
     Entry point
     """
+    if sys.argv[1:2] == ["fix"]:
+        return fix_main(sys.argv[2:])
+    if sys.argv[1:2] == ["evolve"]:
+        return evolve_main(sys.argv[2:])
+    import argparse
     parser = argparse.ArgumentParser(COMMAND)
     parser.add_argument("data", type=str, help="json record file")
     parser.add_argument("--indent", "-i", default=2, type=int,
                         help="Number of spaces for indentation")
     parser.add_argument("--type", "-t", default="json", type=str,
-                        help="Record format (json, yaml, csv)")
+                        help="Record format (json, ndjson, yaml, csv)")
     parser.add_argument("--skip", "-s", default=0, type=int,
                         help="Skip first n records. Don't skip the header row.")
     parser.add_argument("--lower", "-l", default=False, action="store_true",
@@ -26,10 +176,36 @@ def main():
                         help="Replace special characters in the keys with the specified string")
     parser.add_argument("--snakecase", "-n", default=False, action="store_true",
                         help="Convert the keys to 'snake_case'")
+    parser.add_argument("--jobs", "-j", default=1, type=int,
+                        help="Number of processes to infer with (0 for the number of CPUs)")
+    parser.add_argument("--sample", default=None, type=str,
+                        choices=SAMPLING_METHODS,
+                        help="Infer from a sample of the records")
+    parser.add_argument("--sample_size", default=DEFAULT_SAMPLE_SIZE, type=int,
+                        help="Number of records to sample (for coverage, stop after this many records without a schema change)")
+    parser.add_argument("--array_items", "-a", default=1, type=int,
+                        help="Number of items of each array to infer the item type from (0 for all)")
+    parser.add_argument("--cache_dir", "--cache-dir", default=None, type=str,
+                        help="Directory to cache the inferred schemas in. A file that has only grown is inferred from the new records only.")
+    parser.add_argument("--evict", default=False, action="store_true",
+                        help="Remove the cached schemas of the file from the cache directory instead of inferring")
+    _add_stats_arguments(parser)
     args = parser.parse_args()
+    _check_stats(parser, args)
+
+    if args.evict:
+        if args.cache_dir is None:
+            parser.error("--evict requires --cache_dir")
+        count = evict_cache(args.cache_dir, args.data)
+        print("Removed %d cache entries" % count)
+        return
 
-    schema = infer_from_file(args.data, args.type.lower(), args.skip,
-                             args.lower, args.replace_special, args.snakecase)
+    with _stats(args):
+        schema = infer_from_file(args.data, args.type.lower(), args.skip,
+                                 args.lower, args.replace_special,
+                                 args.snakecase, args.jobs, args.sample,
+                                 args.sample_size, args.array_items or None,
+                                 args.cache_dir)
 
     print(json.dumps(schema, indent=args.indent))
 
@@ -0,0 +1,90 @@
+"""asyncio API to convert streams of records off the event loop"""
+import collections
+
+from .fixer import BATCH_SIZE, _fix_batch, compile_fixer
+
+EXECUTORS = ["thread", "process"]
+# Compiled fixers kept by each worker process, by stream
+_process_fixers = collections.OrderedDict()
+PROCESS_FIXER_CACHE_SIZE = 16
+
+
+def _fix_batch_in_process(batch, key, schema, options):
+    fixer = _process_fixers.get(key)
+    if fixer is None:
+        fixer = compile_fixer(schema, **options)
+        _process_fixers[key] = fixer
+        if len(_process_fixers) > PROCESS_FIXER_CACHE_SIZE:
+            _process_fixers.popitem(last=False)
+    return _fix_batch(batch, fixer)
+
+
+async def afix_stream(records, schema, batch_size=BATCH_SIZE,
+                      executor="thread", workers=1, max_pending=None,
+                      **kwargs):
+    """Convert the records of an async iterable the same way as fix_type does
+    and yield them in the original order. The records are converted
+    batch_size at a time on a pool, so the event loop keeps running (e.g.
+    fetching the next pages) while a batch is converted.
+    e.g.
+      async for record in afix_stream(fetch_records(), schema):
+          ...
+
+    - executor: Where to convert the batches
+      - thread: A pool of workers threads
+      - process: A pool of workers processes
+      - Or a concurrent.futures.Executor
+    - max_pending: Number of batches being converted at a time (workers * 2
+      by default). The records are not read further until the oldest one
+      is done.
+    - kwargs: Same as fix_type's options
+    An error in a batch is raised after the records before the batch are
+    yielded.
+    """
+    # Imported here so that importing getschema does not load asyncio
+    import asyncio, uuid
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    # Compiled here for a thread pool, and to raise on invalid options
+    fixer = compile_fixer(schema, **kwargs)
+    owned = None
+    if executor == "thread":
+        executor = owned = ThreadPoolExecutor(workers)
+    elif executor == "process":
+        executor = owned = ProcessPoolExecutor(workers)
+    elif isinstance(executor, str):
+        raise ValueError("Unknown executor: %s. Choose from %s" %
+                         (executor, EXECUTORS))
+    if isinstance(executor, ProcessPoolExecutor):
+        # The compiled fixer cannot be pickled. Each process compiles its own.
+        func, args = _fix_batch_in_process, (uuid.uuid4().hex, schema, kwargs)
+    else:
+        func, args = _fix_batch, (fixer,)
+    max_pending = max_pending or workers * 2
+
+    loop = asyncio.get_running_loop()
+    pending = collections.deque()
+    batch = []
+    try:
+        async for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                pending.append(
+                    loop.run_in_executor(executor, func, batch, *args))
+                batch = []
+                while len(pending) >= max_pending:
+                    for fixed in await pending.popleft():
+                        yield fixed
+            while pending and pending[0].done():
+                for fixed in pending.popleft().result():
+                    yield fixed
+        if batch:
+            pending.append(loop.run_in_executor(executor, func, batch, *args))
+        while pending:
+            for fixed in await pending.popleft():
+                yield fixed
+    finally:
+        for future in pending:
+            future.cancel()
+        if owned is not None:
+            owned.shutdown(wait=False, cancel_futures=True)
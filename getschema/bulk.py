@@ -0,0 +1,253 @@
+"""Convert the records of whole files with fix_type's rules on a process
+pool, writing NDJSON.
+"""
+import csv, itertools, json, logging, os, sys
+
+from . import jsonlib
+from .fixer import BATCH_SIZE, _fix_batch, compile_fixer
+from .parallel import _map_ordered, _num_workers, ndjson_byte_ranges
+from .readers import (iter_json_array, iter_mapped_blocks, map_file,
+                      mappable, open_input, open_json, open_text_lines)
+
+LOGGER = logging.getLogger(__name__)
+
+ERROR_ACTIONS = ["raise", "skip"]
+# Bytes of NDJSON converted per task
+RANGE_SIZE = 1 << 22
+
+# Compiled by each worker process
+_worker_fixer = None
+
+
+def _init_worker(schema, options):
+    global _worker_fixer
+    _worker_fixer = compile_fixer(schema, **options)
+
+
+def _on_error(on_error, where, e):
+    message = "%s: %s" % (where, e)
+    if on_error == "raise":
+        raise ValueError(message)
+    LOGGER.warning(f"Skipping {message}")
+
+
+def _fix_and_dump(fixer, records, where, on_error, indices=None):
+    """Return the converted records as NDJSON and the number of them
+    - where: Function that tells where the record of the index is
+    - indices: Indices of the records if they are not 0, 1, 2, ...
+    """
+    fixed = []
+    # fix_types' batches are faster than larger ones
+    for i in range(0, len(records), BATCH_SIZE):
+        batch = records[i:i + BATCH_SIZE]
+        try:
+            fixed.extend(_fix_batch(batch, fixer))
+            continue
+        except Exception:
+            pass
+        # Find the records that fail
+        for j, record in enumerate(batch, i):
+            try:
+                fixed.append(fixer(record))
+            except Exception as e:
+                _on_error(on_error, where(indices[j] if indices else j), e)
+    dumps = jsonlib.dumps
+    return "".join([dumps(record) + "\n" for record in fixed]), len(fixed)
+
+
+def _parse(lines, where, on_error, loads=None):
+    """Parse the NDJSON lines. Returns the records and the indices of their
+    lines.
+    - where: Function that tells where the line of the index is
+    - loads: jsonlib.loads by default
+    """
+    records = []
+    indices = []
+    loads = loads or jsonlib.loads
+    for index, line in enumerate(lines):
+        if not line or line.isspace():
+            continue
+        try:
+            records.append(loads(line))
+        except json.JSONDecodeError as e:
+            _on_error(on_error, where(index), e)
+            continue
+        indices.append(index)
+    return records, indices
+
+
+def _byte_locator(lines, start):
+    """Return the where function of the lines from the byte offset start"""
+    offsets = []
+
+    def where(index):
+        # The byte offsets are only counted on an error
+        if not offsets:
+            offset = start
+            for line in lines:
+                offsets.append(offset)
+                offset += (len(line) if type(line) is bytes
+                           else len(line.encode("utf-8"))) + 1
+        return "Record at byte %d" % offsets[index]
+    return where
+
+
+def _fix_ndjson_range(fixer, filename, start, end, on_error):
+    """Convert the lines of the NDJSON file that start in the byte range"""
+    fixer = fixer or _worker_fixer
+    as_bytes = jsonlib.parses_bytes()
+    texts = []
+    count = 0
+    with map_file(filename) as mm:
+        # Block by block, so that only a few records are alive at a time
+        for block in iter_mapped_blocks(mm, start, end):
+            if as_bytes:
+                loads = jsonlib.loads_for(block)
+                lines = block.split(b"\n")
+            else:
+                loads = None
+                lines = block.decode("utf-8").split("\n")
+            if not lines[-1]:
+                lines.pop()
+            where = _byte_locator(lines, start)
+            records, indices = _parse(lines, where, on_error, loads)
+            text, n = _fix_and_dump(fixer, records, where, on_error, indices)
+            texts.append(text)
+            count += n
+            start += len(block)
+    return "".join(texts), count
+
+
+def _fix_ndjson_lines(fixer, lines, first, on_error):
+    """Convert the NDJSON lines, the first of which is the first-th line of
+    the file (from 1)
+    """
+    def where(index):
+        return "Record at line %d" % (first + index)
+
+    records, indices = _parse(lines, where, on_error)
+    return _fix_and_dump(fixer or _worker_fixer, records, where, on_error,
+                         indices)
+
+
+def _fix_records(fixer, records, first, on_error):
+    """Convert the records, the first of which is the first-th record of the
+    file (from 0)
+    """
+    def where(index):
+        return "Record %d" % (first + index)
+
+    return _fix_and_dump(fixer or _worker_fixer, records, where, on_error)
+
+
+def _map_unordered(executor, func, args_iter, max_pending):
+    """Same as _map_ordered but yields the results as they are done"""
+    from concurrent.futures import FIRST_COMPLETED, wait
+    pending = set()
+    for args in args_iter:
+        pending.add(executor.submit(func, *args))
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+def _batches(records, size):
+    first = 0
+    it = iter(records)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch, first
+        first += len(batch)
+
+
+def _write(results, out):
+    count = 0
+    for text, n in results:
+        out.write(text)
+        count += n
+    return count
+
+
+def _convert(func, tasks, out, schema, options, workers, ordered):
+    if workers == 1:
+        fixer = compile_fixer(schema, **options)
+        return _write((func(fixer, *args) for args in tasks), out)
+    # Validate the options before starting the workers
+    compile_fixer(schema, **options)
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(schema, options)) as executor:
+        tasks = ((None,) + tuple(args) for args in tasks)
+        mapper = _map_ordered if ordered else _map_unordered
+        return _write(mapper(executor, func, tasks, workers * 2), out)
+
+
+def fix_file(input, schema, output, fmt="ndjson", workers=1, ordered=True,
+             on_error="raise", batch_size=BATCH_SIZE, **kwargs):
+    """Convert the records of a file the same way as fix_type does and write
+    them to output as NDJSON. Returns the number of the records written.
+    - input: The file name of JSON (an array), NDJSON or CSV (see fmt)
+    - output: A file name or a writable text file ("-" for stdout)
+    - workers: Number of processes to convert with (0 for the number of
+      CPUs). An uncompressed NDJSON file is split into byte ranges that
+      the workers read themselves, other inputs into batches of
+      batch_size records.
+    - ordered: Write the records in the original order. If False, the
+      batches are written as they are done.
+    - on_error: ["raise", "skip"]
+      What to do when a record cannot be parsed or converted. The error
+      tells the record (from 0), or the byte offset of its line in NDJSON
+      (the line number in compressed NDJSON).
+    - kwargs: Same as fix_type's options
+    """
+    if on_error not in ERROR_ACTIONS:
+        raise ValueError("on_error is not one of %s" % ERROR_ACTIONS)
+    workers = _num_workers(workers)
+    if output == "-":
+        return _fix_file(input, schema, sys.stdout, fmt, workers, ordered,
+                         on_error, batch_size, kwargs)
+    if isinstance(output, str):
+        with open(output, "w") as out:
+            return _fix_file(input, schema, out, fmt, workers, ordered,
+                             on_error, batch_size, kwargs)
+    return _fix_file(input, schema, output, fmt, workers, ordered, on_error,
+                     batch_size, kwargs)
+
+
+def _fix_file(input, schema, out, fmt, workers, ordered, on_error,
+              batch_size, options):
+    if fmt in ("ndjson", "jsonl"):
+        if mappable(input):
+            n = max(workers * 4, os.path.getsize(input) // RANGE_SIZE + 1)
+            tasks = ((input, start, end, on_error)
+                     for start, end in ndjson_byte_ranges(input, n))
+            return _convert(_fix_ndjson_range, tasks, out, schema, options,
+                            workers, ordered)
+        with open_input(input, "rb") as f:
+            tasks = ((batch, first + 1, on_error)
+                     for batch, first in _batches(f, batch_size))
+            return _convert(_fix_ndjson_lines, tasks, out, schema, options,
+                            workers, ordered)
+
+    def convert(records):
+        tasks = ((batch, first, on_error)
+                 for batch, first in _batches(records, batch_size))
+        return _convert(_fix_records, tasks, out, schema, options, workers,
+                        ordered)
+
+    if fmt == "json":
+        with open_json(input) as (f, is_array):
+            if not is_array:
+                raise ValueError("Expected a JSON array in %s" % input)
+            return convert(iter_json_array(f))
+    if fmt == "csv":
+        with open_text_lines(input) as lines:
+            return convert(dict(row) for row in csv.DictReader(lines))
+    raise KeyError("Unsupported format : " + fmt)
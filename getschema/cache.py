@@ -0,0 +1,207 @@
+"""On-disk cache of the schemas inferred from files.
+
+An entry is kept per file (by its real path), format and inference options,
+with the size, the modification time and the SHA-256 of the content the
+schema was inferred from:
+- Same size and modification time: the stored schema is returned as it is.
+- Same size but modified: the content is hashed, and the stored schema is
+  returned if the content did not change.
+- Grown uncompressed NDJSON or CSV file whose first part is what the schema
+  was inferred from (e.g. appended logs): the inference resumes from the
+  stored state with the new records only.
+- Anything else: the file is inferred again.
+"""
+import csv, json, logging, os, time
+
+from . import impl
+from .readers import (detect_compression, is_regular_file, iter_mapped_text,
+                      iter_ndjson_mapped, map_file)
+
+LOGGER = logging.getLogger(__name__)
+
+# Part of the key of an entry. Bump it when a change to the inference or to
+# the entries makes the stored schemas and states stale.
+CACHE_VERSION = 1
+HASH_CHUNK_SIZE = 1 << 20
+_APPENDABLE = ("ndjson", "jsonl", "csv")
+
+
+def _entry_path(cache_dir, key):
+    import hashlib
+    name = hashlib.sha256(
+        json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, name + ".json")
+
+
+def _file_hash(filename, size):
+    """SHA-256 of the first size bytes of the file"""
+    import hashlib
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        remaining = size
+        while remaining > 0:
+            chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def _ends_line(filename, size):
+    """The first size bytes end with a complete line (or record)"""
+    if size == 0:
+        return True
+    with open(filename, "rb") as f:
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
+
+
+def _load(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        LOGGER.warning(f"Ignoring the broken cache entry {path}")
+        return None
+
+
+def _store(path, entry):
+    # Write and rename so that a reader never sees a partial entry
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, "w") as f:
+        json.dump(entry, f)
+    os.replace(tmp, path)
+
+
+def _resume(acc, filename, fmt, skip, offset):
+    """Add the records after the byte offset to the accumulator"""
+    with map_file(filename) as mm:
+        if fmt != "csv":
+            return acc.add_many(iter_ndjson_mapped(mm, offset))
+        lines = iter_mapped_text(mm)
+        for _ in range(skip):
+            next(lines, None)
+        header = next(csv.reader(lines), None)
+        reader = csv.DictReader(iter_mapped_text(mm, offset),
+                                fieldnames=header)
+        return acc.add_many(dict(row) for row in reader)
+
+
+def _infer(filename, fmt, skip, workers, sample, sample_size, options):
+    """Return the schema and, for the formats that can resume, the state"""
+    if fmt in ("ndjson", "jsonl"):
+        acc = impl._accumulate_ndjson_file(filename, skip, workers, sample,
+                                           sample_size, **options)
+    elif fmt == "csv":
+        acc = impl._accumulate_csv_file(filename, skip, workers, sample,
+                                        sample_size, **options)
+    else:
+        schema = impl.infer_from_file(filename, fmt, skip, workers=workers,
+                                      sample=sample, sample_size=sample_size,
+                                      **options)
+        return schema, None
+    return acc.finalize(), acc.to_dict()
+
+
+def infer_cached(cache_dir, filename, fmt="json", skip=0, lower=False,
+                 replace_special=False, snake_case=False, workers=1,
+                 sample=None, sample_size=impl.DEFAULT_SAMPLE_SIZE,
+                 array_items=1):
+    """infer_from_file with the schemas kept in cache_dir"""
+    options = {
+        "lower": lower,
+        "replace_special": replace_special,
+        "snake_case": snake_case,
+        "array_items": array_items,
+    }
+    if not is_regular_file(filename):
+        # A pipe can be read only once, and its content is not kept
+        LOGGER.info(f"{filename} is not a regular file. Not caching.")
+        return _infer(filename, fmt, skip, workers, sample, sample_size,
+                      options)[0]
+    key = {
+        "version": CACHE_VERSION,
+        "path": os.path.realpath(filename),
+        "format": fmt,
+        "skip": skip,
+        "sample": sample,
+        # The sample size only matters with a sample
+        "sample_size": sample_size if sample is not None else None,
+        "options": options,
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(cache_dir, key)
+    entry = _load(path)
+    stat = os.stat(filename)
+
+    if entry is not None and entry["size"] == stat.st_size:
+        if (entry["mtime_ns"] == stat.st_mtime_ns or
+                entry["sha256"] == _file_hash(filename, stat.st_size)):
+            LOGGER.info(f"Using the cached schema of {filename}")
+            if entry["mtime_ns"] != stat.st_mtime_ns:
+                entry["mtime_ns"] = stat.st_mtime_ns
+                _store(path, entry)
+            else:
+                # The last use, for evict_cache's max_age
+                os.utime(path)
+            return entry["schema"]
+
+    schema = None
+    if (entry is not None and entry.get("state") is not None and
+            entry["size"] < stat.st_size and
+            _ends_line(filename, entry["size"]) and
+            entry["sha256"] == _file_hash(filename, entry["size"])):
+        LOGGER.info(f"{filename} has grown. Inferring from the new records.")
+        acc = impl.SchemaAccumulator.from_dict(entry["state"])
+        acc = _resume(acc, filename, fmt, skip, entry["size"])
+        schema, state = acc.finalize(), acc.to_dict()
+    if schema is None:
+        schema, state = _infer(filename, fmt, skip, workers, sample,
+                               sample_size, options)
+        if (fmt not in _APPENDABLE or sample is not None or
+                detect_compression(filename) is not None):
+            state = None
+
+    if os.stat(filename).st_size != stat.st_size:
+        # Changed while being read. The records read may not match the size.
+        LOGGER.warning(f"{filename} changed while inferring. Not caching.")
+        return schema
+    entry = dict(key)
+    entry.update({
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": _file_hash(filename, stat.st_size),
+        "schema": schema,
+        "state": state,
+    })
+    _store(path, entry)
+    return schema
+
+
+def evict_cache(cache_dir, filename=None, max_age=None):
+    """Remove the entries from the cache directory. Returns the number of the
+    removed entries.
+    - filename: Only the entries of this file
+    - max_age: Only the entries not used for this many seconds
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    real_path = os.path.realpath(filename) if filename is not None else None
+    now = time.time()
+    count = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if not name.endswith(".json"):
+            continue
+        if max_age is not None and now - os.path.getmtime(path) < max_age:
+            continue
+        if real_path is not None:
+            entry = _load(path)
+            if entry is not None and entry.get("path") != real_path:
+                continue
+        os.remove(path)
+        count += 1
+    return count
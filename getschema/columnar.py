@@ -0,0 +1,113 @@
+import csv, itertools
+
+from . import lattice, stats
+from .impl import (SchemaAccumulator, _convert_key, _is_datetime,
+                   _on_key_collision)
+from .lattice import DATETIME, INTEGER, NUMBER, NUMBERS, STRING
+
+CHUNK_SIZE = 10000
+
+
+def _classify(value):
+    """Same rules as lattice.classify for a CSV cell"""
+    if value is None:
+        return STRING
+    try:
+        float(value)
+    except ValueError:
+        return DATETIME if _is_datetime(value) else STRING
+    if "." in value:
+        return NUMBER
+    # Let's assume it's a code such as zipcode if there is a leading 0
+    if value[0] != "0":
+        return INTEGER
+    return STRING
+
+
+def _is_widest(seen):
+    return bool(seen & STRING) or (seen & DATETIME and seen != DATETIME)
+
+
+def _classify_column(values, seen):
+    # Columns repeat values a lot, so check each distinct value only once
+    for value in set(values):
+        seen |= _classify(value)
+        if _is_widest(seen):
+            break
+    return seen
+
+
+def _to_flag(seen):
+    """The flags a column has seen, widened into one"""
+    if seen == INTEGER or seen == DATETIME:
+        return seen
+    if seen and not (seen & ~NUMBERS):
+        return NUMBER
+    return STRING
+
+
+def accumulate_csv(f, lower=False, replace_special=False, snake_case=False,
+                   limit=None, chunk_size=CHUNK_SIZE, on_key_collision="warn",
+                   array_items=1):
+    """Infer from CSV column by column instead of building a dict per row.
+    The file is read in chunks of rows that are turned into columns, and each
+    column keeps the set of the types it has seen. A column stops being
+    checked once it has widened to string.
+    Returns a SchemaAccumulator with the same state as the row by row
+    inference. CSV has no arrays, and array_items is only kept in the
+    options of the accumulator, so it can be merged with the others.
+    """
+    reader = csv.reader(f)
+    header = next(reader, None)
+    acc = SchemaAccumulator(lower=lower, replace_special=replace_special,
+                            snake_case=snake_case,
+                            on_key_collision=on_key_collision,
+                            array_items=array_items)
+    if header is None:
+        return acc
+
+    # Same as the dict built by csv.DictReader: the last of the duplicate
+    # column names wins and the converted keys may collide in the same way.
+    names = {}
+    for index, name in enumerate(header):
+        names[name] = index
+    columns = {}
+    for name, index in names.items():
+        new_key = _convert_key(name, lower, replace_special, snake_case)
+        if new_key in columns:
+            _on_key_collision(on_key_collision, name, new_key, [])
+        columns[new_key] = index
+    width = len(header)
+    seen = {key: 0 for key in columns}
+    # DictReader skips blank lines
+    rows = filter(None, reader)
+    if limit is not None:
+        rows = itertools.islice(rows, limit)
+    count = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        count += len(chunk)
+        if set(map(len, chunk)) != {width}:
+            if max(map(len, chunk)) > width:
+                raise ValueError("A row has more values than the header")
+            # DictReader fills the missing values with None
+            chunk = [row + [None] * (width - len(row)) for row in chunk]
+        cells = list(zip(*chunk))
+        for key, index in columns.items():
+            if not _is_widest(seen[key]):
+                seen[key] = _classify_column(cells[index], seen[key])
+
+    if count == 0:
+        return acc
+
+    # Each row is a dict, i.e. an object unless the header is empty
+    properties = {key: lattice.new_node(_to_flag(seen[key]))
+                  for key in columns}
+    acc._root = lattice.Node(lattice.OBJECT if properties else lattice.STRING,
+                             properties=properties or None)
+    acc.count = count
+    if stats.current is not None:
+        stats.current.records += count
+    return acc
@@ -0,0 +1,136 @@
+import datetime, functools, re
+
+CACHE_SIZE = 4096
+
+# The (very loose) date-time check getschema uses for inference and fix_type
+_LOOSE_DATETIME = re.compile(
+    r"(19|20)\d\d-(0[1-9]|1[012])-([1-9]|0[1-9]|[12][0-9]|3[01])")
+
+# Checked in this order. The first pattern that matches and parses wins.
+FORMATS = [
+    ("rfc3339", re.compile(
+        r"\d{4}-\d{2}-\d{2}[Tt ]\d{2}:\d{2}:\d{2}(\.\d+)?([Zz]|[+-]\d{2}:\d{2})$")),
+    ("iso8601", re.compile(
+        r"\d{4}-\d{2}-\d{2}([Tt ]\d{2}(:\d{2}(:\d{2}(\.\d+)?)?)?"
+        r"([Zz]|[+-]\d{2}(:?\d{2})?)?)?$")),
+    ("iso8601_basic", re.compile(
+        r"\d{8}([Tt]\d{4}(\d{2}(\.\d+)?)?([Zz]|[+-]\d{2}(\d{2})?)?)?$")),
+    # e.g. HTTP headers and emails: "Tue, 01 Jun 2021 09:00:00 GMT"
+    ("rfc2822", re.compile(
+        r"([A-Z][a-z]{2}, )?\d{1,2} [A-Z][a-z]{2} \d{4} \d{2}:\d{2}(:\d{2})? "
+        r"([+-]\d{4}|[A-Z]{1,3})$")),
+    # e.g. spreadsheet exports: "6/4/2021 9:00 AM"
+    ("us_datetime", re.compile(
+        r"(0?[1-9]|1[012])/(0?[1-9]|[12]\d|3[01])/\d{4}"
+        r"( \d{1,2}:\d{2}(:\d{2})?( ?[AaPp][Mm])?)?$")),
+    # Unix time in milliseconds or seconds between 2001 and 2286
+    ("epoch_millis", re.compile(r"[1-9]\d{12}$")),
+    ("epoch", re.compile(r"[1-9]\d{9}(\.\d+)?$")),
+]
+
+_MIN_LENGTH = 8
+_MAX_LENGTH = 40
+
+
+def is_datetime_str(value):
+    """Same result as re.match on the loose pattern, with a cheap check of
+    the first characters before running the regex.
+    """
+    return (
+        len(value) >= 9 and value[4] == "-" and value[0] in "12" and
+        _LOOSE_DATETIME.match(value) is not None
+    )
+
+
+def _parse_iso(value):
+    value = value.replace("t", "T").replace("z", "+00:00").replace(
+        "Z", "+00:00")
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        # Python < 3.11 has a limited fromisoformat
+        return _parse_iso_basic(value)
+
+
+# dateutil and email are imported on the first value that needs them, as
+# they take long to import
+
+def _parse_iso_basic(value):
+    from dateutil import parser as dateutil_parser
+    return dateutil_parser.isoparse(value)
+
+
+def _parse_rfc2822(value):
+    from email.utils import parsedate_to_datetime
+    return parsedate_to_datetime(value)
+
+
+def _parse_us(value):
+    from dateutil import parser as dateutil_parser
+    return dateutil_parser.parse(value, dayfirst=False)
+
+
+def _parse_epoch_millis(value):
+    from dateutil.tz import tzutc
+    return datetime.datetime.fromtimestamp(int(value) / 1000, tz=tzutc())
+
+
+def _parse_epoch(value):
+    from dateutil.tz import tzutc
+    return datetime.datetime.fromtimestamp(float(value), tz=tzutc())
+
+
+_PARSERS = {
+    "rfc3339": _parse_iso,
+    "iso8601": _parse_iso,
+    "iso8601_basic": _parse_iso_basic,
+    "rfc2822": _parse_rfc2822,
+    "us_datetime": _parse_us,
+    "epoch_millis": _parse_epoch_millis,
+    "epoch": _parse_epoch,
+}
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _detect(value):
+    if not (_MIN_LENGTH <= len(value) <= _MAX_LENGTH):
+        return None, None
+    first = value[0]
+    if not (first.isdigit() or "A" <= first <= "Z"):
+        return None, None
+    for name, pattern in FORMATS:
+        if pattern.match(value) is None:
+            continue
+        try:
+            return name, _PARSERS[name](value)
+        except (ValueError, OverflowError, OSError, TypeError):
+            continue
+    return None, None
+
+
+def detect_format(value):
+    """Return the name of the date-time format of the value (see FORMATS)
+    or None. Results are cached for repeated values.
+    """
+    if type(value) is int:
+        value = str(value)
+    if type(value) is not str:
+        return None
+    return _detect(value)[0]
+
+
+def parse_datetime(value, default_tz_offset=0):
+    """Parse the value into a timezone-aware datetime. Recognized formats
+    are parsed without dateutil. Others fall back to dateutil's parser.
+    - default_tz_offset: Offset in seconds used when the value has no timezone
+    """
+    if type(value) is int:
+        value = str(value)
+    d = _detect(value)[1]
+    if d is None:
+        from dateutil import parser as dateutil_parser
+        d = dateutil_parser.parse(value)
+    if not d.tzinfo:
+        from dateutil.tz import tzoffset
+        d = d.replace(tzinfo=tzoffset(None, default_tz_offset))
+    return d
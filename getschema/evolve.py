@@ -0,0 +1,183 @@
+"""Evolve a stored schema with a new batch of records, and diff schemas.
+
+The new records are inferred on their own and merged into the stored schema
+with the same widening as the inference, so the work grows with the size of
+the batch instead of all the records the schema was inferred from.
+
+The schema can be given as infer_schema returns it, or as a
+SchemaAccumulator (e.g. restored with from_dict from its to_dict state).
+Only the accumulator gives the same result as inferring from all the
+records again: finalize() fills in the default type ["null", "string"] for
+the properties and the array items without any non-null value so far, and
+in a schema they are read back as strings, which the new values then widen
+to string.
+
+A change is a dict:
+- path: Path of the property in the schema, as fix_type's dict_path, e.g.
+  ["properties", "address", "properties", "zip"] or
+  ["properties", "tags", "items"]
+- change: One of CHANGES
+  - added / removed: The property is only in the new / the old schema
+  - widened: The type was widened as the inference does: integer to number,
+    any type to string, or null only to any type
+  - type_changed: Any other change of the type
+  - nullable / not_nullable: Null became valid / invalid
+  - format_dropped / format_changed: The format was removed / is different
+- from / to: The old and the new (sub-)schema for added and removed, the
+  type for the changes of the type and the format for those of the format
+
+The properties of a property whose type changed are not compared, as they
+are dropped when the type is widened.
+"""
+import logging
+
+from . import impl
+from .sampling import DEFAULT_SAMPLE_SIZE
+
+LOGGER = logging.getLogger(__name__)
+
+CHANGES = ["added", "removed", "widened", "type_changed", "nullable",
+           "not_nullable", "format_dropped", "format_changed"]
+
+
+def _type_of(schema):
+    """Return the non-null type names (a tuple) and whether null is valid"""
+    obj_type = schema.get("type")
+    if obj_type is None:
+        return (), True
+    if type(obj_type) is not list:
+        obj_type = [obj_type]
+    return (tuple(sorted(name for name in obj_type if name != "null")),
+            "null" in obj_type)
+
+
+def _widens(old, new):
+    """Whether the inference widens the type names old to new"""
+    if not old:
+        return True
+    if new == ("string",):
+        return True
+    return old == ("integer",) and new == ("number",)
+
+
+def diff_schemas(old, new):
+    """Compare two schemas and return the list of the changes from old to
+    new, the properties in the order of the schemas
+    """
+    changes = []
+    stack = [(old, new, [])]
+    while stack:
+        old, new, path = stack.pop()
+        if not old and not new:
+            continue
+        if not old:
+            changes.append({"path": path, "change": "added", "from": None,
+                            "to": new})
+            continue
+        if not new:
+            changes.append({"path": path, "change": "removed", "from": old,
+                            "to": None})
+            continue
+
+        old_names, old_nullable = _type_of(old)
+        new_names, new_nullable = _type_of(new)
+        if old_names != new_names:
+            changes.append({
+                "path": path,
+                "change": ("widened" if _widens(old_names, new_names)
+                           else "type_changed"),
+                "from": old.get("type"), "to": new.get("type")})
+        elif old_nullable != new_nullable:
+            changes.append({
+                "path": path,
+                "change": "nullable" if new_nullable else "not_nullable",
+                "from": old.get("type"), "to": new.get("type")})
+        if old.get("format") != new.get("format"):
+            changes.append({
+                "path": path,
+                "change": ("format_changed" if new.get("format")
+                           else "format_dropped"),
+                "from": old.get("format"), "to": new.get("format")})
+        if old_names != new_names:
+            continue
+
+        children = []
+        old_properties = old.get("properties") or {}
+        new_properties = new.get("properties") or {}
+        for key, sub_schema in new_properties.items():
+            children.append((old_properties.get(key), sub_schema,
+                             path + ["properties", key]))
+        for key, sub_schema in old_properties.items():
+            if key not in new_properties:
+                children.append((sub_schema, None,
+                                 path + ["properties", key]))
+        if old.get("items") or new.get("items"):
+            children.append((old.get("items"), new.get("items"),
+                             path + ["items"]))
+        # Keep the order of the properties
+        stack.extend(reversed(children))
+    return changes
+
+
+def _options(schema, options):
+    """The options of the accumulator, or the ones given for a schema"""
+    if isinstance(schema, impl.SchemaAccumulator):
+        return schema._options()
+    return options
+
+
+def _evolve(schema, batch):
+    if isinstance(schema, impl.SchemaAccumulator):
+        acc = schema
+        old = acc.finalize() if acc._root is not None else None
+    else:
+        acc = impl.SchemaAccumulator(**batch._options())
+        acc.schema = schema
+        old = schema
+    acc.merge(batch)
+    evolved = acc.finalize()
+    changes = diff_schemas(old, evolved)
+    LOGGER.info(f"{len(changes)} changes to the schema")
+    return evolved, changes
+
+
+def evolve_schema(schema, records, record_level=None, lower=False,
+                  replace_special=False, snake_case=False, workers=1,
+                  on_key_collision="warn", array_items=1):
+    """Widen the schema so it also fits the records, and return the evolved
+    schema and the list of the changes (see diff_schemas).
+    - schema: The schema to start from, as infer_schema returns it, or a
+      SchemaAccumulator, which is grown with the records in place
+    - records: A record or a list (or an iterable) of the new records
+    The other options are the same as infer_schema's, and should be the ones
+    the schema was inferred with. An accumulator's own options are used.
+    """
+    if type(records) is dict:
+        records = [records]
+    options = _options(schema, {
+        "record_level": record_level,
+        "lower": lower,
+        "replace_special": replace_special,
+        "snake_case": snake_case,
+        "on_key_collision": on_key_collision,
+        "array_items": array_items,
+    })
+    batch = impl._accumulate(records, workers, **options)
+    return _evolve(schema, batch)
+
+
+def evolve_from_file(filename, schema, fmt="json", skip=0, lower=False,
+                     replace_special=False, snake_case=False, workers=1,
+                     array_items=1):
+    """evolve_schema with the new records read from a file of the format
+    (json, ndjson, yaml, csv), as infer_from_file reads them
+    """
+    options = _options(schema, {
+        "lower": lower,
+        "replace_special": replace_special,
+        "snake_case": snake_case,
+        "array_items": array_items,
+    })
+    batch = impl._accumulate_file(filename, fmt, skip, workers, None,
+                                  DEFAULT_SAMPLE_SIZE, **options)
+    return _evolve(schema, batch)
@@ -0,0 +1,471 @@
+import functools, itertools, sys
+
+from . import lattice, stats
+from .impl import (_CONFORMING_TYPES, KEY_COLLISION_POLICIES, _convert_key,
+                   _fix_node, _is_datetime, _on_invalid_property,
+                   _on_key_collision)
+
+INVALID_ACTIONS = ["raise", "null", "force"]
+BATCH_SIZE = 1000
+_BOOLEANS = {"true": True, "false": False}
+# Schemas nested deeper than the recursion limit / MAX_DEPTH_RATIO levels are
+# not compiled. A level takes about two frames, and the rest is left for the
+# caller's stack.
+MAX_DEPTH_RATIO = 4
+
+
+def _raiser(exc):
+    """Defer an error found while compiling until the node is visited,
+    as fix_type only raises when it reaches the offending node.
+    """
+    exc_type = type(exc)
+    args = exc.args
+
+    def fix(obj):
+        raise exc_type(*args)
+    fix.fix_column = _column_fixer(fix)
+    return fix
+
+
+def _column_fixer(fix, cast=None):
+    """Return a function that converts all the values of a column.
+    When cast is given, try converting the whole column with it at once and
+    go value by value only when there are nulls or invalid values.
+    """
+    if cast is None:
+        def fix_column(values):
+            return list(map(fix, values))
+        return fix_column
+
+    def fix_column(values):
+        if None not in values:
+            try:
+                return list(map(cast, values))
+            except (ValueError, TypeError):
+                pass
+        return list(map(fix, values))
+    return fix_column
+
+
+def _boolean_column_fixer(fix):
+    def fix_column(values):
+        cleaned = list(map(_BOOLEANS.get, map(str.lower, map(str, values))))
+        if None in cleaned:
+            return list(map(fix, values))
+        return cleaned
+    return fix_column
+
+
+def _compile_unknown(locate, opts):
+    policy = opts["on_invalid_property"]
+
+    def fix(obj):
+        if policy == "raise":
+            raise ValueError("Unknown property found at: %s" % locate())
+        return None
+    fix.fix_column = _column_fixer(fix)
+    return fix
+
+
+def _compile_object(locate, nullable, opts, children):
+    raise_null = not nullable and opts["on_invalid_property"] == "raise"
+    raise_unknown = opts["on_invalid_property"] == "raise"
+    drop = opts["drop_unknown_properties"]
+    lower = opts["lower"]
+    replace_special = opts["replace_special"]
+    snake_case = opts["snake_case"]
+    collision_policy = opts["on_key_collision"]
+    # Unknown keys may collide with any key when the keys are converted
+    convert_keys = bool(lower or replace_special or snake_case)
+
+    props = {}
+    new_key_counts = {}
+    for key, fixer in children.items():
+        new_key = _convert_key(key, lower, replace_special, snake_case)
+        new_key_counts[new_key] = new_key_counts.get(new_key, 0) + 1
+        props[key] = (new_key, fixer)
+    # Only the keys converted to the same key as another one need a check
+    for key, (new_key, fixer) in props.items():
+        check = convert_keys and (new_key_counts[new_key] > 1 or not drop)
+        props[key] = (new_key, fixer, check)
+    props_get = props.get
+
+    def fix(obj):
+        if obj is None:
+            if raise_null:
+                raise ValueError("Null object given at %s" % locate())
+            return None
+        if type(obj) is not dict:
+            raise KeyError("property type (object) Expected a dict object." +
+                           "Got: %s %s at %s" % (type(obj), str(obj), locate()))
+        return fill(dict(), obj.items())
+
+    def fill(cleaned, items):
+        for key, value in items:
+            entry = props_get(key)
+            if entry is None:
+                if drop:
+                    continue
+                if raise_unknown:
+                    dict_path = locate()
+                    raise Exception(
+                        "Unknown property found at: %s at %s" %
+                        (dict_path + ["properties", key], dict_path))
+                new_key = _convert_key(key, lower, replace_special, snake_case)
+                if new_key in cleaned:
+                    _on_key_collision(collision_policy, key, new_key,
+                                      locate())
+                cleaned[new_key] = None
+                continue
+            new_key, fixer, check = entry
+            try:
+                value = fixer(value)
+            except Exception as e:
+                raise Exception(f"{str(e)} at {locate()}")
+            if check and new_key in cleaned:
+                _on_key_collision(collision_policy, key, new_key, locate())
+            cleaned[new_key] = value
+        return cleaned
+
+    if opts["passthrough"]:
+        convert = fix
+
+        def fix(obj):
+            if type(obj) is not dict:
+                return convert(obj)
+            # Keep obj until a property is converted, then copy the ones
+            # before and convert the rest
+            count = 0
+            for key, value in obj.items():
+                entry = props_get(key)
+                if entry is None or entry[0] != key:
+                    break
+                try:
+                    fixed = entry[1](value)
+                except Exception as e:
+                    raise Exception(f"{str(e)} at {locate()}")
+                if fixed is not value:
+                    break
+                count += 1
+            else:
+                return obj
+            cleaned = dict(itertools.islice(obj.items(), count))
+            if entry is not None and entry[0] == key:
+                # Already converted
+                cleaned[key] = fixed
+                count += 1
+            return fill(cleaned, itertools.islice(obj.items(), count, None))
+    fix.properties = props
+    fix.fix_column = _column_fixer(fix)
+    return fix
+
+
+def _compile_array(locate, nullable, opts, item_fixer):
+    raise_null = not nullable and opts["on_invalid_property"] == "raise"
+
+    def fix(obj):
+        if obj is None:
+            if raise_null:
+                raise ValueError("Null object given at %s" % locate())
+            return None
+        assert(type(obj) is list)
+        return fill(list(), obj)
+
+    def fill(cleaned, items):
+        append = cleaned.append
+        for o in items:
+            try:
+                ret = item_fixer(o)
+            except Exception as e:
+                raise Exception(f"{str(e)} at {locate()}")
+            if ret is not None:
+                append(ret)
+        return cleaned
+
+    if opts["passthrough"]:
+        convert = fix
+
+        def fix(obj):
+            if type(obj) is not list:
+                return convert(obj)
+            for index, o in enumerate(obj):
+                try:
+                    ret = item_fixer(o)
+                except Exception as e:
+                    raise Exception(f"{str(e)} at {locate()}")
+                # Null items are dropped
+                if ret is not o or ret is None:
+                    break
+            else:
+                return obj
+            cleaned = obj[:index]
+            if ret is not None:
+                cleaned.append(ret)
+            return fill(cleaned, itertools.islice(obj, index + 1, None))
+    fix.fix_column = _column_fixer(fix)
+    return fix
+
+
+def _compile_leaf(node, locate, opts):
+    policy = opts["on_invalid_property"]
+    raise_null = not node.nullable and policy == "raise"
+    date_to_datetime = opts["date_to_datetime"]
+    obj_type = lattice.TYPE_NAMES.get(node.type)
+
+    def on_invalid(obj, err_msg):
+        dict_path = (locate() if policy == "raise" or stats.current is not None
+                     else None)
+        return _on_invalid_property(policy, dict_path, obj_type, obj, err_msg)
+
+    if node.format == lattice.DATE_TIME:
+        def convert(obj):
+            cleaned = str(obj)
+            # Just test parsing for now as in fix_type
+            if not _is_datetime(cleaned):
+                cleaned = on_invalid(
+                    cleaned, err_msg="Not in a valid datetime format")
+            elif date_to_datetime and len(cleaned) == 10:  # "2023-10-19"
+                cleaned += " 00:00:00.000"
+            return cleaned
+    elif node.type == lattice.STRING:
+        convert = str
+    elif node.type in (lattice.NUMBER, lattice.INTEGER):
+        cast = float if node.type == lattice.NUMBER else int
+
+        def convert(obj):
+            try:
+                return cast(obj)
+            except ValueError as e:
+                return on_invalid(obj, err_msg=str(e))
+    elif node.type == lattice.BOOLEAN:
+        def convert(obj):
+            value = str(obj).lower()
+            if value == "true":
+                return True
+            if value == "false":
+                return False
+            return on_invalid(
+                obj, err_msg=(str(obj) + " is not a valid value for boolean type"))
+    else:
+        def convert(obj):
+            node.raise_error()
+
+    def fix(obj):
+        if obj is None:
+            if raise_null:
+                raise ValueError("Null object given at %s" % locate())
+            return None
+        return convert(obj)
+
+    conforming = _CONFORMING_TYPES.get(node.type)
+    if (opts["passthrough"] and conforming is not None and
+            node.format != lattice.DATE_TIME):
+        convert_obj = fix
+
+        def fix(obj):
+            if type(obj) is conforming:
+                return obj
+            return convert_obj(obj)
+
+    if node.type == lattice.STRING and node.format != lattice.DATE_TIME:
+        fix.fix_column = _column_fixer(fix, str)
+    elif node.type == lattice.NUMBER:
+        fix.fix_column = _column_fixer(fix, float)
+    elif node.type == lattice.INTEGER:
+        fix.fix_column = _column_fixer(fix, int)
+    elif node.type == lattice.BOOLEAN:
+        fix.fix_column = _boolean_column_fixer(fix)
+    else:
+        fix.fix_column = _column_fixer(fix)
+    return fix
+
+
+def _compile(root, dict_path, opts):
+    """Compile the nodes breadth first without recursion, then build the
+    fixers from the deepest nodes up as a fixer needs its children's.
+    Returns the fixer and the deepest level of objects and arrays.
+    """
+    drop = opts["drop_unknown_properties"]
+    # (node, index of the parent, dict_path from the parent, level)
+    nodes = [(root, None, dict_path, 0)]
+    # Indexes of the children
+    compiled = []
+
+    def path_of(index):
+        # Built only for the error messages, as it is as long as the level
+        segments = []
+        while index is not None:
+            _, index, segment, _ = nodes[index]
+            segments.append(segment)
+        return list(itertools.chain.from_iterable(reversed(segments)))
+
+    for node, _, _, level in nodes:
+        index = len(compiled)
+        children = None
+        if node is None:
+            pass
+        elif node.type == lattice.OBJECT:
+            children = {}
+            for key, sub_node in (node.properties or {}).items():
+                # fix_type looks up the schema with the original
+                # (unconverted) key
+                if drop and lattice.is_unknown(sub_node):
+                    continue
+                children[key] = len(nodes)
+                nodes.append((sub_node, index, ("properties", key),
+                              level + 1))
+        elif node.type == lattice.ARRAY:
+            children = len(nodes)
+            nodes.append((node.items, index, ("items",), level + 1))
+        compiled.append(children)
+
+    fixers = [None] * len(nodes)
+    for index in range(len(nodes) - 1, -1, -1):
+        node = nodes[index][0]
+        children = compiled[index]
+        locate = functools.partial(path_of, index)
+        if node is None:
+            fixers[index] = _compile_unknown(locate, opts)
+        elif node.type == lattice.UNSUPPORTED and node.nullable is None:
+            fixers[index] = _raiser(node.error)
+        elif node.type == lattice.OBJECT:
+            fixers[index] = _compile_object(
+                locate, node.nullable, opts,
+                {key: fixers[i] for key, i in children.items()})
+        elif node.type == lattice.ARRAY:
+            fixers[index] = _compile_array(locate, node.nullable, opts,
+                                           fixers[children])
+        else:
+            fixers[index] = _compile_leaf(node, locate, opts)
+    return fixers[0], nodes[-1][3]
+
+
+def compile_fixer(
+        schema,
+        on_invalid_property="raise",
+        drop_unknown_properties=False,
+        lower=False,
+        replace_special=False,
+        snake_case=False,
+        date_to_datetime=False,
+        on_key_collision="warn",
+        passthrough=False,
+    ):
+    """Compile the schema into a function that converts a record the same
+    way as fix_type does. The schema is walked only once, so this is
+    preferred over fix_type when many records share the same schema.
+    e.g.
+      fixer = compile_fixer(schema, on_invalid_property="null")
+      cleaned = [fixer(record) for record in records]
+
+    The options are the same as fix_type's. With passthrough, the objects
+    and arrays that need no conversion are kept as they are, and only the
+    ones that do are copied, so already typed records allocate little.
+    Changes made to the schema after compiling are not reflected.
+    Schemas nested too deep for the compiled functions to call each other
+    are converted with fix_type.
+    """
+    if on_invalid_property not in INVALID_ACTIONS:
+        raise ValueError(
+            "on_invalid_property is not one of %s" % INVALID_ACTIONS)
+    if on_key_collision not in KEY_COLLISION_POLICIES:
+        raise ValueError(
+            "on_key_collision is not one of %s" % KEY_COLLISION_POLICIES)
+    opts = {
+        "on_invalid_property": on_invalid_property,
+        "drop_unknown_properties": drop_unknown_properties,
+        "lower": lower,
+        "replace_special": replace_special,
+        "snake_case": snake_case,
+        "date_to_datetime": date_to_datetime,
+        "on_key_collision": on_key_collision,
+        "passthrough": passthrough,
+    }
+    root = lattice.compile_schema(schema)
+    fixer, depth = _compile(root, [], opts)
+    if depth > sys.getrecursionlimit() // MAX_DEPTH_RATIO:
+        # The compiled fixers call each other once per level. Deeper schemas
+        # go through fix_type, which does not recurse.
+        def fixer(obj):
+            return _fix_node(obj, root, [], **opts)
+    fixer.drop_unknown_properties = drop_unknown_properties
+    fixer.passthrough = passthrough
+    return fixer
+
+
+def _fix_batch(batch, fixer):
+    if stats.current is not None:
+        return stats.current.fix(len(batch), _convert_batch, batch, fixer)
+    return _convert_batch(batch, fixer)
+
+
+def _convert_batch(batch, fixer):
+    """Convert the records column by column when they are dicts with the same
+    keys in the same order. Otherwise, or when anything goes wrong, convert
+    them record by record so that the result and the errors are exactly the
+    same as fix_type's.
+    """
+    properties = getattr(fixer, "properties", None)
+    if properties is None or type(batch[0]) is not dict:
+        return list(map(fixer, batch))
+    if fixer.passthrough:
+        first = fixer(batch[0])
+        if first is batch[0]:
+            # The records already have the types. The columns would copy
+            # them all.
+            rest = itertools.islice(batch, 1, None)
+            return [first] + list(map(fixer, rest))
+    keys = tuple(batch[0])
+    for record in batch:
+        if type(record) is not dict or tuple(record) != keys:
+            return list(map(fixer, batch))
+
+    new_keys = []
+    fixers = []
+    for key in keys:
+        entry = properties.get(key)
+        if entry is None:
+            # Dropped or unknown. Let the record by record path handle the
+            # unknown properties.
+            if not fixer.drop_unknown_properties:
+                return list(map(fixer, batch))
+            fixers.append(None)
+            continue
+        new_keys.append(entry[0])
+        fixers.append(entry[1])
+    if not new_keys:
+        return [dict() for _ in batch]
+    if len(set(new_keys)) < len(new_keys):
+        # Let the record by record path report the collisions
+        return list(map(fixer, batch))
+
+    columns = []
+    try:
+        for fix, values in zip(fixers, zip(*[r.values() for r in batch])):
+            if fix is not None:
+                columns.append(fix.fix_column(values))
+    except Exception:
+        return list(map(fixer, batch))
+    return [dict(zip(new_keys, row)) for row in zip(*columns)]
+
+
+def iter_fix_types(records, schema, batch_size=BATCH_SIZE, **kwargs):
+    """Generator version of fix_types for streaming the records.
+    The records are converted batch_size records at a time.
+    """
+    fixer = compile_fixer(schema, **kwargs)
+    it = iter(records)
+    while True:
+        batch = list(itertools.islice(it, batch_size))
+        if not batch:
+            return
+        yield from _fix_batch(batch, fixer)
+
+
+def fix_types(records, schema, batch_size=BATCH_SIZE, **kwargs):
+    """Convert a list of records the same way as fix_type does for each.
+    Flat records sharing the same keys are converted column by column, with
+    one pass per property over all the values.
+    - kwargs: Same as fix_type's options
+    """
+    return list(iter_fix_types(records, schema, batch_size, **kwargs))
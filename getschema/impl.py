@@ -1,34 +1,118 @@
 #!/usr/bin/env python3
-import argparse, csv, datetime, logging, os, re, sys
-from dateutil import parser as dateutil_parser
-from dateutil.tz import tzoffset
-import jsonpath_ng as jsonpath
-import simplejson as json
-import yaml
+import csv, datetime, functools, itertools, json, logging, os, re, sys
+import threading
+
+from . import lattice, sampling, stats
+from .dates import detect_format, is_datetime_str, parse_datetime
+from .readers import (iter_json_array, mappable, open_input, open_json,
+                      open_ndjson, open_text_lines)
+from .sampling import DEFAULT_SAMPLE_SIZE, SAMPLING_METHODS
 
 # JSON schema follows:
 # https://json-schema.org/
 COMMAND = "json2schema"
 
 LOGGER = logging.getLogger(__name__)
-DEFAULT_TYPE = ["null", "string"]
+DEFAULT_TYPE = lattice.DEFAULT_TYPE
+JSONPATH_CACHE_SIZE = 256
+KEY_CACHE_SIZE = 1 << 16
+KEY_COLLISION_POLICIES = ["ignore", "warn", "raise"]
+SCHEMA_CACHE_SIZE = 64
 
+_SPECIAL_CHARS = re.compile('[^ a-zA-Z0-9_]')
+# id of the schema -> lattice.lookup_lazy's entry for fix_type, the least
+# recently used first
+_schema_nodes_cache = {}
+_schema_nodes_lock = threading.Lock()
 
-def _convert_key(old_key, lower=False, replace_special=False, snake_case=False):
+
+@functools.lru_cache(maxsize=KEY_CACHE_SIZE)
+def _normalize_key(old_key, lower, replace_special, snake_case):
     new_key = old_key
     if lower:
         new_key = new_key.lower()
     if replace_special:
-        new_key = re.sub('[^ a-zA-Z0-9_]', '_', new_key)
+        new_key = _SPECIAL_CHARS.sub('_', new_key)
     if snake_case:
         new_key = new_key.strip().replace(" ", "_")
     return new_key
 
 
-def _get_jsonpath(raw, path):
+def _convert_key(old_key, lower=False, replace_special=False, snake_case=False):
+    # Datasets reuse a small set of key names, so remember the results
+    if not (lower or replace_special or snake_case):
+        return old_key
+    return _normalize_key(old_key, bool(lower), bool(replace_special),
+                          bool(snake_case))
+
+
+@functools.lru_cache(maxsize=KEY_CACHE_SIZE)
+def _warn_key_collision(message):
+    # Cached so the same collision is logged only once
+    LOGGER.warning(message)
+
+
+def _on_key_collision(policy, key, new_key, dict_path):
+    """Another key in the same object was already converted to new_key"""
+    if policy == "ignore":
+        return
+    message = ("Key %s is converted to %s, which another key at %s is also "
+               "converted to. Only one of them is kept." %
+               (repr(key), repr(new_key), dict_path))
+    if policy == "warn":
+        _warn_key_collision(message)
+    elif policy == "raise":
+        raise ValueError(message)
+    else:
+        raise ValueError("Unknown policy: %s" % policy)
+
+
+_NOT_FOUND = object()
+_SIMPLE_JSONPATH = re.compile(
+    r"(\$\.)?[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+# Keywords of jsonpath-ng (or of its extensions). A path with them is left
+# to jsonpath-ng, which may reject it or read it differently from a field.
+_JSONPATH_KEYWORDS = frozenset(["where", "wherenot", "and", "or", "in", "not"])
+
+
+def _simple_jsonpath_finder(keys):
+    def find(raw):
+        for key in keys:
+            # Same as jsonpath_ng's Fields
+            try:
+                raw = raw.get(key, _NOT_FOUND)
+            except (TypeError, AttributeError):
+                return []
+            if raw is _NOT_FOUND:
+                return []
+        return [raw]
+    return find
+
+
+@functools.lru_cache(maxsize=JSONPATH_CACHE_SIZE)
+def _compile_jsonpath(path):
+    """Return a function that finds the values matching the path.
+    Simple dotted paths such as $.data.items don't go through jsonpath_ng.
+    """
+    if path == "$":
+        return lambda raw: [raw]
+    if _SIMPLE_JSONPATH.match(path):
+        keys = (path[2:] if path.startswith("$.") else path).split(".")
+        if _JSONPATH_KEYWORDS.isdisjoint(keys):
+            return _simple_jsonpath_finder(keys)
+    # jsonpath-ng builds its parser tables on import
+    import jsonpath_ng as jsonpath
     jsonpath_expr = jsonpath.parse(path)
-    record = [match.value for match in jsonpath_expr.find(raw)]
-    return record
+    return lambda raw: [match.value for match in jsonpath_expr.find(raw)]
+
+
+def jsonpath_cache_info():
+    """Hits and misses of the cache of the compiled jsonpath expressions"""
+    return _compile_jsonpath.cache_info()._asdict()
+
+
+def _get_jsonpath(raw, path):
+    return _compile_jsonpath(path)(raw)
 
 
 def _is_datetime(obj):
@@ -36,139 +120,22 @@ def _is_datetime(obj):
     return (
         type(obj) is datetime.datetime or
         type(obj) is datetime.date or
-        (type(obj) is str and
-         re.match("(19|20)\d\d-(0[1-9]|1[012])-([1-9]|0[1-9]|[12][0-9]|3[01])",
-                  obj) is not None)
+        (type(obj) is str and is_datetime_str(obj))
     )
 
 
-def _do_infer_schema(obj, record_level=None, lower=False,
-                     replace_special=False, snake_case=False):
-    schema = dict()
-
-    # Go down to the record level if specified
-    if record_level:
-        obj = _get_jsonpath(obj, record_level)[0]
-
-    schema["type"] = DEFAULT_TYPE
-    if type(obj) is dict and obj.keys():
-        schema["type"] = ["null", "object"]
-        schema["properties"] = dict()
-        for key in obj.keys():
-            ret = _do_infer_schema(obj[key])
-            new_key = _convert_key(
-                key, lower=lower, replace_special=replace_special,
-                snake_case=snake_case)
-            if ret:
-                schema["properties"][new_key] = ret
-
-    elif type(obj) is list:
-        schema["type"] = ["null", "array"]
-        if not obj:
-            schema["items"] = None
-        # TODO: Check more than the first record
-        else:
-            ret = _do_infer_schema(
-                obj[0], lower=lower, replace_special=replace_special,
-                snake_case=snake_case)
-            schema["items"] = ret
-    else:
-        try:
-            float(obj)
-        except (ValueError, TypeError):
-            schema["type"] = ["null", "string"]
-            if _is_datetime(obj):
-                schema["format"] = "date-time"
-        else:
-            if type(obj) == bool:
-                schema["type"] = ["null", "boolean"]
-            elif type(obj) == float or (type(obj) == str and "." in obj):
-                schema["type"] = ["null", "number"]
-            # Let's assume it's a code such as zipcode if there is a leading 0
-            elif type(obj) == int or (type(obj) == str and obj[0] != "0"):
-                schema["type"] = ["null", "integer"]
-            else:
-                schema["type"] = DEFAULT_TYPE
-    return schema
-
-
-def _compare_props(prop1, prop2):
-    if not prop2 or prop2.get("type") == ["null"]:
-        return prop1
-    elif not prop1 or prop1.get("type") == ["null"]:
-        return prop2
-    prop = prop2
-    t1 = prop1["type"]
-    t2 = prop2["type"]
-    f1 = prop1.get("format")
-    f2 = prop2.get("format")
-    if t1[1] == "object":
-        if t1[1] != t2[1]:
-            raise ValueError(
-                "While traversing object %s, two records differ in types: %s %s" %
-                (prop, t1[1], t2[1]))
-        for key in prop["properties"]:
-            prop["properties"][key] = _compare_props(
-                prop1["properties"].get(key), prop2["properties"].get(key))
-    if t1[1] == "array":
-        if t1[1] != t2[1]:
-            raise ValueError(
-                "While traversing array %s, two records differ in types: %s %s" %
-                       (prop, t1[1], t2[1]))
-        prop["items"] = _compare_props(prop1["items"], prop2["items"])
-
-    numbers = ["integer", "number"]
-    if not (t1[1] == t2[1] and f1 == f2):
-        if t1[1] in numbers and t2[1] in numbers:
-            prop["type"] = ["null", "number"]
-        else:
-            prop["type"] = ["null", "string"]
-            if "format" in prop.keys():
-                prop.pop("format")
-
-    return prop
+# Kinds of the frames on the explicit stacks
+_OBJECT = 0
+_ARRAY = 1
+_NO_KEY = object()
 
 
-def _infer_from_two(schema1, schema2):
-    """
-    Compare between currently the most conservative and the new record schemas
-    and keep the more conservative one.
-    """
-    if schema1 is None:
-        return schema2
-    if schema2 is None:
-        return schema1
-    schema = schema2
-    for key in schema1["properties"]:
-        prop1 = schema1["properties"][key]
-        prop2 = schema2["properties"].get(key, prop1)
-        try:
-            schema["properties"][key] = _compare_props(prop1, prop2)
-        except Exception as e:
-            raise Exception("Key: %s\n%s" % (key, e))
-    return schema
-
-
-def _replace_null_type(schema, path=""):
-    new_schema = {}
-    new_schema.update(schema)
-    if schema["type"] in ("object", ["object"], ["null", "object"]):
-        new_schema ["properties"] = {}
-        for key in schema.get("properties", {}).keys():
-            new_path = path + "." + key
-            new_schema["properties"][key] = _replace_null_type(schema["properties"][key], new_path)
-    elif schema["type"] == ["null", "array"]:
-        if not schema.get("items"):
-            new_schema["items"] = {}
-        if new_schema["items"].get("type") in (None, "null", ["null"]):
-            LOGGER.warning(
-                f"{path} is an array without non-null values."
-                f"Replacing with the default {DEFAULT_TYPE}")
-            new_schema["items"]["type"] = DEFAULT_TYPE
-    elif schema["type"] == ["null"]:
-        LOGGER.warning(f"{path} contained non-null values only. Replacing with the default {DEFAULT_TYPE}")
-        new_schema["type"] = DEFAULT_TYPE
-    return new_schema
+def _new_key(properties, key, lower, replace_special, snake_case,
+             on_key_collision, dict_path=[]):
+    new_key = _convert_key(key, lower, replace_special, snake_case)
+    if new_key in properties:
+        _on_key_collision(on_key_collision, key, new_key, dict_path)
+    return new_key
 
 
 def _nested_get(input_dict, nested_key):
@@ -180,14 +147,33 @@ def _nested_get(input_dict, nested_key):
     return internal_dict_value
 
 
+def _schema_nodes(schema):
+    """The lattice.LazyNode of the schema, cached for the schemas fix_type is
+    called with again and again. Only the parts of the schema the records
+    visit are compiled and checked for the changes made in place. The cache
+    is shared by the threads.
+    """
+    if schema is None:
+        return None
+    key = id(schema)
+    with _schema_nodes_lock:
+        entry = _schema_nodes_cache.get(key)
+        fresh = lattice.lookup_lazy(entry, schema)
+        # Moved to the end as the most recently used
+        _schema_nodes_cache.pop(key, None)
+        _schema_nodes_cache[key] = fresh
+        if len(_schema_nodes_cache) > SCHEMA_CACHE_SIZE:
+            del _schema_nodes_cache[next(iter(_schema_nodes_cache))]
+    return fresh[-1]
+
+
 def _parse_datetime_tz(datetime_str, default_tz_offset=0):
-    d = dateutil_parser.parse(datetime_str)
-    if not d.tzinfo:
-        d = d.replace(tzinfo=tzoffset(None, default_tz_offset))
-    return d
+    return parse_datetime(datetime_str, default_tz_offset)
 
 
 def _on_invalid_property(policy, dict_path, obj_type, obj, err_msg):
+    if stats.current is not None:
+        stats.current.invalid_property(dict_path, policy)
     if policy == "raise":
         raise Exception(err_msg + " dict_path" + str(dict_path) +
                         " object type: " + obj_type + " object: " + str(obj))
@@ -200,91 +186,424 @@ def _on_invalid_property(policy, dict_path, obj_type, obj, err_msg):
     return cleaned
 
 
+class SchemaAccumulator(object):
+    """Infer a schema incrementally.
+    - add(record) / add_many(records): Fold the records into the schema
+    - merge(other): Merge another accumulator with the same options, e.g. one
+      built from another shard of the data. The order of the merges does not
+      change the result.
+    - finalize(): Return the schema. The accumulator can keep growing after.
+    - to_dict() / from_dict(state): Save and restore the state, e.g. to
+      resume the inference when a new batch lands.
+
+    The options are the same as infer_schema's.
+    """
+    def __init__(self, record_level=None, lower=False, replace_special=False,
+                 snake_case=False, on_key_collision="warn", array_items=1):
+        if on_key_collision not in KEY_COLLISION_POLICIES:
+            raise ValueError("on_key_collision is not one of %s" %
+                             KEY_COLLISION_POLICIES)
+        self.record_level = record_level
+        self.lower = lower
+        self.replace_special = replace_special
+        self.snake_case = snake_case
+        self.on_key_collision = on_key_collision
+        self.array_items = array_items
+        # The schema is kept as lattice nodes, merged with the records in place
+        self._root = None
+        self.count = 0
+
+    @property
+    def schema(self):
+        """The schema before finalize() in JSON Schema (a copy)"""
+        return lattice.to_schema(self._root, root=True)
+
+    @schema.setter
+    def schema(self, schema):
+        self._root = lattice.from_schema(schema)
+
+    def _options(self):
+        return {
+            "record_level": self.record_level,
+            "lower": self.lower,
+            "replace_special": self.replace_special,
+            "snake_case": self.snake_case,
+            "on_key_collision": self.on_key_collision,
+            "array_items": self.array_items,
+        }
+
+    def _convert_keys(self, record, dict_path=[]):
+        converted = {}
+        for key, value in record.items():
+            converted[_new_key(converted, key, self.lower,
+                               self.replace_special, self.snake_case,
+                               self.on_key_collision, dict_path)] = value
+        return converted
+
+    def _convert_items(self, items):
+        """Convert the keys of the objects in the array, and in the arrays in
+        it, as far as the items are inferred from.
+        """
+        limit = self.array_items
+        result = []
+        # (items, converted items, dict_path of the items)
+        stack = [(iter(items[:limit]), result, ["items"])]
+        while stack:
+            items, converted, dict_path = stack[-1]
+            for item in items:
+                if type(item) is dict:
+                    item = self._convert_keys(item, dict_path)
+                elif type(item) is list:
+                    converted.append([])
+                    stack.append((iter(item[:limit]), converted[-1],
+                                  dict_path + ["items"]))
+                    break
+                converted.append(item)
+            else:
+                stack.pop()
+        return result
+
+    def _merge(self, record):
+        """Merge a record into the schema in place. Returns whether the schema
+        changed.
+        """
+        convert = self.lower or self.replace_special or self.snake_case
+        root = self._root
+        if type(record) is not dict or not record:
+            # record_level may point at an array or a value. The first record
+            # is the root as it is, and the later ones have no properties to
+            # merge into it.
+            if type(record) is list and convert:
+                record = self._convert_items(record)
+            if root is None or self.array_items != 1:
+                # Also checks the array items against each other
+                built = {}
+                lattice.merge_value(built, None, record, _is_datetime,
+                                    self.array_items)
+                if root is None:
+                    self._root = built[None]
+                    return True
+            if root.properties is None:
+                root.properties = {}
+            return False
+
+        changed = False
+        if root is None:
+            root = self._root = lattice.Node(lattice.OBJECT, properties={})
+            changed = True
+        elif root.properties is None:
+            # An empty record does not have properties
+            root.properties = {}
+
+        properties = root.properties
+        if self.array_items == 1:
+            if convert:
+                record = self._convert_keys(record)
+            for key, value in record.items():
+                try:
+                    if lattice.merge_value(properties, key, value,
+                                           _is_datetime):
+                        changed = True
+                except Exception as e:
+                    raise Exception("Key: %s\n%s" % (key, e))
+            return changed
+
+        # Check the items of the arrays against each other before merging
+        nodes = {}
+        for key, value in record.items():
+            if not convert:
+                lattice.merge_value(nodes, key, value, _is_datetime,
+                                    self.array_items)
+                continue
+            built = {}
+            lattice.merge_value(built, None, value, _is_datetime,
+                                self.array_items)
+            new_key = _new_key(nodes, key, self.lower, self.replace_special,
+                               self.snake_case, self.on_key_collision)
+            # The last of the colliding keys is kept
+            nodes[new_key] = built[None]
+        for key, node in nodes.items():
+            try:
+                if lattice.merge_node(properties, key, node):
+                    changed = True
+            except Exception as e:
+                raise Exception("Key: %s\n%s" % (key, e))
+        return changed
+
+    def add(self, record):
+        return self.add_many([record])
+
+    def add_many(self, records, patience=None):
+        """Fold the records into the schema.
+        - patience: If set, stop reading the records once this many records
+          in a row did not change the schema.
+        """
+        count = self.count
+        stale = 0
+        collector = stats.current
+        try:
+            # Go through the objects and find the most safe type assumption
+            for o in records:
+                if type(o) is not dict:
+                    raise ValueError("Input must be a dict object.")
+                # Go down to the record level if specified
+                if self.record_level:
+                    o = _get_jsonpath(o, self.record_level)[0]
+                if collector is None:
+                    changed = self._merge(o)
+                else:
+                    changed = collector.merge(self, o)
+                count += 1
+                if patience is not None:
+                    stale = 0 if changed else stale + 1
+                    if stale >= patience:
+                        LOGGER.info(f"Schema did not change in the last "
+                                    f"{stale} records. Stopping at {count} "
+                                    f"records.")
+                        break
+        finally:
+            self.count = count
+        return self
+
+    def merge(self, other):
+        if self._options() != other._options():
+            raise ValueError("Cannot merge accumulators with different options")
+        if self._root is None:
+            # Don't let the two accumulators share the (mutable) nodes
+            self._root = lattice.copy_node(other._root)
+        elif other._root is not None:
+            if self._root.properties is None:
+                self._root.properties = {}
+            properties = self._root.properties
+            for key, node in (other._root.properties or {}).items():
+                try:
+                    lattice.merge_node(properties, key, node, copy=True)
+                except Exception as e:
+                    raise Exception("Key: %s\n%s" % (key, e))
+        self.count += other.count
+        return self
+
+    def finalize(self):
+        if self._root is None:
+            raise ValueError("No records found to infer the schema from.")
+        schema = lattice.to_schema(self._root, root=True, replace_null=True)
+        schema["type"] = "object"
+        LOGGER.info(f"Inference completed from {self.count} records")
+        return schema
+
+    def to_dict(self):
+        state = self._options()
+        state["schema"] = self.schema
+        state["count"] = self.count
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        acc = cls(state.get("record_level"), state.get("lower", False),
+                  state.get("replace_special", False),
+                  state.get("snake_case", False),
+                  state.get("on_key_collision", "warn"),
+                  state.get("array_items", 1))
+        acc.schema = state.get("schema")
+        acc.count = state.get("count", 0)
+        return acc
+
+
+def _accumulate(records, workers=1, sample=None,
+                sample_size=DEFAULT_SAMPLE_SIZE, **options):
+    if sample == "coverage":
+        # Sequential by nature
+        return SchemaAccumulator(**options).add_many(
+            records, patience=sample_size)
+    if sample == "head":
+        records = sampling.head(records, sample_size)
+    elif sample == "reservoir":
+        records = sampling.reservoir(records, sample_size)
+    elif sample is not None:
+        raise ValueError("Unknown sampling method: %s. Choose from %s" %
+                         (sample, SAMPLING_METHODS))
+    if workers == 1:
+        return SchemaAccumulator(**options).add_many(records)
+    from .parallel import accumulate_parallel
+    return accumulate_parallel(records, workers, **options)
+
+
+def _accumulate_object(obj, workers=1, sample=None,
+                       sample_size=DEFAULT_SAMPLE_SIZE, **options):
+    """_accumulate on a record or a list of records"""
+    if type(obj) is not list:
+        obj = [obj]
+    if type(obj[0]) is not dict:
+        raise ValueError("Input must be a dict object.")
+    return _accumulate(obj, workers, sample, sample_size, **options)
+
+
 def infer_schema(obj, record_level=None,
-                 lower=False, replace_special=False, snake_case=False):
+                 lower=False, replace_special=False, snake_case=False,
+                 workers=1, sample=None, sample_size=DEFAULT_SAMPLE_SIZE,
+                 on_key_collision="warn", array_items=1):
     """Infer schema from a given object or a list of objects
     - record_level:
     - lower: Convert the key to all lower case
     - replace_special: Replace letters to _ if not 0-9, A-Z, a-z, _ and -, or " "
     - snake_case: Replace space to _
+    - workers: Number of processes to infer with (0 for the number of CPUs)
+    - sample: Infer from a sample of the records instead of all of them
+      - head: The first sample_size records
+      - reservoir: sample_size records uniformly sampled
+      - coverage: Stop when the last sample_size records did not add any
+        new property, type or format
+    - on_key_collision: ["ignore", "warn", "raise"]
+      What to do when two keys are converted to the same key
+    - array_items: Number of items of each array to infer the item type
+      from (None for all)
     """
-    if type(obj) is not list:
-        obj = [obj]
-    if type(obj[0]) is not dict:
-        raise ValueError("Input must be a dict object.")
-    schema = None
-    # Go through the list of objects and find the most safe type assumption
-    for o in obj:
-        cur_schema = _do_infer_schema(
-            o, record_level, lower, replace_special, snake_case)
-        # Compare between currently the most conservative and the new record
-        # and keep the more conservative.
-        schema = _infer_from_two(schema, cur_schema)
+    acc = _accumulate_object(obj, workers, sample, sample_size,
+                             record_level=record_level, lower=lower,
+                             replace_special=replace_special,
+                             snake_case=snake_case,
+                             on_key_collision=on_key_collision,
+                             array_items=array_items)
+    return acc.finalize()
 
-    schema["type"] = "object"
 
-    schema = _replace_null_type(schema)
+def infer_from_json_file(filename, skip=0, lower=False, replace_special=False,
+                         snake_case=False, workers=1, sample=None,
+                         sample_size=DEFAULT_SAMPLE_SIZE, array_items=1):
+    """Infer schema from a JSON file. A top-level array is streamed element by
+    element from the memory-mapped file instead of being loaded as a whole.
+    A compressed file (gzip, bz2, xz or zstd) is decompressed as it is read.
+    """
+    return _accumulate_json_file(
+        filename, skip, workers, sample, sample_size, lower=lower,
+        replace_special=replace_special, snake_case=snake_case,
+        array_items=array_items).finalize()
+
+
+def _accumulate_json_file(filename, skip=0, workers=1, sample=None,
+                          sample_size=DEFAULT_SAMPLE_SIZE, **options):
+    with open_json(filename) as (f, is_array):
+        if is_array:
+            records = itertools.islice(iter_json_array(f), skip, None)
+            return _accumulate(records, workers, sample, sample_size,
+                               **options)
+        obj = json.load(f)
+    return _accumulate_object(obj, **options)
+
+
+def infer_from_ndjson_file(filename, skip=0, lower=False,
+                           replace_special=False, snake_case=False,
+                           workers=1, sample=None,
+                           sample_size=DEFAULT_SAMPLE_SIZE, array_items=1):
+    """Infer schema from a newline-delimited JSON file, one line at a time
+    from the memory-mapped file
+    """
+    return _accumulate_ndjson_file(
+        filename, skip, workers, sample, sample_size, lower=lower,
+        replace_special=replace_special, snake_case=snake_case,
+        array_items=array_items).finalize()
 
-    LOGGER.info(f"Inference completed from {len(obj)} records")
 
-    return schema
+def _accumulate_ndjson_file(filename, skip=0, workers=1, sample=None,
+                            sample_size=DEFAULT_SAMPLE_SIZE, **options):
+    if workers != 1 and not skip and sample is None and mappable(filename):
+        # Let each worker read its own part of the file
+        from .parallel import accumulate_ndjson_parallel
+        return accumulate_ndjson_parallel(filename, workers, **options)
+    with open_ndjson(filename) as records:
+        records = itertools.islice(records, skip, None)
+        return _accumulate(records, workers, sample, sample_size, **options)
 
 
-def infer_from_json_file(filename, skip=0, lower=False, replace_special=False,
-                         snake_case=False):
-    with open(filename, "r") as f:
-        content = f.read()
-    data = json.loads(content)
-    if type(data) is list:
-        data = data[skip:]
-    schema = infer_schema(data, lower=lower, replace_special=replace_special,
-                          snake_case=snake_case)
-
-    return schema
+def infer_from_yaml_file(filename, skip=0, lower=False, replace_special=False,
+                         snake_case=False, workers=1, sample=None,
+                         sample_size=DEFAULT_SAMPLE_SIZE, array_items=1):
+    return _accumulate_yaml_file(
+        filename, skip, workers, sample, sample_size, lower=lower,
+        replace_special=replace_special, snake_case=snake_case,
+        array_items=array_items).finalize()
 
 
-def infer_from_yaml_file(filename, skip=0, lower=False, replace_special=False,
-                         snake_case=False):
-    with open(filename, "r") as f:
+def _accumulate_yaml_file(filename, skip=0, workers=1, sample=None,
+                          sample_size=DEFAULT_SAMPLE_SIZE, **options):
+    with open_input(filename) as f:
         content = f.read()
+    import yaml
     data = yaml.load(content, Loader=yaml.FullLoader)
     if type(data) is list:
         data = data[skip:]
-    schema = infer_schema(data, lower=lower, replace_special=replace_special,
-                          snake_case=snake_case)
-
-    return schema
+    return _accumulate_object(data, workers, sample, sample_size, **options)
 
 
 def infer_from_csv_file(filename, skip=0, lower=False, replace_special=False,
-                        snake_case=False):
-    with open(filename) as f:
-        count = 0
-        while count < skip:
-            count = count + 1
-            f.readline()
-        reader = csv.DictReader(f)
-        data = [dict(row) for row in reader]
-    schema = infer_schema(data, lower=lower, replace_special=replace_special,
-                          snake_case=snake_case)
-
-    return schema
+                        snake_case=False, workers=1, sample=None,
+                        sample_size=DEFAULT_SAMPLE_SIZE, array_items=1):
+    """Infer schema from a CSV file. CSV has no arrays, so array_items is
+    there only for the same signature as the other readers.
+    """
+    return _accumulate_csv_file(
+        filename, skip, workers, sample, sample_size, lower=lower,
+        replace_special=replace_special, snake_case=snake_case,
+        array_items=array_items).finalize()
+
+
+def _accumulate_csv_file(filename, skip=0, workers=1, sample=None,
+                         sample_size=DEFAULT_SAMPLE_SIZE, record_level=None,
+                         **options):
+    with open_text_lines(filename) as lines:
+        for _ in range(skip):
+            next(lines, None)
+        if workers == 1 and sample in (None, "head") and not record_level:
+            # Infer column by column without building a dict per row
+            from .columnar import accumulate_csv
+            limit = sample_size if sample == "head" else None
+            return accumulate_csv(lines, limit=limit, **options)
+        reader = csv.DictReader(lines)
+        return _accumulate((dict(row) for row in reader), workers, sample,
+                           sample_size, record_level=record_level, **options)
 
 
 def infer_from_file(filename, fmt="json", skip=0, lower=False,
-                    replace_special=False, snake_case=False):
+                    replace_special=False, snake_case=False, workers=1,
+                    sample=None, sample_size=DEFAULT_SAMPLE_SIZE,
+                    array_items=1, cache_dir=None):
+    """Infer schema from a file of the format (json, ndjson, yaml, csv).
+    A file compressed with gzip, bz2, xz or zstd (detected from the extension
+    or the first bytes) is decompressed as it is read.
+    - cache_dir: Keep the inferred schemas in this directory, so that the
+      same file is not inferred again and a file that has only grown is
+      inferred from the new records only (see getschema.cache)
+    """
+    if cache_dir is not None:
+        from .cache import infer_cached
+        return infer_cached(cache_dir, filename, fmt, skip, lower,
+                            replace_special, snake_case, workers, sample,
+                            sample_size, array_items)
+    return _accumulate_file(filename, fmt, skip, workers, sample,
+                            sample_size, lower=lower,
+                            replace_special=replace_special,
+                            snake_case=snake_case,
+                            array_items=array_items).finalize()
+
+
+def _accumulate_file(filename, fmt="json", skip=0, workers=1, sample=None,
+                     sample_size=DEFAULT_SAMPLE_SIZE, **options):
+    """The accumulator of the records of a file of the format, before
+    finalize(). CSV has no arrays, so array_items does not apply to it.
+    """
     if fmt == "json":
-        schema = infer_from_json_file(
-            filename, skip, lower, replace_special, snake_case)
-    elif fmt == "yaml":
-        schema = infer_from_yaml_file(
-            filename, skip, lower, replace_special, snake_case)
-    elif fmt == "csv":
-        schema = infer_from_csv_file(
-            filename, skip, lower, replace_special, snake_case)
-    else:
-        raise KeyError("Unsupported format : " + fmt)
-    return schema
+        return _accumulate_json_file(filename, skip, workers, sample,
+                                     sample_size, **options)
+    if fmt in ("ndjson", "jsonl"):
+        return _accumulate_ndjson_file(filename, skip, workers, sample,
+                                       sample_size, **options)
+    if fmt == "yaml":
+        return _accumulate_yaml_file(filename, skip, workers, sample,
+                                     sample_size, **options)
+    if fmt == "csv":
+        return _accumulate_csv_file(filename, skip, workers, sample,
+                                    sample_size, **options)
+    raise KeyError("Unsupported format : " + fmt)
 
 
 class DroppedProperty(object):
@@ -301,6 +620,8 @@ def fix_type(
         replace_special=False,
         snake_case=False,
         date_to_datetime=False,
+        on_key_collision="warn",
+        passthrough=False,
     ):
     """Convert the fields into the proper object types.
     e.g. {"number": "1.0"} -> {"number": 1.0}
@@ -312,122 +633,299 @@ def fix_type(
       - force: Keep it as is (string)
     - drop_unknown_properties: True/False
       If true, the returned object will exclude unknown (sub-)properties
+    - on_key_collision: ["ignore", "warn", "raise"]
+      What to do when two keys are converted to the same key
+    - passthrough: True/False
+      If true, the objects and arrays in obj that already have the types
+      of the schema are kept as they are (not copied), and obj itself is
+      returned when nothing would be converted. It is walked only once.
     """
-    kwargs = {
-        "on_invalid_property": on_invalid_property,
-        "drop_unknown_properties": drop_unknown_properties,
-        "lower": lower,
-        "replace_special": replace_special,
-        "snake_case": snake_case,
-        "date_to_datetime": date_to_datetime,
-    }
     invalid_actions = ["raise", "null", "force"]
     if on_invalid_property not in invalid_actions:
         raise ValueError(
             "on_invalid_property is not one of %s" % invalid_actions)
-
-    obj_type = _nested_get(schema, dict_path + ["type"])
-    obj_format = _nested_get(schema, dict_path + ["format"])
-
-    nullable = False
-    if obj_type is None:
-        if on_invalid_property == "raise":
-            raise ValueError("Unknown property found at: %s" % dict_path)
-        return None
-    if type(obj_type) is list:
-        if len(obj_type) > 2:
-            raise Exception("Sorry, getschema does not support multiple types")
-        nullable = ("null" in obj_type)
-        obj_type = obj_type[1] if obj_type[0] == "null" else obj_type[0]
-
-    if obj is None:
-        if not nullable:
+    node = _schema_nodes(_nested_get(schema, dict_path))
+    if stats.current is not None:
+        return stats.current.fix(
+            1, _fix_node, obj, node, dict_path, on_invalid_property,
+            drop_unknown_properties, lower, replace_special, snake_case,
+            date_to_datetime, on_key_collision, passthrough)
+    return _fix_node(obj, node, dict_path, on_invalid_property,
+                     drop_unknown_properties, lower, replace_special,
+                     snake_case, date_to_datetime, on_key_collision,
+                     passthrough)
+
+
+# The Python type of the values that fix_type keeps as they are
+_CONFORMING_TYPES = {
+    lattice.STRING: str,
+    lattice.NUMBER: float,
+    lattice.INTEGER: int,
+    lattice.BOOLEAN: bool,
+}
+
+
+class _Frame(object):
+    """An object or an array being converted by _fix_node
+    - kind: _OBJECT or _ARRAY
+    - children: Iterator of the items (key, value) or of the array items
+      left to convert
+    - cleaned: The converted object or array. With passthrough, None until a
+      child is converted, and then a copy of the children kept so far
+    - nodes: Dict of the property nodes, or the node of the array items
+    - key: Key of the object or the array in its parent
+    - pending_key: Key of the child being converted (None in an array), or
+      _NO_KEY
+    - pending: The converted child handed back to this frame
+    - obj: The object or the array as given
+    - kept: Number of the children kept as they are, with passthrough
+    """
+    __slots__ = ("kind", "children", "cleaned", "nodes", "key",
+                 "pending_key", "pending", "obj", "kept")
+
+    def __init__(self, kind, children, cleaned, nodes, key, obj):
+        self.kind = kind
+        self.children = children
+        self.cleaned = cleaned
+        self.nodes = nodes
+        self.key = key
+        self.pending_key = _NO_KEY
+        self.pending = None
+        self.obj = obj
+        self.kept = 0
+
+
+def _copy_kept(frame):
+    """Start the converted copy of a passthrough object or array with the
+    children kept so far, and return it
+    """
+    if frame.kind is _OBJECT:
+        frame.cleaned = dict(itertools.islice(frame.obj.items(), frame.kept))
+    else:
+        frame.cleaned = frame.obj[:frame.kept]
+    return frame.cleaned
+
+
+def _fix_node(obj, node, dict_path, on_invalid_property,
+              drop_unknown_properties, lower, replace_special, snake_case,
+              date_to_datetime, on_key_collision, passthrough=False):
+    """fix_type on the nodes of the schema (see lattice.compile_schema)"""
+    # The _Frames of the objects and arrays being filled, from the root down.
+    # The dict_paths are built only for the error messages.
+    stack = []
+
+    def path_to(depth, key=_NO_KEY):
+        """dict_path of the frame at depth - 1, or of its child at key"""
+        path = list(dict_path)
+        for i in range(1, depth):
+            path += (["properties", stack[i].key]
+                     if stack[i - 1].kind is _OBJECT else ["items"])
+        if key is not _NO_KEY:
+            path += (["properties", key]
+                     if stack[depth - 1].kind is _OBJECT else ["items"])
+        return path
+
+    def on_invalid(depth, key, obj_type, obj, err_msg):
+        path = (path_to(depth, key)
+                if on_invalid_property == "raise" or stats.current is not None
+                else None)
+        return _on_invalid_property(on_invalid_property, path, obj_type, obj,
+                                    err_msg=err_msg)
+
+    def start(obj, node, depth, key):
+        """Return the converted obj and, for an object or an array, the frame
+        to convert its children into it.
+        """
+        if node is None:
             if on_invalid_property == "raise":
-                raise ValueError("Null object given at %s" % dict_path)
-        return None
-
-    # Recurse if object or array types
-    if obj_type == "object":
-        if type(obj) is not dict:
-            raise KeyError("property type (object) Expected a dict object." +
-                           "Got: %s %s at %s" % (type(obj), str(obj), str(dict_path)))
-        cleaned = dict()
-        keys = obj.keys()
-        for key in keys:
-            if drop_unknown_properties and not _nested_get(schema, dict_path + ["properties", key] + ["type"]):
-                continue
+                raise ValueError("Unknown property found at: %s" %
+                                 path_to(depth, key))
+            return None, None
+        obj_type = node.type
+        if obj_type == lattice.UNSUPPORTED and node.nullable is None:
+            node.raise_error()
+
+        if obj is None:
+            if not node.nullable:
+                if on_invalid_property == "raise":
+                    raise ValueError("Null object given at %s" %
+                                     path_to(depth, key))
+            return None, None
+
+        if obj_type == lattice.OBJECT:
+            if type(obj) is not dict:
+                raise KeyError("property type (object) Expected a dict object." +
+                               "Got: %s %s at %s" % (type(obj), str(obj), str(path_to(depth, key))))
+            cleaned = None if passthrough else dict()
+            return cleaned, _Frame(_OBJECT, iter(obj.items()), cleaned,
+                                   node.properties, key, obj)
+        elif obj_type == lattice.ARRAY:
+            assert(type(obj) is list)
+            cleaned = None if passthrough else list()
+            return cleaned, _Frame(_ARRAY, iter(obj), cleaned, node.items,
+                                   key, obj)
+
+        if obj_type == lattice.STRING:
+            cleaned = str(obj)
+            if node.format == lattice.DATE_TIME:
+                # Just test parsing for now. Not converting to Python's
+                # datetime as re-JSONifying datetime is not straight-foward
+                if not _is_datetime(cleaned):
+                    cleaned = on_invalid(
+                        depth, key, "string", cleaned,
+                        err_msg="Not in a valid datetime format",
+                    )
+                elif date_to_datetime and len(cleaned) == 10:  # "2023-10-19"
+                    cleaned += " 00:00:00.000"
+        elif obj_type == lattice.NUMBER:
             try:
-                ret = fix_type(obj[key], schema, dict_path + ["properties", key],
-                               **kwargs)
-            except Exception as e:
-                raise Exception(f"{str(e)} at {dict_path}")
-
-            cleaned[key] = ret
-            new_key = _convert_key(key, lower, replace_special, snake_case)
-            if key != new_key:
-                cleaned[new_key] = cleaned.pop(key)
-    elif obj_type == "array":
-        assert(type(obj) is list)
-        cleaned = list()
-        for o in obj:
+                cleaned = float(obj)
+            except ValueError as e:
+                cleaned = on_invalid(depth, key, "number", obj, err_msg=str(e))
+        elif obj_type == lattice.INTEGER:
             try:
-                ret = fix_type(o, schema, dict_path + ["items"],
-                               **kwargs)
-            except Exception as e:
-                raise Exception(f"{str(e)} at {dict_path}")
-
-            if ret is not None:
-                cleaned.append(ret)
-    else:
-        if obj_type == "string":
-            if obj is None:
-                cleaned = None
-            else:
-                cleaned = str(obj)
-                if obj_format == "date-time":
-                    # Just test parsing for now. Not converting to Python's
-                    # datetime as re-JSONifying datetime is not straight-foward
-                    if not _is_datetime(cleaned):
-                        cleaned = _on_invalid_property(
-                            on_invalid_property,
-                            dict_path, obj_type, cleaned,
-                            err_msg="Not in a valid datetime format",
-                        )
-                    elif date_to_datetime and len(cleaned) == 10:  # "2023-10-19"
-                        cleaned += " 00:00:00.000"
-
-        elif obj_type == "number":
-            if obj is None:
-                cleaned = None
-            else:
-                try:
-                    cleaned = float(obj)
-                except ValueError as e:
-                    cleaned = _on_invalid_property(
-                        on_invalid_property, dict_path, obj_type, obj,
-                        err_msg=str(e))
-        elif obj_type == "integer":
-            if obj is None:
-                cleaned = None
-            else:
-                try:
-                    cleaned = int(obj)
-                except ValueError as e:
-                    cleaned = _on_invalid_property(
-                        on_invalid_property, dict_path, obj_type, obj,
-                        err_msg=str(e))
-        elif obj_type == "boolean":
-            if obj is None:
-                cleaned = None
-            elif str(obj).lower() == "true":
+                cleaned = int(obj)
+            except ValueError as e:
+                cleaned = on_invalid(depth, key, "integer", obj,
+                                     err_msg=str(e))
+        elif obj_type == lattice.BOOLEAN:
+            if str(obj).lower() == "true":
                 cleaned = True
             elif str(obj).lower() == "false":
                 cleaned = False
             else:
-                cleaned = _on_invalid_property(
-                    on_invalid_property, dict_path, obj_type, obj,
+                cleaned = on_invalid(
+                    depth, key, "boolean", obj,
                     err_msg=(str(obj) +
                              " is not a valid value for boolean type"))
         else:
-            raise Exception("Invalid type in schema: %s" % obj_type)
-    return cleaned
+            node.raise_error()
+        return cleaned, None
+
+    conforming = _CONFORMING_TYPES.get
+
+    def done(frame):
+        """Hand the converted object or array to its parent"""
+        nonlocal root
+        result = frame.cleaned if frame.cleaned is not None else frame.obj
+        if stack:
+            stack[-1].pending = result
+        else:
+            root = result
+
+    root, frame = start(obj, node, 0, _NO_KEY)
+    if frame is None:
+        return root
+    stack.append(frame)
+    # The number of frames that add " at <dict_path>" to an error, the same
+    # as the recursive calls that catch it would do
+    depth = 0
+    try:
+        while stack:
+            frame = stack[-1]
+            depth = len(stack)
+            cleaned = frame.cleaned
+            if frame.kind is _OBJECT:
+                properties = frame.nodes
+                key = frame.pending_key
+                if key is not _NO_KEY:
+                    # Back from the child at key
+                    frame.pending_key = _NO_KEY
+                    depth -= 1
+                    new_key = _convert_key(key, lower, replace_special,
+                                           snake_case)
+                    if cleaned is None:
+                        if frame.pending is frame.obj[key] and new_key == key:
+                            frame.kept += 1
+                            frame.pending = None
+                            depth += 1
+                            continue
+                        cleaned = _copy_kept(frame)
+                    if new_key in cleaned:
+                        _on_key_collision(on_key_collision, key, new_key,
+                                          path_to(depth + 1))
+                    cleaned[new_key] = frame.pending
+                    frame.pending = None
+                    depth += 1
+                for key, value in frame.children:
+                    sub_node = (properties.get(key)
+                                if properties is not None else None)
+                    if (drop_unknown_properties and
+                            lattice.is_unknown(sub_node)):
+                        if cleaned is None:
+                            cleaned = _copy_kept(frame)
+                        continue
+                    if (cleaned is None and sub_node is not None and
+                            type(value) is conforming(sub_node.type) and
+                            sub_node.format != lattice.DATE_TIME and
+                            _convert_key(key, lower, replace_special,
+                                         snake_case) == key):
+                        # Kept as it is, without a call to start
+                        frame.kept += 1
+                        continue
+                    ret, child_frame = start(value, sub_node, depth, key)
+                    if child_frame is not None:
+                        frame.pending_key = key
+                        stack.append(child_frame)
+                        break
+                    depth -= 1
+                    new_key = _convert_key(key, lower, replace_special,
+                                           snake_case)
+                    if cleaned is None:
+                        if ret is value and new_key == key:
+                            frame.kept += 1
+                            depth += 1
+                            continue
+                        cleaned = _copy_kept(frame)
+                    if new_key in cleaned:
+                        _on_key_collision(on_key_collision, key, new_key,
+                                          path_to(depth + 1))
+                    cleaned[new_key] = ret
+                    depth += 1
+                else:
+                    done(stack.pop())
+            else:
+                if frame.pending_key is not _NO_KEY:
+                    # Back from the child, which is never None
+                    frame.pending_key = _NO_KEY
+                    if cleaned is None:
+                        if frame.pending is frame.obj[frame.kept]:
+                            frame.kept += 1
+                        else:
+                            cleaned = _copy_kept(frame)
+                    if cleaned is not None:
+                        cleaned.append(frame.pending)
+                    frame.pending = None
+                items = frame.nodes
+                keep = (conforming(items.type) if cleaned is None and
+                        items is not None and
+                        items.format != lattice.DATE_TIME else None)
+                for o in frame.children:
+                    if keep is not None and type(o) is keep:
+                        frame.kept += 1
+                        continue
+                    ret, child_frame = start(o, items, depth, None)
+                    if child_frame is not None:
+                        frame.pending_key = None
+                        stack.append(child_frame)
+                        break
+                    if cleaned is None:
+                        if ret is o and o is not None:
+                            frame.kept += 1
+                            continue
+                        # Null items are dropped
+                        cleaned = _copy_kept(frame)
+                        keep = None
+                    if ret is not None:
+                        cleaned.append(ret)
+                else:
+                    done(stack.pop())
+    except Exception as e:
+        if depth == 0:
+            raise
+        # Each enclosing object or array adds where it is, innermost first
+        message = str(e)
+        for i in range(depth, 0, -1):
+            message = f"{message} at {path_to(i)}"
+        raise Exception(message)
+    return root
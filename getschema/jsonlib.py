@@ -0,0 +1,124 @@
+"""The JSON parser of the records, from the fastest installed backend.
+
+orjson and ujson parse (bytes as well as str) much faster than the
+standard json. What they parse differently from it, the integers beyond 64
+bits, NaN and Infinity, or the invalid documents, is parsed again by the
+standard json, so the records and the errors are the same on any backend.
+The backend is chosen on the first use (not at import, as orjson takes
+long to import), or by the GETSCHEMA_JSON environment variable (also seen
+by the worker processes), or by use_backend.
+
+The records are always written by the standard json (see dumps), as the
+other backends format the numbers and the spaces differently.
+"""
+import json, os, re
+
+BACKENDS = ["orjson", "ujson", "json"]
+
+JSONDecodeError = json.JSONDecodeError
+# Numbers the fast backends may parse differently: orjson parses the
+# integers beyond 64 bits as floats
+_LONG_NUMBER = re.compile(r"[0-9]{19}")
+_LONG_NUMBER_BYTES = re.compile(rb"[0-9]{19}")
+# To find them in a block of lines at once, faster than the regex: the
+# digits to "0" and the rest to " "
+_DIGITS = bytes(0x30 if 0x30 <= c <= 0x39 else 0x20 for c in range(256))
+_LONG_ZEROS = b"0" * 19
+
+# loads is set by use_backend (see __getattr__)
+_backend = None
+_parses_bytes = False
+# loads without the check of the long numbers
+_unchecked_loads = None
+
+
+def _std_loads(s):
+    # Decoded as the text readers do (json.loads would skip a BOM in bytes)
+    return json.loads(s.decode("utf-8") if type(s) is bytes else s)
+
+
+def _unchecked(fast_loads):
+    def loads(s):
+        try:
+            return fast_loads(s)
+        except ValueError:
+            return _std_loads(s)
+    return loads
+
+
+def _checked(fast_loads):
+    search = _LONG_NUMBER.search
+    search_bytes = _LONG_NUMBER_BYTES.search
+
+    def loads(s):
+        if (search_bytes if type(s) is bytes else search)(s) is None:
+            try:
+                return fast_loads(s)
+            except ValueError:
+                pass
+        return _std_loads(s)
+    return loads
+
+
+def use_backend(name=None):
+    """Parse the records with the backend (one of BACKENDS), or the fastest
+    installed one if name is None. Returns the name of the backend.
+    """
+    global _backend, _parses_bytes, loads, _unchecked_loads
+    if name is not None and name not in BACKENDS:
+        raise ValueError("Unknown JSON backend: %s. Choose from %s" %
+                         (name, BACKENDS))
+    for candidate in ([name] if name else BACKENDS):
+        if candidate == "json":
+            _backend, _parses_bytes = "json", False
+            loads = _unchecked_loads = _std_loads
+            return _backend
+        try:
+            module = __import__(candidate)
+        except ImportError:
+            if name:
+                raise
+            continue
+        _backend, _parses_bytes = candidate, True
+        loads = _checked(module.loads)
+        _unchecked_loads = _unchecked(module.loads)
+        return _backend
+
+
+def _select():
+    if _backend is None:
+        use_backend(os.environ.get("GETSCHEMA_JSON") or None)
+
+
+def __getattr__(name):
+    if name == "loads":
+        _select()
+        return loads
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def backend():
+    """The name of the backend parsing the records"""
+    _select()
+    return _backend
+
+
+def parses_bytes():
+    """Whether loads is faster on bytes than on the decoded text"""
+    _select()
+    return _parses_bytes
+
+
+def loads_for(block):
+    """The loads for the lines of the block (bytes): the same as loads,
+    but without checking each line when there is no long number in the
+    block
+    """
+    _select()
+    if block.translate(_DIGITS).find(_LONG_ZEROS) < 0:
+        return _unchecked_loads
+    return loads
+
+
+# The record as JSON on one line, the same on any backend
+dumps = json.dumps
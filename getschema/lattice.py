@@ -0,0 +1,558 @@
+"""The type lattice of the inference and the in-place merging of records.
+
+The schemas are held as Node objects while they are inferred, merged or used
+to fix the records. They are turned into JSON Schema only at the end (see
+to_schema). The JSON Schema given to compile_fixer is turned into nodes once
+(see compile_schema), and the one given to fix_type as far as the records
+visit it (see LazyNode).
+"""
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+# Types as bit flags. Two different types widen to NUMBER if both are numbers,
+# or to STRING otherwise, dropping the format, properties and items.
+NULL = 0
+INTEGER = 1
+NUMBER = 2
+STRING = 4
+DATETIME = 8  # string in date-time format
+BOOLEAN = 16
+OBJECT = 32
+ARRAY = 64
+NUMBERS = INTEGER | NUMBER
+CONTAINERS = OBJECT | ARRAY
+# Type of the schemas fix_type cannot handle (see Unsupported)
+UNSUPPORTED = 128
+
+# Formats. A string node in date-time format has the DATETIME flag.
+NO_FORMAT = 0
+DATE_TIME = DATETIME
+
+TYPE_NAMES = {
+    INTEGER: "integer",
+    NUMBER: "number",
+    STRING: "string",
+    DATETIME: "string",
+    BOOLEAN: "boolean",
+    OBJECT: "object",
+    ARRAY: "array",
+}
+_TYPES = {name: flag for flag, name in TYPE_NAMES.items() if flag != DATETIME}
+
+
+class Node(object):
+    """A node of the schema
+    - type: Type code (one of the flags above but DATETIME)
+    - nullable: Whether null is valid
+    - format: Format code (NO_FORMAT or DATE_TIME)
+    - properties: Dict of the property name to the node, for objects
+    - items: Node of the array items, for arrays
+    """
+    __slots__ = ("type", "nullable", "format", "properties", "items")
+
+    def __init__(self, type, nullable=True, format=NO_FORMAT, properties=None,
+                 items=None):
+        self.type = type
+        self.nullable = nullable
+        self.format = format
+        self.properties = properties
+        self.items = items
+
+    def __repr__(self):
+        return "Node(%s)" % to_schema(self)
+
+
+class Unsupported(object):
+    """Stands for a schema fix_type cannot handle. The error is raised only
+    when a value reaches the node, as fix_type always did.
+    - error: The exception to raise
+    - nullable: Whether null is valid, or None to raise even for null
+    - empty: Whether the type is empty, e.g. "", which is dropped as an
+      unknown property with drop_unknown_properties
+    """
+    __slots__ = ("error", "nullable", "empty")
+    type = UNSUPPORTED
+    format = NO_FORMAT
+
+    def __init__(self, error, nullable=None, empty=False):
+        self.error = error
+        self.nullable = nullable
+        self.empty = empty
+
+    def raise_error(self):
+        # A new exception each time so that the tracebacks do not pile up
+        raise type(self.error)(*self.error.args)
+
+
+def new_node(flag):
+    """A new (nullable) node of the type flag"""
+    if flag == DATETIME:
+        return Node(STRING, True, DATE_TIME)
+    return Node(flag)
+
+
+# Task to fold the items of an array before they are merged
+_FOLD = object()
+_END = object()
+
+
+def classify(value, is_datetime):
+    """The type of a value, with the same rules as _infer_scalar"""
+    value_type = type(value)
+    if value_type is dict:
+        return OBJECT if value else STRING
+    if value_type is list:
+        return ARRAY
+    if value_type is bool:
+        return BOOLEAN
+    if value_type is int:
+        return INTEGER
+    if value_type is float:
+        return NUMBER
+    try:
+        float(value)
+    except (ValueError, TypeError):
+        return DATETIME if is_datetime(value) else STRING
+    if value_type is str:
+        if "." in value:
+            return NUMBER
+        # Let's assume it's a code such as zipcode if there is a leading 0
+        if value[0] != "0":
+            return INTEGER
+    return STRING
+
+
+def _conflict(node, flag):
+    name = TYPE_NAMES[node.type]
+    return ValueError(
+        "While traversing %s %s, two records differ in types: %s %s" %
+        (name, to_schema(node), name, TYPE_NAMES[flag]))
+
+
+def _widen(node, flag):
+    """Widen the node in place so it also fits flag, a different type.
+    Returns whether the node changed.
+    """
+    node_type = node.format or node.type
+    if node_type & CONTAINERS and flag & CONTAINERS:
+        raise _conflict(node, flag)
+    if not (node_type | flag) & ~NUMBERS:
+        new_type = NUMBER
+    else:
+        new_type = STRING
+        node.properties = node.items = None
+    if node_type == new_type:
+        return False
+    node.type = new_type
+    node.format = NO_FORMAT
+    return True
+
+
+def _get(parent, key):
+    return parent.get(key) if type(parent) is dict else parent.items
+
+
+def _set(parent, key, node):
+    if type(parent) is dict:
+        parent[key] = node
+    else:
+        parent.items = node
+
+
+def merge_value(parent, key, value, is_datetime, array_items=1):
+    """Merge the value into the node at parent[key] in place, where parent is
+    a dict of properties, or a node for its items (key is ignored). A node is
+    added if there is none yet. Returns whether the nodes changed.
+    - is_datetime: Function to tell if a string is a date-time
+    - array_items: Number of items of each array to merge (None for all)
+
+    When more than one item of an array is merged, each item is built into
+    new nodes and the items are folded together before they are merged, so
+    that they are also checked against each other. To check them before
+    anything is merged, merge the value into a new dict first.
+    """
+    flag = classify(value, is_datetime)
+    node = _get(parent, key)
+    if (node is not None and (node.format or node.type) == flag and
+            not flag & CONTAINERS):
+        # Nothing to widen. The most common case.
+        return False
+    changed = False
+    # (parent, key, value, whether the parent is in a folded item) or
+    # (_FOLD, node, folded items, last item built, items iterator, whether
+    #  the node is in a folded item)
+    stack = [(parent, key, value, False)]
+    while stack:
+        task = stack.pop()
+        if task[0] is _FOLD:
+            _, node, folded, item_node, items, temp = task
+            if item_node:
+                merge_node(folded, None, item_node[None])
+            folded_node = folded.get(None)
+            item = _END
+            # Nothing widens a plain string further
+            while (folded_node is None or
+                   (folded_node.format or folded_node.type) != STRING):
+                item = next(items, _END)
+                if item is _END or type(item) is dict or type(item) is list:
+                    break
+                # Nothing nested to check against the other items
+                flag = classify(item, is_datetime)
+                if folded_node is None or folded_node.type == NULL:
+                    folded_node = folded[None] = new_node(flag)
+                elif (folded_node.format or folded_node.type) != flag:
+                    _widen(folded_node, flag)
+                item = _END
+            if item is _END:
+                if merge_node(node, None, folded_node) and not temp:
+                    changed = True
+                continue
+            item_node = {}
+            stack.append((_FOLD, node, folded, item_node, items, temp))
+            stack.append((item_node, None, item, True))
+            continue
+
+        parent, key, value, temp = task
+        flag = classify(value, is_datetime)
+        node = _get(parent, key)
+        if node is None or node.type == NULL:
+            node = new_node(flag)
+            _set(parent, key, node)
+            changed = changed or not temp
+        elif (node.format or node.type) != flag:
+            if _widen(node, flag) and not temp:
+                changed = True
+            continue
+
+        if flag == OBJECT:
+            properties = node.properties
+            if properties is None:
+                properties = node.properties = {}
+            # Pushed in reverse so that new keys are added in order
+            for sub_key, sub_value in reversed(list(value.items())):
+                stack.append((properties, sub_key, sub_value, temp))
+        elif flag == ARRAY and value:
+            items = value if array_items is None else value[:array_items]
+            if len(items) == 1:
+                stack.append((node, None, items[0], temp))
+            else:
+                stack.append((_FOLD, node, {}, None, iter(items), temp))
+    return changed
+
+
+def merge_node(parent, key, other, copy=False):
+    """Merge the node other into the node at parent[key] in place, the same
+    way as merge_value. Returns whether the nodes changed.
+    - copy: Copy the nodes of other instead of sharing them
+    """
+    changed = False
+    stack = [(parent, key, other)]
+    while stack:
+        parent, key, other = stack.pop()
+        if other is None or other.type == NULL:
+            continue
+        node = _get(parent, key)
+        if node is None or node.type == NULL:
+            _set(parent, key, copy_node(other) if copy else other)
+            changed = True
+            continue
+        if other.nullable and not node.nullable:
+            node.nullable = changed = True
+        flag = other.format or other.type
+        if (node.format or node.type) != flag:
+            changed = _widen(node, flag) or changed
+            continue
+        if flag == OBJECT:
+            properties = node.properties
+            if properties is None:
+                properties = node.properties = {}
+            for sub_key, sub_node in reversed(
+                    list((other.properties or {}).items())):
+                stack.append((properties, sub_key, sub_node))
+        elif flag == ARRAY:
+            stack.append((node, None, other.items))
+    return changed
+
+
+def copy_node(node):
+    if node is None:
+        return None
+    root = {}
+    stack = [(node, root, None)]
+    while stack:
+        node, parent, key = stack.pop()
+        copied = Node(node.type, node.nullable, node.format)
+        _set(parent, key, copied)
+        if node.properties is not None:
+            # Keep the order of the properties
+            properties = copied.properties = dict.fromkeys(node.properties)
+            for sub_key, sub_node in node.properties.items():
+                stack.append((sub_node, properties, sub_key))
+        if node.items is not None:
+            stack.append((node.items, copied, None))
+    return root[None]
+
+
+DEFAULT_TYPE = ["null", "string"]
+
+
+def _type_name(node):
+    if node.type == NULL:
+        return ["null"]
+    if node.nullable:
+        return ["null", TYPE_NAMES[node.type]]
+    return [TYPE_NAMES[node.type]]
+
+
+# How to_schema treats the null types
+_KEEP_NULL = 0
+_REPLACE_NULL = 1
+_REPLACE_NULL_ITEMS = 2  # the items of an array, but not their children
+
+
+def to_schema(node, root=False, replace_null=False):
+    """Convert the node into JSON Schema.
+    - root: The records are merged into the properties of the root, so they
+      are kept whatever the type of the root is
+    - replace_null: Replace the types of the properties and array items
+      without any non-null value with the default type, with a warning
+    """
+    if node is None:
+        return None
+    result = {}
+    # (node, dict to put the schema in, key, path linked to the parent's,
+    #  how to treat the null types)
+    stack = [(node, result, None, "", _REPLACE_NULL if replace_null
+              else _KEEP_NULL)]
+    while stack:
+        node, parent, key, path, mode = stack.pop()
+        flag = node.type
+        is_root = root and parent is result
+        prop = parent[key] = {"type": _type_name(node)}
+        if node.format == DATE_TIME:
+            prop["format"] = "date-time"
+        elif flag == NULL and mode == _REPLACE_NULL and not is_root:
+            LOGGER.warning(f"{_join_path(path)} contained non-null values "
+                           f"only. Replacing with the default "
+                           f"{DEFAULT_TYPE}")
+            prop["type"] = list(DEFAULT_TYPE)
+        elif flag == NULL and mode == _REPLACE_NULL_ITEMS:
+            _warn_null_items(path)
+            prop["type"] = list(DEFAULT_TYPE)
+
+        if mode == _REPLACE_NULL_ITEMS:
+            mode = _KEEP_NULL
+        if flag == ARRAY:
+            if node.items is not None:
+                prop["items"] = None
+                stack.append((node.items, prop, "items", path,
+                              _REPLACE_NULL_ITEMS if mode == _REPLACE_NULL
+                              else _KEEP_NULL))
+            elif mode == _REPLACE_NULL:
+                _warn_null_items(path)
+                prop["items"] = {"type": list(DEFAULT_TYPE)}
+            else:
+                prop["items"] = None
+        if flag == OBJECT or is_root:
+            if node.properties is None and mode == _KEEP_NULL:
+                continue
+            properties = prop["properties"] = {}
+            sub_nodes = list((node.properties or {}).items())
+            # Keep the order of the properties
+            for sub_key, sub_node in sub_nodes:
+                properties[sub_key] = None
+            for sub_key, sub_node in reversed(sub_nodes):
+                stack.append((sub_node, properties, sub_key, (path, sub_key),
+                              mode))
+    return result[None]
+
+
+def _warn_null_items(path):
+    LOGGER.warning(f"{_join_path(path)} is an array without non-null values."
+                   f"Replacing with the default {DEFAULT_TYPE}")
+
+
+def _join_path(link):
+    keys = []
+    while type(link) is tuple:
+        link, key = link
+        keys.append(key)
+    return link + "".join("." + key for key in reversed(keys))
+
+
+def from_schema(schema):
+    """Convert JSON Schema (as returned by to_schema) into a node"""
+    if schema is None:
+        return None
+    root = {}
+    stack = [(schema, root, None)]
+    while stack:
+        schema, parent, key = stack.pop()
+        if not schema:
+            continue
+        obj_type = schema.get("type")
+        nullable = obj_type == "null"
+        if type(obj_type) is list:
+            names = [name for name in obj_type if name != "null"]
+            if len(names) > 1:
+                raise ValueError("Unsupported type in schema: %s" % obj_type)
+            nullable = len(names) < len(obj_type)
+            obj_type = names[0] if names else "null"
+        if obj_type == "null":
+            flag = NULL
+        elif obj_type in _TYPES:
+            flag = _TYPES[obj_type]
+        else:
+            raise ValueError("Unsupported type in schema: %s" % obj_type)
+        node = Node(flag, nullable)
+        if flag == STRING and schema.get("format") == "date-time":
+            node.format = DATE_TIME
+        _set(parent, key, node)
+        if schema.get("properties") is not None:
+            properties = node.properties = {}
+            for sub_key, sub_schema in schema["properties"].items():
+                if sub_schema:
+                    # Keep the order of the properties
+                    properties[sub_key] = None
+                    stack.append((sub_schema, properties, sub_key))
+        if flag == ARRAY:
+            stack.append((schema.get("items"), node, None))
+    return root.get(None)
+
+
+def is_unknown(node):
+    """Whether drop_unknown_properties drops the property of the node"""
+    return node is None or (node.type == UNSUPPORTED and node.empty)
+
+
+def _resolve_type(obj_type):
+    """Return the (non-null) type name and whether the type is nullable"""
+    nullable = False
+    if type(obj_type) is list:
+        if len(obj_type) > 2:
+            raise Exception("Sorry, getschema does not support multiple types")
+        nullable = ("null" in obj_type)
+        obj_type = obj_type[1] if obj_type[0] == "null" else obj_type[0]
+    return obj_type, nullable
+
+
+def _compile_node(schema, node_class=Node):
+    """The node of the schema's own type and format, resolved the way
+    fix_type does, without its properties and items. None for a schema
+    without a type and Unsupported for a type fix_type cannot handle.
+    """
+    obj_type = schema.get("type") if schema is not None else None
+    if obj_type is None:
+        return None
+    empty = not obj_type
+    try:
+        obj_type, nullable = _resolve_type(obj_type)
+    except Exception as e:
+        return Unsupported(e, empty=empty)
+    flag = _TYPES.get(obj_type) if type(obj_type) is str else None
+    if flag is None:
+        return Unsupported(
+            Exception("Invalid type in schema: %s" % obj_type), nullable,
+            empty)
+    node = node_class(flag, nullable)
+    if flag == STRING and schema.get("format") == "date-time":
+        node.format = DATE_TIME
+    return node
+
+
+def compile_schema(schema):
+    """Convert the JSON Schema given to fix_type into nodes, resolving the
+    types the way fix_type does. A schema without a type (an unknown
+    property) is None and a schema with a type fix_type cannot handle is
+    Unsupported.
+    """
+    root = {}
+    stack = [(schema, root, None)]
+    while stack:
+        schema, parent, key = stack.pop()
+        node = _compile_node(schema)
+        _set(parent, key, node)
+        if type(node) is not Node:
+            continue
+        if node.type == OBJECT and schema.get("properties") is not None:
+            properties = node.properties = {}
+            for sub_key, sub_schema in schema["properties"].items():
+                # Keep the order of the properties
+                properties[sub_key] = None
+                stack.append((sub_schema, properties, sub_key))
+        elif node.type == ARRAY:
+            stack.append((schema.get("items"), node, None))
+    return root[None]
+
+
+class LazyNode(object):
+    """A node of the schema given to fix_type whose properties and items are
+    compiled only when they are looked up, so that a record costs the part
+    of the schema it visits. The schema is read at each lookup and a
+    sub-schema changed in place since it was compiled is compiled again.
+    """
+    __slots__ = ("type", "nullable", "format", "schema", "_properties",
+                 "_items")
+
+    def __init__(self, type, nullable=True, format=NO_FORMAT):
+        self.type = type
+        self.nullable = nullable
+        self.format = format
+        self.schema = None
+        self._properties = None
+        self._items = None
+
+    @property
+    def properties(self):
+        schemas = self.schema.get("properties")
+        if self.type != OBJECT or schemas is None:
+            return None
+        if self._properties is None or self._properties.schemas is not schemas:
+            self._properties = _LazyProperties(schemas)
+        return self._properties
+
+    @property
+    def items(self):
+        if self.type != ARRAY:
+            return None
+        self._items = lookup_lazy(self._items, self.schema.get("items"))
+        return self._items[-1]
+
+
+class _LazyProperties(object):
+    """The properties of a LazyNode, compiled as they are looked up"""
+    __slots__ = ("schemas", "entries")
+
+    def __init__(self, schemas):
+        self.schemas = schemas
+        self.entries = {}
+
+    def get(self, key, default=None):
+        schema = self.schemas.get(key)
+        if schema is None:
+            return default
+        entry = self.entries.get(key)
+        fresh = lookup_lazy(entry, schema)
+        if fresh is not entry:
+            self.entries[key] = fresh
+        return fresh[-1]
+
+
+def lookup_lazy(entry, schema):
+    """Return the entry (schema, type, format, node) of the schema compiled
+    into a LazyNode, the same entry if the schema is the one it was compiled
+    from and its type and format did not change since.
+    """
+    if entry is not None and entry[0] is schema and (
+            schema is None or (entry[1] == schema.get("type") and
+                               entry[2] == schema.get("format"))):
+        return entry
+    node = _compile_node(schema, LazyNode)
+    if type(node) is LazyNode:
+        node.schema = schema
+    if schema is None:
+        return (None, None, None, node)
+    obj_type = schema.get("type")
+    return (schema, list(obj_type) if type(obj_type) is list else obj_type,
+            schema.get("format"), node)
@@ -0,0 +1,129 @@
+import collections, itertools, os
+
+from . import impl
+from .readers import iter_ndjson_mapped, map_file
+
+BATCH_SIZE = 1000
+RANGES_PER_WORKER = 4
+
+
+def _num_workers(workers):
+    if not workers or workers < 1:
+        return os.cpu_count() or 1
+    return workers
+
+
+def _infer_batch(records, options):
+    return impl.SchemaAccumulator(**options).add_many(records)
+
+
+def _infer_ndjson_range(filename, start, end, options):
+    with map_file(filename) as mm:
+        return impl.SchemaAccumulator(**options).add_many(
+            iter_ndjson_mapped(mm, start, end))
+
+
+def _tree_reduce(accs):
+    """Merge the accumulators pairwise in their original order, keeping only
+    O(log n) partial results alive at a time.
+    """
+    stack = []
+    for acc in accs:
+        level = 0
+        while stack and stack[-1][0] == level:
+            _, left = stack.pop()
+            acc = left.merge(acc)
+            level += 1
+        stack.append((level, acc))
+    if not stack:
+        return None
+    _, acc = stack.pop()
+    while stack:
+        _, left = stack.pop()
+        acc = left.merge(acc)
+    return acc
+
+
+def _result(future, args, func, fallback):
+    try:
+        return future.result()
+    except RecursionError:
+        if not fallback:
+            raise
+        # Records nested too deep to be pickled to or from the worker are
+        # processed here
+        return func(*args)
+
+
+def _map_ordered(executor, func, args_iter, max_pending, fallback=False):
+    """Like executor.map but only max_pending tasks are submitted ahead, so
+    a long record stream is not read into memory at once.
+    - fallback: Run the tasks that fail with RecursionError again in this
+      process
+    """
+    pending = collections.deque()
+    for args in args_iter:
+        pending.append((executor.submit(func, *args), args))
+        if len(pending) >= max_pending:
+            yield _result(*pending.popleft(), func, fallback)
+    while pending:
+        yield _result(*pending.popleft(), func, fallback)
+
+
+def _batches(records, size):
+    it = iter(records)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def ndjson_byte_ranges(filename, n):
+    """Split the file into up to n (start, end) byte ranges on line breaks"""
+    bounds = [0]
+    with map_file(filename) as mm:
+        size = len(mm)
+        for i in range(1, n):
+            pos = size * i // n
+            if pos <= bounds[-1]:
+                continue
+            # Move to the beginning of the next line
+            pos = mm.find(b"\n", pos - 1) + 1 or size
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def accumulate_parallel(records, workers=None, batch_size=BATCH_SIZE,
+                        **options):
+    """Infer from the records on a process pool. Each worker builds a
+    SchemaAccumulator from a batch of records and the partial results are
+    merged in a reduction tree. The result is the same as the serial one.
+    The batches nested too deep to be pickled are inferred in this process.
+    - options: Same as SchemaAccumulator's
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    workers = _num_workers(workers)
+    with ProcessPoolExecutor(workers) as executor:
+        args = ((batch, options) for batch in _batches(records, batch_size))
+        return _tree_reduce(
+            _map_ordered(executor, _infer_batch, args, workers * 2, True)
+        ) or impl.SchemaAccumulator(**options)
+
+
+def accumulate_ndjson_parallel(filename, workers=None, **options):
+    """Infer from an NDJSON file by splitting it into byte ranges so the
+    workers read and parse the records themselves.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    workers = _num_workers(workers)
+    ranges = ndjson_byte_ranges(filename, workers * RANGES_PER_WORKER)
+    with ProcessPoolExecutor(workers) as executor:
+        args = ((filename, start, end, options) for start, end in ranges)
+        return _tree_reduce(
+            _map_ordered(executor, _infer_ndjson_range, args, workers * 2,
+                         True)
+        ) or impl.SchemaAccumulator(**options)
@@ -0,0 +1,431 @@
+import codecs, contextlib, io, itertools, json, mmap, os, re, stat
+
+from . import jsonlib
+
+CHUNK_SIZE = 1 << 16
+# A mapped file is read in blocks of about this many bytes, and the pages
+# already read are released after each
+BLOCK_SIZE = 1 << 16
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_BYTES_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+# What may be the start of a number or a literal cut at the end of a chunk
+_PARTIAL_TOKEN = re.compile(r"[-+.0-9A-Za-z]*\Z")
+
+COMPRESSIONS = ("gzip", "bz2", "xz", "zstd")
+_EXTENSIONS = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".lzma": "xz",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+}
+_MAGIC = (
+    (re.compile(rb"\x1f\x8b"), "gzip"),
+    # "BZh", the block size and the magic of the first block or the end
+    (re.compile(rb"BZh[1-9](\x31\x41\x59\x26\x53\x59|"
+                rb"\x17\x72\x45\x38\x50\x90)"), "bz2"),
+    (re.compile(rb"\xfd7zXZ\x00"), "xz"),
+    (re.compile(rb"\x28\xb5\x2f\xfd"), "zstd"),
+)
+_MAGIC_SIZE = 10
+
+
+def iter_ndjson(f):
+    """Yield the records of newline-delimited JSON one line at a time.
+    Blank lines are ignored.
+    """
+    loads = jsonlib.loads
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            yield loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError("Invalid JSON at line %d: %s" % (line_number, e))
+
+
+def is_regular_file(filename):
+    """Whether the file is a regular file, which can be mapped and read more
+    than once, unlike a pipe or a device such as /dev/stdin
+    """
+    return stat.S_ISREG(os.stat(filename).st_mode)
+
+
+def _sniff(f):
+    """The compression of the buffered binary stream from its first bytes,
+    peeked so that they are still read by the decompressor or the parser
+    """
+    head = f.peek(_MAGIC_SIZE)[:_MAGIC_SIZE]
+    for magic, compression in _MAGIC:
+        if magic.match(head):
+            return compression
+    return None
+
+
+def _detect(filename, f):
+    compression = _EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+    if compression is None:
+        compression = _sniff(f)
+    return compression
+
+
+def detect_compression(filename):
+    """Return the compression of the file (one of COMPRESSIONS) from its
+    extension, or from its first bytes if the extension is not known.
+    None if the file is not compressed. The first bytes of a file that is
+    not a regular file are not read, as they would be lost: open_input
+    detects its compression on the stream it reads.
+    """
+    compression = _EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+    if compression is not None or not is_regular_file(filename):
+        return compression
+    with open(filename, "rb") as f:
+        return _sniff(f)
+
+
+class _DecompressingReader(io.BufferedReader):
+    """A buffered reader of a decompressor that also closes the compressed
+    file under it
+    """
+    def __init__(self, raw, source):
+        super().__init__(raw)
+        self.source = source
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.source.close()
+
+
+def _decompress(f, compression):
+    """Wrap the buffered binary stream of a compressed file in a buffered
+    stream that decompresses as it is read. f as it is if compression is
+    None.
+    """
+    if compression is None:
+        return f
+    # The modules are imported only for the compressed files
+    if compression == "gzip":
+        import gzip
+        return _DecompressingReader(gzip.GzipFile(fileobj=f, mode="rb"), f)
+    if compression == "bz2":
+        import bz2
+        return _DecompressingReader(bz2.BZ2File(f), f)
+    if compression == "xz":
+        import lzma
+        return _DecompressingReader(lzma.LZMAFile(f), f)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstandard is required to read zstd files: "
+                              "pip install getschema[zstd]")
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            f, read_across_frames=True, closefd=True)
+        return io.BufferedReader(reader)
+    raise ValueError("Unknown compression: %s. Choose from %s" %
+                     (compression, COMPRESSIONS))
+
+
+def open_input(filename, mode="r"):
+    """Open the file, decompressing it if it is compressed. The file is
+    opened once and its first bytes are peeked, so a pipe can be read too.
+    - mode: "r" for text (UTF-8) or "rb" for binary
+    """
+    f = open(filename, "rb")
+    try:
+        f = _decompress(f, _detect(filename, f))
+    except BaseException:
+        f.close()
+        raise
+    if mode == "rb":
+        return f
+    return io.TextIOWrapper(f, encoding="utf-8")
+
+
+def mappable(filename):
+    """Whether the file is a regular file that is not compressed, which the
+    readers map into memory instead of reading it as a stream
+    """
+    return is_regular_file(filename) and detect_compression(filename) is None
+
+
+@contextlib.contextmanager
+def _map(f):
+    if os.fstat(f.fileno()).st_size == 0:
+        yield b""
+        return
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield mm
+    finally:
+        mm.close()
+
+
+@contextlib.contextmanager
+def map_file(filename):
+    """Map the file into memory read-only. An empty file, which cannot be
+    mapped, gives empty bytes.
+    """
+    with open(filename, "rb") as f, _map(f) as mm:
+        yield mm
+
+
+@contextlib.contextmanager
+def _open_source(filename):
+    """Open the file once and yield (the mapped file, None) if it is a
+    regular file that is not compressed, or (None, a buffered binary stream
+    that decompresses as it is read) for the rest, e.g. a pipe
+    """
+    with open(filename, "rb") as f:
+        compression = _detect(filename, f)
+        if compression is None and stat.S_ISREG(os.fstat(f.fileno()).st_mode):
+            with _map(f) as mm:
+                yield mm, None
+            return
+        with _decompress(f, compression) as stream:
+            yield None, stream
+
+
+class _Releaser(object):
+    """Drop the pages of a mapped file behind the reader, so the resident
+    memory stays bounded however large the file is.
+    """
+    def __init__(self, mm, start):
+        self.mm = mm
+        self.released = start - start % mmap.PAGESIZE
+        self.enabled = hasattr(mm, "madvise")
+
+    def __call__(self, pos):
+        if self.enabled and pos - self.released >= BLOCK_SIZE:
+            end = pos - pos % mmap.PAGESIZE
+            self.mm.madvise(mmap.MADV_DONTNEED, self.released,
+                            end - self.released)
+            self.released = end
+
+
+def iter_mapped_blocks(mm, start=0, end=None):
+    """Yield the blocks of whole lines (as bytes) of a mapped file, from the
+    byte offset start to the end of the line at end
+    """
+    size = len(mm)
+    if end is None or end > size:
+        end = size
+    release = _Releaser(mm, start)
+    pos = start
+    while pos < end:
+        # The end of the line of the last byte of the block
+        stop = mm.find(b"\n", min(pos + BLOCK_SIZE, end) - 1) + 1 or size
+        yield mm[pos:stop]
+        pos = stop
+        release(pos)
+
+
+def iter_ndjson_mapped(mm, start=0, end=None):
+    """Same as iter_ndjson on a mapped file, for the lines starting between
+    the byte offsets. The lines are parsed as bytes if the JSON backend
+    is faster on them. Otherwise a block of lines is decoded at once, which
+    is faster than the parser decoding each line.
+    """
+    loads = jsonlib.loads
+    as_bytes = jsonlib.parses_bytes()
+    line_number = 0
+    for block in iter_mapped_blocks(mm, start, end):
+        if as_bytes:
+            loads = jsonlib.loads_for(block)
+            lines = block.split(b"\n")
+        else:
+            lines = block.decode("utf-8").split("\n")
+        if not lines[-1]:
+            lines.pop()
+        for line_number, line in enumerate(lines, line_number + 1):
+            if not line or line.isspace():
+                continue
+            try:
+                yield loads(line)
+            except json.JSONDecodeError as e:
+                if start:
+                    raise ValueError(
+                        "Invalid JSON at line %d after byte %d: %s" %
+                        (line_number, start, e))
+                raise ValueError(
+                    "Invalid JSON at line %d: %s" % (line_number, e))
+
+
+def iter_mapped_text(mm, start=0, end=None):
+    """Yield the lines of a mapped file decoded as UTF-8, e.g. for the csv
+    module
+    """
+    return itertools.chain.from_iterable(
+        io.StringIO(block.decode("utf-8"))
+        for block in iter_mapped_blocks(mm, start, end))
+
+
+class MappedTextReader(object):
+    """Read a mapped file as text in chunks, for iter_json_array"""
+    def __init__(self, mm, start=0):
+        self.mm = mm
+        self.pos = start
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.release = _Releaser(mm, start) if len(mm) else None
+
+    def read(self, size=-1):
+        if size < 0:
+            size = len(self.mm)
+        while True:
+            chunk = self.mm[self.pos:self.pos + size]
+            self.pos += len(chunk)
+            if self.release:
+                self.release(self.pos)
+            text = self.decoder.decode(chunk, final=not chunk)
+            # A chunk may end in the middle of a character
+            if text or not chunk:
+                return text
+
+
+def _incomplete(buf, e):
+    """Whether the decoding error may be due to the element continuing past
+    the end of buf, rather than to an invalid element
+    """
+    if e.msg.startswith("Unterminated string"):
+        return True
+    # e.g. a \uXXXX escape or a literal cut short
+    return (len(buf) - e.pos <= 6 or
+            _PARTIAL_TOKEN.match(buf, e.pos) is not None)
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array one at a time.
+    The file is read in chunks so only the current element is kept in memory.
+    Anything but whitespace after the array is an error, as for json.loads.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        # Read at least as much as we hold so a large element is re-scanned
+        # only a logarithmic number of times.
+        chunk = f.read(max(chunk_size, len(buf) - pos))
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def next_char():
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                return None
+            fill()
+
+    def close():
+        nonlocal pos
+        pos += 1
+        if next_char() is not None:
+            raise json.JSONDecodeError("Extra data", buf, pos)
+
+    if next_char() != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+    if next_char() == "]":
+        close()
+        return
+
+    while True:
+        if next_char() is None:
+            raise ValueError("Unexpected end of a JSON array")
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            if eof or not _incomplete(buf, e):
+                raise
+            fill()
+            continue
+        # A number at the end of the buffer may continue in the next chunk,
+        # e.g. "1." of "1.5", so the value must be followed by "," or "]"
+        after = _WHITESPACE.match(buf, end).end()
+        if not eof and (after == len(buf) or buf[after] not in ",]"):
+            fill()
+            continue
+        pos = end
+        yield value
+
+        c = next_char()
+        if c == "]":
+            close()
+            return
+        if c is None:
+            raise ValueError("Unexpected end of a JSON array")
+        if c != ",":
+            raise ValueError(
+                "Expected ',' or ']' in a JSON array but got %r" % c)
+        pos += 1
+
+
+def first_byte(mm):
+    """The first non-whitespace byte of a mapped file or bytes (b"" if
+    none)
+    """
+    m = _BYTES_WHITESPACE.match(mm)
+    return mm[m.end():m.end() + 1]
+
+
+def peek_char(f):
+    """Return the first non-whitespace character of a seekable text file
+    without moving the file position.
+    """
+    start = f.tell()
+    while True:
+        c = f.read(1)
+        if not c or not c.isspace():
+            break
+    f.seek(start)
+    return c
+
+
+@contextlib.contextmanager
+def open_ndjson(filename):
+    """Yield the records of an NDJSON file: from the memory-mapped file, or
+    decompressed as they are read
+    """
+    with _open_source(filename) as (mm, f):
+        if mm is not None:
+            yield iter_ndjson_mapped(mm)
+        else:
+            # iter_ndjson hands the lines to the parser as they are, bytes here
+            yield iter_ndjson(f)
+
+
+@contextlib.contextmanager
+def open_text_lines(filename):
+    """Yield the lines of a text file such as CSV: from the memory-mapped
+    file, or decompressed as they are read
+    """
+    with _open_source(filename) as (mm, f):
+        if mm is not None:
+            yield iter_mapped_text(mm)
+        else:
+            yield io.TextIOWrapper(f, encoding="utf-8")
+
+
+@contextlib.contextmanager
+def open_json(filename):
+    """Yield a text reader of a JSON file and whether the file is a JSON
+    array, to be streamed with iter_json_array. Anything else is read with
+    the reader as a whole.
+    """
+    with _open_source(filename) as (mm, f):
+        if mm is not None:
+            yield MappedTextReader(mm), first_byte(mm) == b"["
+        else:
+            is_array = first_byte(f.peek(CHUNK_SIZE)) == b"["
+            yield io.TextIOWrapper(f, encoding="utf-8"), is_array
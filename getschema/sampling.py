@@ -0,0 +1,43 @@
+import itertools, math, random
+
+SAMPLING_METHODS = ["head", "reservoir", "coverage"]
+DEFAULT_SAMPLE_SIZE = 1000
+
+
+def head(records, n):
+    """The first n records"""
+    return itertools.islice(records, n)
+
+
+def _uniform(rng):
+    # (0, 1) so that the logarithms below are finite
+    u = rng.random()
+    while u == 0.0:
+        u = rng.random()
+    return u
+
+
+def reservoir(records, n, seed=None):
+    """Uniformly sample n records in a single pass (Algorithm L).
+    Only n records are kept in memory. The sample is returned in the original
+    order of the records.
+    """
+    if n <= 0:
+        return []
+    rng = random.Random(seed)
+    indexed = enumerate(records)
+    sample = list(itertools.islice(indexed, n))
+    if len(sample) == n:
+        w = math.exp(math.log(_uniform(rng)) / n)
+        while True:
+            if w < 1.0:
+                skip = math.floor(math.log(_uniform(rng)) / math.log(1 - w))
+            else:
+                skip = 0
+            item = next(itertools.islice(indexed, skip, skip + 1), None)
+            if item is None:
+                break
+            sample[rng.randrange(n)] = item
+            w *= math.exp(math.log(_uniform(rng)) / n)
+        sample.sort(key=lambda item: item[0])
+    return [record for _, record in sample]
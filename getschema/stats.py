@@ -0,0 +1,164 @@
+"""Counters and timers of the hot paths of inference and fix_type.
+
+Off by default. The hooks check `current` once per record or batch, or on
+a conversion failure, and the timers of the per-value functions (date-time
+detection and key conversion) are swapped in only while collecting.
+e.g.
+  with getschema.collect_stats() as stats:
+      getschema.infer_from_file("data.ndjson", "ndjson")
+  print(stats.to_dict())
+
+Only the current process is counted, not the workers of a process pool,
+so the CLI rejects --stats with --jobs other than 1.
+"""
+import collections, contextlib, time, weakref
+
+from . import lattice
+
+# The Stats being collected, or None
+current = None
+
+
+def _flat_types(root):
+    """The type of each property of the nodes by its path, e.g. a.b[]"""
+    types = {}
+    stack = [("", root)]
+    while stack:
+        path, node = stack.pop()
+        if node is None:
+            continue
+        if path:
+            types[path] = ("date-time" if node.format == lattice.DATE_TIME
+                           else lattice.TYPE_NAMES.get(node.type, "null"))
+        for key, child in (node.properties or {}).items():
+            stack.append((path + "." + key if path else key, child))
+        if node.items is not None:
+            stack.append((path + "[]", node.items))
+    return types
+
+
+def _property_path(dict_path):
+    """fix_type's dict_path, e.g. ["properties", "a", "items"], as a[]"""
+    path = ""
+    parts = iter(dict_path or [])
+    for part in parts:
+        if part == "properties":
+            key = str(next(parts, ""))
+            path = path + "." + key if path else key
+        elif part == "items":
+            path += "[]"
+    return path
+
+
+class Stats(object):
+    """What a run spent its time on
+    - records: Number of the records inferred from
+    - fixed: Number of the records converted by fix_type and fix_types
+    - seconds / calls: Time and calls by phase. merge includes the
+      date-time detection and the key conversion done while merging.
+    - widenings: Number of the times the type of a property widened, by
+      the property and the types, e.g. {"a.b": {"integer -> number": 1}}
+    - invalid: Number of the values that could not be converted, by the
+      property and the on_invalid_property action
+    """
+    def __init__(self):
+        self.records = 0
+        self.fixed = 0
+        self.seconds = collections.Counter()
+        self.calls = collections.Counter()
+        self.widenings = collections.defaultdict(collections.Counter)
+        self.invalid = collections.defaultdict(collections.Counter)
+        # The types seen last by each accumulator
+        self._types = weakref.WeakKeyDictionary()
+
+    def timed(self, phase, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.seconds[phase] += time.perf_counter() - start
+            self.calls[phase] += 1
+
+    def merge(self, acc, record):
+        """acc._merge with the time and the widenings"""
+        changed = self.timed("merge", acc._merge, record)
+        self.records += 1
+        if changed:
+            # Only when the schema changed, which is rare after the first
+            # records
+            old = self._types.get(acc, {})
+            new = _flat_types(acc._root)
+            for path, new_type in new.items():
+                old_type = old.get(path)
+                if old_type is not None and old_type != new_type:
+                    self.widenings[path][old_type + " -> " + new_type] += 1
+            self._types[acc] = new
+        return changed
+
+    def fix(self, count, func, *args):
+        self.fixed += count
+        return self.timed("fix", func, *args)
+
+    def invalid_property(self, dict_path, policy):
+        self.invalid[_property_path(dict_path)][policy] += 1
+
+    def to_dict(self):
+        return {
+            "records": self.records,
+            "fixed": self.fixed,
+            "seconds": dict(self.seconds),
+            "calls": dict(self.calls),
+            "widenings": {k: dict(v) for k, v in self.widenings.items()},
+            "invalid": {k: dict(v) for k, v in self.invalid.items()},
+        }
+
+
+def _timer(stats, phase, func):
+    def timed(*args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            stats.seconds[phase] += time.perf_counter() - start
+            stats.calls[phase] += 1
+    return timed
+
+
+# The per-value functions of impl timed while collecting
+_TIMED = (
+    ("_get_jsonpath", "jsonpath"),
+    ("_is_datetime", "datetime"),
+    ("_new_key", "keys"),
+)
+
+
+@contextlib.contextmanager
+def collect_stats(profile=None):
+    """Collect the Stats of the runs in the block.
+    - profile: Also run cProfile and write its stats to this file (see
+      pstats)
+    """
+    global current
+    from . import impl
+    if current is not None:
+        raise ValueError("Already collecting the stats")
+    stats = Stats()
+    originals = {name: getattr(impl, name) for name, _ in _TIMED}
+    for name, phase in _TIMED:
+        setattr(impl, name, _timer(stats, phase, originals[name]))
+    current = stats
+    profiler = None
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+    try:
+        if profiler:
+            profiler.enable()
+        yield stats
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        current = None
+        for name, func in originals.items():
+            setattr(impl, name, func)
@@ -32,9 +32,12 @@ setup(
         "setuptools>=40.3.0",
         "jsonpath-ng>=1.5.2",
         "python-dateutil>=2.8.1",
-        "simplejson==3.11.1",
         "pyyaml>=5.1",
     ],
+    extras_require={
+        "zstd": ["zstandard>=0.15"],
+        "fast": ["orjson>=3"],
+    },
     entry_points="""
     [console_scripts]
     getschema=getschema:main
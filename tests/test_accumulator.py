@@ -0,0 +1,72 @@
+import itertools
+import json
+import getschema
+
+
+records = [
+    {"id": 1, "price": "10", "nested": {"a": 1, "b": "2021-06-04"}, "tags": []},
+    {"id": 2, "price": "10.5", "nested": {"a": 2}, "tags": ["x"]},
+    {"id": "003", "nested": None, "note": None},
+    {"id": 4, "price": 3, "nested": {"c": True}, "tags": [1]},
+    {},
+]
+
+
+def _accumulate(recs):
+    return getschema.SchemaAccumulator().add_many(recs)
+
+
+def test_same_as_infer_schema():
+    acc = getschema.SchemaAccumulator()
+    for record in records:
+        acc.add(record)
+    assert(acc.count == len(records))
+    assert(acc.finalize() == getschema.infer_schema(records))
+
+
+def test_merge_order_does_not_matter():
+    expected = getschema.infer_schema(records)
+    for perm in itertools.permutations(records):
+        acc = _accumulate(perm[:2])
+        acc.merge(_accumulate(perm[2:4])).merge(_accumulate(perm[4:]))
+        assert(acc.finalize() == expected)
+        assert(acc.count == len(records))
+
+
+def test_nested_properties_are_kept():
+    schema = getschema.infer_schema(records)
+    nested = schema["properties"]["nested"]
+    assert(nested["type"] == ["null", "string"])  # widened by None
+    schema = getschema.infer_schema([records[0], records[1]])
+    nested = schema["properties"]["nested"]["properties"]
+    assert(sorted(nested.keys()) == ["a", "b"])
+
+
+def test_merge_does_not_change_other():
+    acc1 = _accumulate(records[:2])
+    acc2 = _accumulate(records[3:4])
+    before = json.dumps(acc2.to_dict(), sort_keys=True)
+    acc1.merge(acc2)
+    acc1.add({"id": "abc", "nested": {"c": 1.5}})
+    assert(json.dumps(acc2.to_dict(), sort_keys=True) == before)
+
+
+def test_checkpoint():
+    acc = _accumulate(records[:2])
+    state = json.loads(json.dumps(acc.to_dict()))
+    resumed = getschema.SchemaAccumulator.from_dict(state)
+    resumed.add_many(records[2:])
+    assert(resumed.finalize() == getschema.infer_schema(records))
+    # finalize does not stop the accumulation
+    resumed.add({"extra": 1})
+    assert("extra" in resumed.finalize()["properties"])
+
+
+def test_merge_different_options():
+    try:
+        _accumulate(records).merge(
+            getschema.SchemaAccumulator(lower=True).add_many(records))
+    except ValueError as e:
+        assert(str(e).startswith("Cannot merge accumulators"))
+    else:
+        raise Exception("Supposed to fail with different options")
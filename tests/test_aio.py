@@ -0,0 +1,53 @@
+import asyncio
+import getschema
+
+
+schema = {
+    "type": "object",
+    "properties": {
+        "id": {"type": ["null", "integer"]},
+        "price": {"type": ["null", "number"]},
+    },
+}
+
+
+async def _source(n, fail_at=None):
+    for i in range(n):
+        if i % 10 == 0:
+            # Let the other tasks run as a paginated source would
+            await asyncio.sleep(0)
+        if i == fail_at:
+            yield {"id": "x"}
+        else:
+            yield {"id": str(i), "price": "%d.5" % i}
+
+
+async def _collect(stream):
+    return [record async for record in stream]
+
+
+def test_afix_stream():
+    expected = getschema.fix_types(
+        [{"id": str(i), "price": "%d.5" % i} for i in range(95)], schema)
+    for executor, workers in (("thread", 1), ("thread", 3), ("process", 2)):
+        stream = getschema.afix_stream(_source(95), schema, batch_size=10,
+                                       executor=executor, workers=workers)
+        assert(asyncio.run(_collect(stream)) == expected)
+
+
+def test_afix_stream_error():
+    fixed = []
+
+    async def run():
+        async for record in getschema.afix_stream(
+                _source(50, fail_at=33), schema, batch_size=10):
+            fixed.append(record)
+
+    try:
+        asyncio.run(run())
+    except Exception as e:
+        assert("x" in str(e))
+    else:
+        assert(False)
+    # The batches before the invalid record
+    assert(len(fixed) == 30)
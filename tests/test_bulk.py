@@ -0,0 +1,57 @@
+import csv
+import json
+import getschema
+
+
+schema = {
+    "type": "object",
+    "properties": {
+        "id": {"type": ["null", "integer"]},
+        "price": {"type": ["null", "number"]},
+    },
+}
+records = [{"id": str(i), "price": "%d.5" % i} for i in range(250)]
+
+
+def _read(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_fix_file(tmp_path):
+    expected = getschema.fix_types(records, schema)
+    ndjson_file = tmp_path / "records.ndjson"
+    ndjson_file.write_text("".join(json.dumps(r) + "\n" for r in records))
+    csv_file = tmp_path / "records.csv"
+    with open(csv_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, ["id", "price"])
+        writer.writeheader()
+        writer.writerows(records)
+    output = str(tmp_path / "output.ndjson")
+    for path, fmt in ((ndjson_file, "ndjson"), (csv_file, "csv")):
+        for workers in (1, 2):
+            count = getschema.fix_file(str(path), schema, output, fmt,
+                                       workers=workers, batch_size=60)
+            assert(count == len(records))
+            assert(_read(output) == expected)
+    getschema.fix_file(str(ndjson_file), schema, output, workers=2,
+                       ordered=False, batch_size=60)
+    assert(sorted(_read(output), key=lambda r: r["id"]) == expected)
+
+
+def test_fix_file_errors(tmp_path):
+    lines = [json.dumps(r) + "\n" for r in records[:3]]
+    lines[1] = '{"id": "x"}\n'
+    ndjson_file = tmp_path / "records.ndjson"
+    ndjson_file.write_text("".join(lines) + "{broken\n")
+    output = str(tmp_path / "output.ndjson")
+    try:
+        getschema.fix_file(str(ndjson_file), schema, output)
+    except ValueError as e:
+        assert(str(e).startswith("Record at byte %d:" % len(lines[0])))
+    else:
+        assert(False)
+    count = getschema.fix_file(str(ndjson_file), schema, output,
+                               on_error="skip")
+    assert(count == 2)
+    assert(_read(output) == getschema.fix_types(records[:3:2], schema))
@@ -0,0 +1,82 @@
+import json
+import os
+import getschema
+from getschema.cache import evict_cache
+
+
+def _write(path, records, mode="w"):
+    with open(path, mode) as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def test_hit(tmp_path):
+    data = str(tmp_path / "data.ndjson")
+    cache_dir = str(tmp_path / "cache")
+    _write(data, [{"id": 100}, {"id": 2}])
+    schema = getschema.infer_from_file(data, "ndjson", cache_dir=cache_dir)
+    assert(schema == getschema.infer_from_file(data, "ndjson"))
+
+    # Same size and modification time: the content is not read again
+    stat = os.stat(data)
+    _write(data, [{"id": "a"}, {"id": 3}])
+    os.utime(data, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    cached = getschema.infer_from_file(data, "ndjson", cache_dir=cache_dir)
+    assert(cached == schema)
+
+    # Modified: the content is hashed and inferred again
+    os.utime(data, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    schema = getschema.infer_from_file(data, "ndjson", cache_dir=cache_dir)
+    assert(schema["properties"]["id"]["type"] == ["null", "string"])
+
+
+def test_version(tmp_path, monkeypatch):
+    data = str(tmp_path / "data.ndjson")
+    cache_dir = str(tmp_path / "cache")
+    _write(data, [{"id": 1}])
+    getschema.infer_from_file(data, "ndjson", cache_dir=cache_dir)
+    # An entry of another version is not used
+    stat = os.stat(data)
+    _write(data, [{"id": "a"}])
+    os.utime(data, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    monkeypatch.setattr(getschema.cache, "CACHE_VERSION",
+                        getschema.cache.CACHE_VERSION + 1)
+    schema = getschema.infer_from_file(data, "ndjson", cache_dir=cache_dir)
+    assert(schema["properties"]["id"]["type"] == ["null", "string"])
+    assert(len(os.listdir(cache_dir)) == 2)
+
+
+def test_resume_appended(tmp_path):
+    data = str(tmp_path / "data.ndjson")
+    cache_dir = str(tmp_path / "cache")
+    _write(data, [{"id": i} for i in range(10)])
+    getschema.infer_from_file(data, "ndjson", cache_dir=cache_dir)
+    _write(data, [{"id": 1.5, "at": "2021-06-04"}], mode="a")
+    schema = getschema.infer_from_file(data, "ndjson", cache_dir=cache_dir)
+    assert(schema == getschema.infer_from_file(data, "ndjson"))
+
+    data = str(tmp_path / "data.csv")
+    with open(data, "w") as f:
+        f.write("id,name\n1,a\n")
+    getschema.infer_from_file(data, "csv", cache_dir=cache_dir)
+    with open(data, "a") as f:
+        f.write("1.5,b\n")
+    schema = getschema.infer_from_file(data, "csv", cache_dir=cache_dir)
+    assert(schema == getschema.infer_from_file(data, "csv"))
+    assert(schema["properties"]["id"]["type"] == ["null", "number"])
+
+
+def test_evict(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    first = str(tmp_path / "first.ndjson")
+    second = str(tmp_path / "second.ndjson")
+    _write(first, [{"id": 1}])
+    _write(second, [{"id": 1}])
+    getschema.infer_from_file(first, "ndjson", cache_dir=cache_dir)
+    getschema.infer_from_file(first, "ndjson", lower=True,
+                              cache_dir=cache_dir)
+    getschema.infer_from_file(second, "ndjson", cache_dir=cache_dir)
+    assert(evict_cache(cache_dir, max_age=3600) == 0)
+    assert(evict_cache(cache_dir, first) == 2)
+    assert(evict_cache(cache_dir) == 1)
+    assert(os.listdir(cache_dir) == [])
@@ -0,0 +1,50 @@
+import csv
+import io
+import getschema
+from getschema.columnar import accumulate_csv
+
+
+csv_text = """id,zip,price,created,note,flag,Id,mixed
+1,01234,1.5,2021-06-04,a,true,10,1
+2,12345,2,2021-06-05T09:00:00,,false,20,2021-06-04
+
+3,00000,3.25,2021-06-06,"quoted, value",true,30
+4,54321,-1e5,not a date,d,true,40,1.5
+5,99999,nan,2021-06-07,e,false,50,0
+"""
+
+
+def _row_wise(text, **options):
+    reader = csv.DictReader(io.StringIO(text))
+    return getschema.infer_schema([dict(row) for row in reader], **options)
+
+
+def test_same_as_row_wise():
+    options = [{}, {"lower": True}]
+    for opts in options:
+        for chunk_size in (1, 2, 100):
+            acc = accumulate_csv(io.StringIO(csv_text), chunk_size=chunk_size,
+                                 **opts)
+            assert(acc.count == 5)
+            assert(acc.finalize() == _row_wise(csv_text, **opts))
+
+
+def test_types():
+    schema = accumulate_csv(io.StringIO(csv_text)).finalize()
+    props = schema["properties"]
+    assert(props["id"]["type"] == ["null", "integer"])
+    assert(props["zip"]["type"] == ["null", "string"])
+    assert(props["price"]["type"] == ["null", "number"])
+    assert(props["created"]["type"] == ["null", "string"])
+    assert("format" not in props["created"])
+    assert(props["mixed"]["type"] == ["null", "string"])
+
+
+def test_infer_from_csv_file(tmp_path):
+    csv_file = tmp_path / "records.csv"
+    csv_file.write_text("comment line\n" + csv_text)
+    schema = getschema.infer_from_file(str(csv_file), "csv", skip=1)
+    assert(schema == _row_wise(csv_text))
+    schema = getschema.infer_from_file(str(csv_file), "csv", skip=1,
+                                       sample="head", sample_size=1)
+    assert(schema["properties"]["created"]["format"] == "date-time")
@@ -0,0 +1,196 @@
+import copy
+import getschema
+
+
+schema = {
+    "type": "object",
+    "properties": {
+        "index": {"type": ["null", "integer"]},
+        "amount": {"type": ["null", "number"]},
+        "flag": {"type": ["boolean"]},
+        "name": {"type": ["null", "string"]},
+        "created at": {"type": ["null", "string"], "format": "date-time"},
+        "tags": {"type": ["null", "array"], "items": {"type": ["null", "integer"]}},
+        "nested": {
+            "type": ["null", "object"],
+            "properties": {
+                "Some-Prop": {"type": ["null", "number"]},
+            },
+        },
+        "multi": {"type": ["null", "integer", "string"]},
+        "bad": {"type": ["null", "foo"]},
+    },
+}
+
+records = [
+    {
+        "index": "1",
+        "amount": "1.5",
+        "flag": "True",
+        "name": 10,
+        "created at": "2021-06-01",
+        "tags": ["1", None, 2],
+        "nested": {"Some-Prop": "0.5"},
+    },
+    {"index": None, "amount": None, "flag": False, "nested": None},
+    {"index": "a"},
+    {"amount": "x"},
+    {"flag": "yes"},
+    {"flag": None},
+    {"created at": "20"},
+    {"tags": ["a"]},
+    {"tags": "a"},
+    {"nested": "a"},
+    {"nested": {"foo": 1}},
+    {"foo": "bar"},
+    {"multi": 1},
+    {"bad": 1},
+    {"bad": None},
+]
+
+options = [
+    {},
+    {"on_invalid_property": "null"},
+    {"on_invalid_property": "force"},
+    {"drop_unknown_properties": True},
+    {"lower": True, "replace_special": True, "snake_case": True},
+    {"date_to_datetime": True, "on_invalid_property": "null"},
+]
+
+
+def _run(func, *args, **kwargs):
+    try:
+        return "ok", func(*args, **kwargs)
+    except BaseException as e:
+        return type(e), str(e)
+
+
+def test_same_as_fix_type():
+    for opts in options:
+        fixer = getschema.compile_fixer(schema, **opts)
+        for record in records:
+            expected = _run(getschema.fix_type, copy.deepcopy(record), schema,
+                            **opts)
+            actual = _run(fixer, copy.deepcopy(record))
+            assert actual == expected, (opts, record)
+
+
+def test_invalid_policy():
+    try:
+        getschema.compile_fixer(schema, on_invalid_property="ignore")
+    except ValueError as e:
+        assert(str(e).startswith("on_invalid_property is not one of"))
+    else:
+        raise Exception("Supposed to fail with an unknown policy")
+
+
+def test_schema_is_compiled_once():
+    local_schema = copy.deepcopy(schema)
+    fixer = getschema.compile_fixer(local_schema)
+    local_schema["properties"]["index"]["type"] = ["null", "string"]
+    assert(fixer({"index": "1"}) == {"index": 1})
+
+
+flat_schema = {
+    "type": "object",
+    "properties": {
+        "index": {"type": ["null", "integer"]},
+        "amount": {"type": ["null", "number"]},
+        "flag": {"type": ["boolean"]},
+        "Name": {"type": ["null", "string"]},
+        "created": {"type": ["null", "string"], "format": "date-time"},
+    },
+}
+
+
+def _flat_records(n, bad_at=None, **bad_values):
+    records = []
+    for i in range(n):
+        record = {
+            "index": str(i),
+            "amount": "%d.5" % i,
+            "flag": "True" if i % 2 else False,
+            "Name": i,
+            "created": "2021-06-%02d" % (i % 28 + 1),
+        }
+        if i == bad_at:
+            record.update(bad_values)
+        records.append(record)
+    return records
+
+
+def test_fix_types_same_as_fix_type():
+    batches = [
+        _flat_records(50),
+        _flat_records(50, 10, index=None, amount="x"),
+        _flat_records(50, 20, flag="yes"),
+        _flat_records(50, 30, created="20"),
+        _flat_records(50, 40, foo="bar"),
+        _flat_records(50, 0, flag=None),
+        _flat_records(3) + [{"amount": "1"}] + _flat_records(3),
+    ]
+    for opts in options:
+        for batch in batches:
+            expected = _run(lambda: [getschema.fix_type(r, flat_schema, **opts)
+                                     for r in batch])
+            actual = _run(getschema.fix_types, batch, flat_schema,
+                          batch_size=7, **opts)
+            assert actual == expected, (opts, batch)
+
+
+def test_iter_fix_types():
+    records = _flat_records(25)
+    fixed = getschema.iter_fix_types(iter(records), flat_schema, batch_size=10)
+    assert(list(fixed) == getschema.fix_types(records, flat_schema))
+
+
+def test_passthrough():
+    typed = [
+        {"index": 1, "amount": 1.5, "flag": True, "name": "a",
+         "created at": "2021-06-01", "tags": [1, 2],
+         "nested": {"Some-Prop": 0.5}},
+        {"index": 1, "amount": 1, "flag": True},
+        {"index": True},
+        {"tags": [1, None]},
+        {"tags": [1, "2", 3]},
+        {"nested": {"Some-Prop": 1}, "index": 2},
+        {"multi": None, "foo": None},
+    ]
+    for opts in options:
+        fixer = getschema.compile_fixer(schema, passthrough=True, **opts)
+        for record in records + typed:
+            expected = repr(_run(getschema.fix_type, copy.deepcopy(record),
+                                 schema, **opts))
+            actual = repr(_run(fixer, copy.deepcopy(record)))
+            assert actual == expected, (opts, record)
+            actual = repr(_run(getschema.fix_type, copy.deepcopy(record),
+                               schema, passthrough=True, **opts))
+            assert actual == expected, (opts, record)
+
+    # Kept as they are when nothing is converted
+    fixer = getschema.compile_fixer(schema, passthrough=True)
+    record = typed[0]
+    assert(fixer(record) is record)
+    assert(getschema.fix_type(record, schema, passthrough=True) is record)
+    fixed = fixer(typed[1])
+    assert(fixed is not typed[1] and fixed["amount"] == 1.0)
+    record = {"index": "1", "tags": [1, 2], "nested": {"Some-Prop": 0.5}}
+    for fixed in (fixer(record),
+                  getschema.fix_type(record, schema, passthrough=True)):
+        assert(fixed["index"] == 1)
+        assert(fixed["tags"] is record["tags"])
+        assert(fixed["nested"] is record["nested"])
+
+
+def test_fix_types_passthrough():
+    typed = getschema.fix_types(_flat_records(50), flat_schema)
+    batches = [typed, typed[:10] + _flat_records(10) + typed[10:]]
+    for opts in options:
+        for batch in batches:
+            expected = repr(_run(lambda: [
+                getschema.fix_type(r, flat_schema, **opts) for r in batch]))
+            actual = repr(_run(getschema.fix_types, batch, flat_schema,
+                               batch_size=7, passthrough=True, **opts))
+            assert actual == expected, (opts, batch)
+    fixed = getschema.fix_types(typed, flat_schema, passthrough=True)
+    assert(all(a is b for a, b in zip(fixed, typed)))
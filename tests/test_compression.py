@@ -0,0 +1,77 @@
+import bz2
+import gzip
+import json
+import lzma
+import getschema
+from getschema.readers import detect_compression
+
+
+records = [
+    {"id": 1, "name": "a", "price": "1.5", "at": "2021-06-04"},
+    {"id": 2, "name": "b", "price": "2", "nested": {"x": 1}},
+]
+
+
+def _texts():
+    csv_lines = ["id,name,price"] + [
+        "%d,%s,%s" % (r["id"], r["name"], r["price"]) for r in records]
+    return {
+        "json": json.dumps(records),
+        "ndjson": "\n".join(json.dumps(r) for r in records) + "\n",
+        "csv": "\n".join(csv_lines) + "\n",
+        "yaml": "- id: 1\n  name: a\n- id: 2\n  name: b\n",
+    }
+
+
+def test_compressed_files(tmp_path):
+    for fmt, text in _texts().items():
+        plain = tmp_path / ("records." + fmt)
+        plain.write_text(text)
+        expected = getschema.infer_from_file(str(plain), fmt)
+        for ext, module in ((".gz", gzip), (".bz2", bz2), (".xz", lzma)):
+            compressed = tmp_path / ("records." + fmt + ext)
+            compressed.write_bytes(module.compress(text.encode("utf-8")))
+            assert(getschema.infer_from_file(str(compressed), fmt) ==
+                   expected)
+
+    # From the first bytes without the extension, on multiple workers
+    data = tmp_path / "records.data"
+    data.write_bytes(gzip.compress(_texts()["ndjson"].encode("utf-8")))
+    assert(detect_compression(str(data)) == "gzip")
+    assert(getschema.infer_from_file(str(data), "ndjson", workers=2) ==
+           getschema.infer_schema(records))
+    assert(detect_compression(str(tmp_path / "records.csv")) is None)
+
+
+def test_detect_compression(tmp_path):
+    for name, content, expected in (
+            ("a.bin", bz2.compress(b"x"), "bz2"),
+            ("b.bin", lzma.compress(b"x"), "xz"),
+            ("c.bin", b"\x28\xb5\x2f\xfd\x00", "zstd"),
+            ("d.zst", b"", "zstd"),
+            # Starts with "BZh" but is not bzip2
+            ("e.csv", b"BZh1,a\n1,2\n", None)):
+        path = tmp_path / name
+        path.write_bytes(content)
+        assert(detect_compression(str(path)) == expected)
+
+
+def test_compressed_pipes(tmp_path):
+    import os, threading
+    for fmt, text in _texts().items():
+        plain = tmp_path / ("records." + fmt)
+        plain.write_text(text)
+        expected = getschema.infer_from_file(str(plain), fmt)
+        for module in (gzip, bz2, lzma):
+            # Detected from the first bytes, which are still parsed
+            pipe = str(tmp_path / "pipe")
+            os.mkfifo(pipe)
+            data = module.compress(text.encode("utf-8"))
+
+            def write():
+                with open(pipe, "wb") as f:
+                    f.write(data)
+
+            threading.Thread(target=write, daemon=True).start()
+            assert(getschema.infer_from_file(pipe, fmt) == expected)
+            os.unlink(pipe)
@@ -0,0 +1,38 @@
+import datetime
+import re
+import getschema
+from getschema.dates import detect_format, is_datetime_str, parse_datetime
+
+
+def test_same_as_loose_regex():
+    pattern = "(19|20)\\d\\d-(0[1-9]|1[012])-([1-9]|0[1-9]|[12][0-9]|3[01])"
+    values = ["2021-06-04", "2021-06-4", "2021-6-04", "1999-12-31T23:59",
+              "2021-06-04abc", "3021-06-04", "2021/06/04", "20", "", "abc",
+              "2021-00-01", "2021-06-32", "1900-01-1"]
+    for value in values:
+        assert(is_datetime_str(value) == (re.match(pattern, value) is not None))
+
+
+def test_detect_format():
+    assert(detect_format("2021-06-04") == "iso8601")
+    assert(detect_format("2021-06-04T09:00:00.123Z") == "rfc3339")
+    assert(detect_format("20210604T090000") == "iso8601_basic")
+    assert(detect_format("Tue, 01 Jun 2021 09:00:00 GMT") == "rfc2822")
+    assert(detect_format("6/4/2021 9:00 PM") == "us_datetime")
+    assert(detect_format("1622797200") == "epoch")
+    assert(detect_format(1622797200123) == "epoch_millis")
+    assert(detect_format("2021-13-04") is None)
+    assert(detect_format("hello world") is None)
+    assert(detect_format(1.5) is None)
+
+
+def test_parse_datetime():
+    utc = datetime.timezone.utc
+    expected = datetime.datetime(2021, 6, 4, 9, 0, tzinfo=utc)
+    for value in ["2021-06-04T09:00:00Z", "2021-06-04 09:00:00+00:00",
+                  "Fri, 04 Jun 2021 09:00:00 GMT", "1622797200",
+                  "June 4, 2021 9:00 UTC"]:
+        assert(parse_datetime(value) == expected)
+    # No timezone
+    assert(parse_datetime("2021-06-04T18:00:00", 9 * 3600) == expected)
+    assert(getschema.impl._parse_datetime_tz("2021-06-04T09:00") == expected)
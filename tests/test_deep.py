@@ -0,0 +1,86 @@
+import sys
+import getschema
+
+
+DEPTH = sys.getrecursionlimit() * 3
+
+
+def _nested(depth, leaf):
+    record = leaf
+    for _ in range(depth):
+        record = {"child": record, "items": [1]}
+    return record
+
+
+def _walk(obj, *keys):
+    """Follow the keys down to the bottom and return (depth, bottom)"""
+    depth = 0
+    while True:
+        for key in keys:
+            if type(obj) is not dict or key not in obj:
+                return depth, obj
+            obj = obj[key]
+        depth += 1
+
+
+def test_infer_deep():
+    records = [_nested(DEPTH, "1"), _nested(DEPTH, "1.5")]
+    schema = getschema.infer_schema(records)
+    depth, bottom = _walk(schema, "properties", "child")
+    assert(depth == DEPTH)
+    assert(bottom == {"type": ["null", "number"]})
+
+    acc = getschema.SchemaAccumulator().add_many(records)
+    acc = getschema.SchemaAccumulator.from_dict(acc.to_dict())
+    acc.merge(getschema.SchemaAccumulator().add(_nested(DEPTH, "a")))
+    depth, bottom = _walk(acc.finalize(), "properties", "child")
+    assert(depth == DEPTH)
+    assert(bottom == {"type": ["null", "string"]})
+
+
+def test_fix_type_deep():
+    schema = getschema.infer_schema([_nested(DEPTH, "1.5")])
+    fixed = getschema.fix_type(_nested(DEPTH, "2"), schema)
+    depth, bottom = _walk(fixed, "child")
+    assert(depth == DEPTH)
+    assert(bottom == 2.0)
+
+    fixed = getschema.compile_fixer(schema)(_nested(DEPTH, "2"))
+    assert(_walk(fixed, "child") == (DEPTH, 2.0))
+    fixed = getschema.fix_types([_nested(DEPTH, "2")] * 2, schema)
+    assert(_walk(fixed[1], "child") == (DEPTH, 2.0))
+
+    schema = getschema.infer_schema([_nested(3, "1.5")])
+    try:
+        getschema.fix_type(_nested(3, "x"), schema)
+    except Exception as e:
+        assert(str(e).startswith("could not convert string to float: 'x'"))
+        assert(str(e).endswith(
+            " at ['properties', 'child', 'properties', 'child']"
+            " at ['properties', 'child'] at []"))
+    else:
+        raise Exception("Supposed to fail with an invalid number")
+
+
+def test_compile_fixer_depth_threshold():
+    from getschema.fixer import MAX_DEPTH_RATIO
+
+    def nest_calls(n, func):
+        return func() if n == 0 else nest_calls(n - 1, func)
+
+    threshold = sys.getrecursionlimit() // MAX_DEPTH_RATIO
+    for depth in range(threshold - 2, threshold + 2):
+        schema = getschema.infer_schema([_nested(depth, "1.5")])
+        fixer = getschema.compile_fixer(schema)
+        # Called with a stack already a quarter of the recursion limit deep
+        fixed = nest_calls(threshold,
+                           lambda: fixer(_nested(depth, "2")))
+        assert(_walk(fixed, "child") == (depth, 2.0))
+
+
+def test_infer_deep_parallel():
+    records = [_nested(sys.getrecursionlimit(), "1.5")] * 2
+    schema = getschema.infer_schema(records, workers=2)
+    depth, bottom = _walk(schema, "properties", "child")
+    assert(depth == sys.getrecursionlimit())
+    assert(bottom == {"type": ["null", "number"]})
@@ -0,0 +1,135 @@
+import csv
+import json
+import getschema
+
+
+old_records = [
+    {"id": 1, "price": 10, "created_at": "2021-06-04T09:00:00",
+     "tags": [1], "address": {"zip": 10001}},
+]
+new_records = [
+    {"id": 2, "price": "12.5", "created_at": "yesterday", "tags": ["a"],
+     "address": {"zip": 10002, "city": "NYC"}, "items": [{"sku": "x"}]},
+]
+
+
+def test_evolve_schema():
+    schema = getschema.infer_schema(old_records)
+    evolved, changes = getschema.evolve_schema(schema, new_records)
+    assert(evolved == getschema.infer_schema(old_records + new_records))
+    assert([(c["path"], c["change"]) for c in changes] == [
+        (["properties", "price"], "widened"),
+        (["properties", "created_at"], "format_dropped"),
+        (["properties", "tags", "items"], "widened"),
+        (["properties", "address", "properties", "city"], "added"),
+        (["properties", "items"], "added"),
+    ])
+    assert(changes[0]["from"] == ["null", "integer"])
+    assert(changes[0]["to"] == ["null", "number"])
+    assert(changes[3]["to"] == {"type": ["null", "string"]})
+
+    # Nothing new
+    again, changes = getschema.evolve_schema(evolved, new_records)
+    assert(again == evolved)
+    assert(changes == [])
+
+
+def test_diff_schemas():
+    old = {"type": "object", "properties": {
+        "a": {"type": ["integer"]},
+        "b": {"type": ["null", "string"]},
+        "c": {"type": ["null", "string"], "format": "date-time"},
+        "d": {"type": ["null", "object"], "properties": {
+            "e": {"type": ["null", "integer"]}}},
+    }}
+    new = {"type": "object", "properties": {
+        "a": {"type": ["null", "integer"]},
+        "b": {"type": ["null", "boolean"]},
+        "c": {"type": ["null", "string"], "format": "date"},
+        "d": {"type": ["null", "string"]},
+    }}
+    assert([(c["path"][-1], c["change"])
+            for c in getschema.diff_schemas(old, new)] == [
+        ("a", "nullable"),
+        ("b", "type_changed"),
+        ("c", "format_changed"),
+        ("d", "widened"),
+    ])
+    assert([(c["path"][-1], c["change"])
+            for c in getschema.diff_schemas(new, old)] == [
+        ("a", "not_nullable"),
+        # Any type widens to string
+        ("b", "widened"),
+        ("c", "format_changed"),
+        ("d", "type_changed"),
+    ])
+    assert(getschema.diff_schemas(old, old) == [])
+
+
+def test_evolve_from_file(tmp_path):
+    schema = getschema.infer_schema(old_records)
+    data = str(tmp_path / "new.ndjson")
+    with open(data, "w") as f:
+        for record in new_records:
+            f.write(json.dumps(record) + "\n")
+    assert(getschema.evolve_from_file(data, schema, "ndjson") ==
+           getschema.evolve_schema(schema, new_records))
+
+    rows = [{"id": "1", "price": "10"}, {"id": "2", "price": "1.5"}]
+    data = str(tmp_path / "new.csv")
+    with open(data, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["id", "price"])
+        writer.writeheader()
+        writer.writerows(rows)
+    schema = getschema.infer_schema(rows[:1])
+    evolved, changes = getschema.evolve_from_file(data, schema, "csv")
+    assert(evolved == getschema.infer_schema(rows))
+    assert([c["change"] for c in changes] == ["widened"])
+
+
+def test_evolve_accumulator():
+    old = [{"id": 1, "tags": []}]
+    new = [{"id": 2, "tags": [1]}]
+    # The schema has the default type for the empty array, which the new
+    # items widen to string
+    evolved, changes = getschema.evolve_schema(getschema.infer_schema(old),
+                                               new)
+    assert(evolved["properties"]["tags"]["items"]["type"] ==
+           ["null", "string"])
+    assert(changes == [])
+
+    # The accumulator knows the items had no type yet
+    acc = getschema.SchemaAccumulator().add_many(old)
+    acc = getschema.SchemaAccumulator.from_dict(acc.to_dict())
+    evolved, changes = getschema.evolve_schema(acc, new)
+    assert(evolved == getschema.infer_schema(old + new))
+    assert(changes == [{"path": ["properties", "tags", "items"],
+                        "change": "type_changed",
+                        "from": ["null", "string"],
+                        "to": ["null", "integer"]}])
+    assert(acc.count == 2)
+
+
+def test_evolve_csv_state(tmp_path, capsys):
+    data = str(tmp_path / "new.csv")
+    state = str(tmp_path / "state.json")
+    for rows in ("id,Name\n1,a\n", "id,Name\n1.5,b\n"):
+        with open(data, "w") as f:
+            f.write(rows)
+        # The state keeps the options it was created with
+        getschema.evolve_main([data, "-t", "csv", "--state", state, "-a",
+                               "0", "-l"])
+    capsys.readouterr()
+    with open(state) as f:
+        acc = getschema.SchemaAccumulator.from_dict(json.load(f))
+    assert(acc.array_items is None)
+    assert(acc.count == 2)
+    assert(acc.finalize()["properties"] ==
+           {"id": {"type": ["null", "number"]},
+            "name": {"type": ["null", "string"]}})
+
+    # The full options of the accumulator are used for the new rows
+    acc = getschema.SchemaAccumulator(on_key_collision="raise",
+                                      array_items=3)
+    evolved, _ = getschema.evolve_from_file(data, acc, "csv")
+    assert(evolved == getschema.infer_from_file(data, "csv"))
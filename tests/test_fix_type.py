@@ -109,6 +109,78 @@ def test_unsupported_schema():
         assert(str(e).startswith("Sorry, getschema does not support multiple types"))
 
 
+def test_schema_changed_in_place():
+    schema = getschema.infer_schema(records)
+    fixed = getschema.fix_type(valid_after_fix, schema)
+    assert(isinstance(fixed["index"], int))
+    # The changes made between the calls are picked up
+    schema["properties"]["index"]["type"] = ["null", "string"]
+    fixed = getschema.fix_type(valid_after_fix, schema)
+    assert(fixed["index"] == str(valid_after_fix["index"]))
+    # Also in the items and the replaced properties
+    schema["properties"]["array"]["items"]["type"] = ["null", "string"]
+    fixed = getschema.fix_type(valid_after_fix, schema)
+    assert(fixed["array"] == [str(v) for v in valid_after_fix["array"]])
+    schema["properties"]["nested_field"]["properties"] = {
+        "some_prop": {"type": ["null", "string"]}}
+    fixed = getschema.fix_type(valid_after_fix, schema)
+    assert(fixed["nested_field"]["some_prop"] ==
+           str(valid_after_fix["nested_field"]["some_prop"]))
+
+
+def test_sparse_records():
+    schema = {"type": "object", "properties": {
+        "c%d" % i: {"type": ["null", "integer"]} for i in range(1000)}}
+    for i in range(3):
+        record = {"c%d" % (i * 10 + j): str(j) for j in range(5)}
+        assert(getschema.fix_type(record, schema) ==
+               {key: int(value) for key, value in record.items()})
+    # Only the properties in the records are compiled
+    node = getschema.impl._schema_nodes(schema)
+    assert(len(node.properties.entries) == 15)
+
+    # The least recently used schemas are dropped from the cache
+    cache = getschema.impl._schema_nodes_cache
+    schemas = [{"type": "object", "properties": {"a": {"type": "integer"}}}
+               for _ in range(getschema.impl.SCHEMA_CACHE_SIZE)]
+    for other in schemas:
+        getschema.fix_type({"a": "1"}, other)
+        getschema.fix_type({"c0": "1"}, schema)
+    assert(id(schema) in cache)
+    assert(id(schemas[0]) not in cache)
+    assert(len(cache) == getschema.impl.SCHEMA_CACHE_SIZE)
+
+
+def test_threads():
+    import sys, threading
+    schemas = [{"type": "object", "properties": {"a": {"type": "integer"}}}
+               for _ in range(200)]
+    errors = []
+
+    def fix():
+        try:
+            for _ in range(50):
+                for schema in schemas:
+                    assert(getschema.fix_type({"a": "1"}, schema) ==
+                           {"a": 1})
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=fix) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert(errors == [])
+    assert(len(getschema.impl._schema_nodes_cache) <=
+           getschema.impl.SCHEMA_CACHE_SIZE)
+
+
 def test_int_zero():
     schema = getschema.infer_schema(records)
 
@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+
+def _loaded(code, modules):
+    check = ("import sys\n%s\nprint(' '.join(m for m in %r "
+             "if m in sys.modules))" % (code, modules))
+    out = subprocess.run([sys.executable, "-c", check], check=True,
+                         stdout=subprocess.PIPE, text=True).stdout
+    return out.split()
+
+
+def test_lazy_imports():
+    heavy = ["yaml", "jsonpath_ng", "dateutil", "email.utils", "asyncio",
+             "concurrent.futures", "cProfile", "gzip", "bz2", "lzma",
+             "orjson", "ujson", "argparse"]
+    assert(_loaded("import getschema", heavy) == [])
+    # Only on the paths that need them
+    code = """
+import getschema
+getschema.infer_schema([{"a": {"b": 1}}], record_level="$.a")
+getschema.infer_schema([{"a": {"b": 1}}], record_level="a[*]")
+getschema.parse_datetime("6/4/2021 9:00 AM")
+"""
+    assert(_loaded(code, ["jsonpath_ng", "dateutil", "yaml"]) ==
+           ["jsonpath_ng", "dateutil"])
@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+import getschema
+from getschema import jsonlib, readers
+
+
+documents = [
+    '{"id": 1, "name": "\\u00e9", "score": 1.5, "tags": ["x", null]}',
+    '{"big": 123456789012345678901234567890, "neg": -9223372036854775809}',
+    '{"u64": 18446744073709551616, "id": "18446744073709551616"}',
+    '{"nan": NaN, "inf": Infinity, "overflow": 1e400}',
+    '{"a": 1, "a": 2, "f": 0.1e-400, "e": 1E5, "z": -0.0}',
+    '"\\ud800"',
+    "[1,]",
+    "{\"a\": 1} x",
+    "\ufeff{}",
+]
+
+
+def _backends():
+    names = []
+    for name in jsonlib.BACKENDS:
+        try:
+            jsonlib.use_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def _run(func, *args):
+    try:
+        return "ok", repr(func(*args))
+    except BaseException as e:
+        return type(e), str(e)
+
+
+def _parse_all(document):
+    encoded = document.encode("utf-8")
+    return [_run(jsonlib.loads, document), _run(jsonlib.loads, encoded),
+            _run(jsonlib.loads_for(encoded), encoded)]
+
+
+def test_same_on_all_backends():
+    default = jsonlib.backend()
+    try:
+        jsonlib.use_backend("json")
+        expected = [_parse_all(d) for d in documents]
+        for results in expected:
+            assert(results[0] == results[1] == results[2])
+        for name in _backends():
+            jsonlib.use_backend(name)
+            assert([_parse_all(d) for d in documents] == expected), name
+    finally:
+        jsonlib.use_backend(default)
+
+
+def test_ndjson_file_on_all_backends():
+    lines = [
+        {"id": 1, "price": 1.5, "name": "a"},
+        {"id": 123456789012345678901234567890, "price": 2, "name": "b"},
+    ]
+    default = jsonlib.backend()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "records.ndjson")
+        with open(filename, "w") as f:
+            for line in lines:
+                f.write(json.dumps(line) + "\n")
+        try:
+            for name in _backends():
+                jsonlib.use_backend(name)
+                with readers.map_file(filename) as mm:
+                    assert(repr(list(readers.iter_ndjson_mapped(mm))) ==
+                           repr(lines))
+                schema = getschema.infer_from_file(filename, "ndjson")
+                assert(schema["properties"]["id"]["type"] ==
+                       ["null", "integer"])
+        finally:
+            jsonlib.use_backend(default)
+
+
+def test_use_backend():
+    default = jsonlib.backend()
+    assert(default in jsonlib.BACKENDS)
+    with pytest.raises(ValueError):
+        jsonlib.use_backend("yaml")
+    assert(jsonlib.backend() == default)
+    try:
+        # The fastest installed one
+        assert(jsonlib.use_backend() == _backends()[0])
+    finally:
+        jsonlib.use_backend(default)
+    assert(jsonlib.dumps({"a": [1, 2.5, None], "b": "é"}) ==
+           '{"a": [1, 2.5, null], "b": "\\u00e9"}')
@@ -0,0 +1,50 @@
+import jsonpath_ng
+import pytest
+import getschema
+from getschema.impl import _get_jsonpath
+
+
+docs = [
+    {"data": {"items": [{"a": 1}], "next": None}},
+    {"data": {"items": None}},
+    {"data": [{"items": 1}]},
+    {"data": "items"},
+    {"data": None},
+    {"other": 1},
+    [1, 2],
+    "text",
+]
+
+
+def test_same_as_jsonpath_ng():
+    paths = ["$", "$.data", "data", "$.data.items", "data.items",
+             "$.data.next", "$.data[0].items", "$.data[*].items"]
+    for path in paths:
+        expr = jsonpath_ng.parse(path)
+        for doc in docs:
+            expected = [match.value for match in expr.find(doc)]
+            assert(_get_jsonpath(doc, path) == expected), (path, doc)
+
+
+def test_keywords():
+    # Reserved by jsonpath-ng, so not read as fields
+    for path in ["$.data.where", "data.wherenot"]:
+        with pytest.raises(Exception) as expected:
+            jsonpath_ng.parse(path)
+        with pytest.raises(type(expected.value)):
+            _get_jsonpath({"data": {"where": 1, "wherenot": 2}}, path)
+    doc = {"data": {"in": 1, "and": 2}}
+    for path in ["$.data.in", "data.and"]:
+        expr = jsonpath_ng.parse(path)
+        assert(_get_jsonpath(doc, path) ==
+               [match.value for match in expr.find(doc)])
+
+
+def test_record_level_cache():
+    before = getschema.jsonpath_cache_info()
+    records = [{"cache_test": {"id": i, "name": "a"}} for i in range(100)]
+    schema = getschema.infer_schema(records, record_level="$.cache_test")
+    after = getschema.jsonpath_cache_info()
+    assert(after["misses"] == before["misses"] + 1)
+    assert(after["hits"] >= before["hits"] + 99)
+    assert(list(schema["properties"].keys()) == ["id", "name"])
@@ -0,0 +1,61 @@
+import logging
+import getschema
+from getschema.impl import _convert_key, _normalize_key
+
+
+record = {"User Name": "a", "user_name": "b", "Age": "1"}
+options = {"lower": True, "replace_special": True, "snake_case": True}
+
+
+def test_convert_key():
+    assert(_convert_key("Hello World!", **options) == "hello_world_")
+    assert(_convert_key("Hello World!", replace_special="-") == "Hello World_")
+    assert(_convert_key("Hello World!") == "Hello World!")
+    before = _normalize_key.cache_info().hits
+    _convert_key("Hello World!", **options)
+    assert(_normalize_key.cache_info().hits == before + 1)
+
+
+def test_collision_warn(caplog):
+    with caplog.at_level(logging.WARNING):
+        schema = getschema.infer_schema([record, record], **options)
+    assert(list(schema["properties"].keys()) == ["user_name", "age"])
+    messages = [r.getMessage() for r in caplog.records
+                if "converted to 'user_name'" in r.getMessage()]
+    # Reported only once
+    assert(len(messages) == 1)
+
+
+def test_collision_raise():
+    try:
+        getschema.infer_schema(record, on_key_collision="raise", **options)
+    except ValueError as e:
+        assert(str(e).startswith("Key 'user_name' is converted to 'user_name'"))
+    else:
+        raise Exception("Supposed to fail with a key collision")
+
+    # In the objects of an array at the record level
+    nested = {"data": [[record]]}
+    try:
+        getschema.infer_schema(nested, record_level="data",
+                               on_key_collision="raise", **options)
+    except ValueError as e:
+        assert("at ['items', 'items']" in str(e))
+    else:
+        raise Exception("Supposed to fail with a key collision")
+
+
+def test_fix_type_collision():
+    schema = getschema.infer_schema(record, on_key_collision="ignore")
+    fixed = getschema.fix_type(record, schema, **options)
+    assert(fixed == {"user_name": "b", "age": 1})
+    fixer = getschema.compile_fixer(schema, on_key_collision="raise",
+                                    **options)
+    for fix in (fixer, lambda r: getschema.fix_type(
+            r, schema, on_key_collision="raise", **options)):
+        try:
+            fix(record)
+        except ValueError as e:
+            assert(str(e).startswith("Key 'user_name' is converted to"))
+        else:
+            raise Exception("Supposed to fail with a key collision")
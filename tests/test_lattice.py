@@ -0,0 +1,109 @@
+from getschema import lattice
+from getschema.impl import _is_datetime
+
+
+schema = {
+    "type": ["null", "object"],
+    "properties": {
+        "id": {"type": ["null", "integer"]},
+        "created": {"type": ["null", "string"], "format": "date-time"},
+        "tags": {"type": ["null", "array"], "items": None},
+        "nested": {
+            "type": ["null", "object"],
+            "properties": {
+                "price": {"type": ["null", "number"]},
+                "note": {"type": ["null"]},
+            },
+        },
+    },
+}
+
+
+def _merge(node, value, array_items=1):
+    parent = {None: node}
+    changed = lattice.merge_value(parent, None, value, _is_datetime,
+                                  array_items)
+    return parent[None], changed
+
+
+def test_round_trip():
+    node = lattice.from_schema(schema)
+    assert(node.type == lattice.OBJECT)
+    assert(list(node.properties) == list(schema["properties"]))
+    assert(lattice.to_schema(node) == schema)
+    not_null = {"type": ["integer"]}
+    assert(lattice.to_schema(lattice.from_schema(not_null)) == not_null)
+
+
+def test_merge_in_place():
+    node = lattice.from_schema(schema)
+    properties = node.properties
+    nested = properties["nested"]
+    same, changed = _merge(node, {"id": 2, "nested": {"price": 1.5}})
+    assert(same is node)
+    assert(not changed)
+    assert(properties["nested"] is nested)
+
+    _, changed = _merge(node, {"id": 2.5, "nested": {"note": "x"}})
+    assert(changed)
+    assert(properties["id"].type == lattice.NUMBER)
+    assert(nested.properties["note"].type == lattice.STRING)
+
+    # Widened to string, the properties are dropped
+    _, changed = _merge(node, {"nested": "x"})
+    assert(changed)
+    assert(lattice.to_schema(nested) == {"type": ["null", "string"]})
+
+
+def test_fold_array_items():
+    node, _ = _merge(None, {"values": [1, 2.5, {"a": 1}]}, array_items=2)
+    items = node.properties["values"].items
+    assert(items.type == lattice.NUMBER)
+    node, _ = _merge(None, {"values": [1, 2.5, {"a": 1}]}, array_items=None)
+    items = node.properties["values"].items
+    assert(items.type == lattice.STRING)
+
+
+def test_container_conflict():
+    node, _ = _merge(None, {"a": {"b": 1}})
+    try:
+        _merge(node, {"a": [1]})
+    except ValueError as e:
+        assert("two records differ in types: object array" in str(e))
+    else:
+        assert(False)
+
+
+def test_copy_node():
+    node = lattice.from_schema(schema)
+    copied = lattice.copy_node(node)
+    _merge(copied, {"nested": {"price": "x"}})
+    assert(lattice.to_schema(node) == schema)
+
+
+def test_compile_schema():
+    node = lattice.compile_schema({
+        "type": "object",
+        "properties": {
+            "id": {"type": ["integer", "null"]},
+            "created": {"type": "string", "format": "date-time"},
+            "unknown": {},
+            "multiple": {"type": ["null", "integer", "string"]},
+            "invalid": {"type": ["null", "decimal"]},
+        },
+    })
+    assert(not node.nullable)
+    properties = node.properties
+    assert(properties["id"].type == lattice.INTEGER)
+    assert(properties["id"].nullable)
+    assert(properties["created"].format == lattice.DATE_TIME)
+    assert(properties["unknown"] is None)
+    # Raised only when a value reaches them, the multiple types even for null
+    assert(properties["multiple"].nullable is None)
+    assert(properties["invalid"].nullable)
+    try:
+        properties["invalid"].raise_error()
+    except Exception as e:
+        assert(str(e) == "Invalid type in schema: decimal")
+    else:
+        assert(False)
@@ -0,0 +1,42 @@
+import json
+import getschema
+from getschema.parallel import accumulate_parallel, ndjson_byte_ranges
+
+
+def _records(n):
+    records = []
+    for i in range(n):
+        record = {"id": i, "name": "name %d" % i}
+        if i % 7 == 0:
+            record["price"] = "%d.5" % i
+        if i % 11 == 0:
+            record["nested"] = {"at": "2021-06-04", "n%d" % (i % 3): i}
+        if i % 13 == 0:
+            record["tags"] = [i, "x"] if i % 2 else [i]
+        records.append(record)
+    return records
+
+
+def test_same_as_serial():
+    records = _records(500)
+    expected = json.dumps(getschema.infer_schema(records))
+    acc = accumulate_parallel(records, workers=2, batch_size=37)
+    assert(json.dumps(acc.finalize()) == expected)
+    assert(acc.count == len(records))
+    assert(json.dumps(getschema.infer_schema(records, workers=2)) == expected)
+
+
+def test_ndjson_file(tmp_path):
+    records = _records(500)
+    ndjson_file = tmp_path / "records.ndjson"
+    ndjson_file.write_text("\n".join(json.dumps(r) for r in records))
+
+    ranges = ndjson_byte_ranges(str(ndjson_file), 9)
+    assert(ranges[0][0] == 0)
+    assert(ranges[-1][1] == ndjson_file.stat().st_size)
+    for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]):
+        assert(end == start)
+
+    expected = json.dumps(getschema.infer_schema(records))
+    schema = getschema.infer_from_file(str(ndjson_file), "ndjson", workers=2)
+    assert(json.dumps(schema) == expected)
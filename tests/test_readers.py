@@ -0,0 +1,162 @@
+import io
+import json
+import getschema
+from getschema import readers
+from getschema.readers import iter_json_array, iter_ndjson
+
+
+records = [
+    {"id": 1, "name": "a", "score": 1.5, "tags": ["x", "y"]},
+    {"id": 22, "name": "b ]", "score": 10, "nested": {"at": "2021-06-04"}},
+    {"id": 333, "name": "c,\"d\"", "score": None, "tags": []},
+]
+
+
+def test_iter_json_array():
+    text = json.dumps(records, indent=2)
+    for chunk_size in (1, 2, 7, 1024):
+        parsed = list(iter_json_array(io.StringIO(text), chunk_size=chunk_size))
+        assert(parsed == records)
+    assert(list(iter_json_array(io.StringIO(" [ ] "))) == [])
+    assert(list(iter_json_array(io.StringIO("[1, 23 ,456]"), chunk_size=1)) ==
+           [1, 23, 456])
+    assert(list(iter_json_array(io.StringIO("[1.5, -2e3]"), chunk_size=1)) ==
+           [1.5, -2000.0])
+
+
+def test_iter_json_array_invalid():
+    try:
+        list(iter_json_array(io.StringIO("[1, 2"), chunk_size=2))
+    except ValueError as e:
+        assert(str(e).startswith("Unexpected end of a JSON array"))
+    else:
+        raise Exception("Supposed to fail with a truncated array")
+
+    for text in ("[1]x", "[1] ]", "[]x", '[{"a": 1}] {}'):
+        try:
+            list(iter_json_array(io.StringIO(text), chunk_size=1))
+        except json.JSONDecodeError as e:
+            assert(e.msg == "Extra data")
+        else:
+            raise Exception("Supposed to fail with extra data: " + text)
+
+    # An invalid element is raised without reading the rest of the file
+    class Reader(io.StringIO):
+        read_size = 0
+
+        def read(self, size):
+            chunk = super().read(size)
+            self.read_size += len(chunk)
+            return chunk
+
+    f = Reader('[{"a": 1}, {"a": x}, ' + ", ".join(["1"] * 100000) + "]")
+    try:
+        list(iter_json_array(f, chunk_size=16))
+    except json.JSONDecodeError as e:
+        assert(e.msg == "Expecting value")
+    else:
+        raise Exception("Supposed to fail with an invalid element")
+    assert(f.read_size < 1000)
+
+
+def test_iter_ndjson():
+    text = "\n".join(json.dumps(r) for r in records) + "\n\n"
+    assert(list(iter_ndjson(io.StringIO(text))) == records)
+
+
+def test_mapped_readers(tmp_path, monkeypatch):
+    # A block and a release of the pages behind the reader per line
+    monkeypatch.setattr(readers, "BLOCK_SIZE", 1)
+    ndjson_file = tmp_path / "records.ndjson"
+    lines = [json.dumps(r, ensure_ascii=False) + "\n" for r in records]
+    ndjson_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    with readers.map_file(str(ndjson_file)) as mm:
+        assert(list(readers.iter_ndjson_mapped(mm)) == records)
+        # The lines starting in the range
+        start = len(lines[0].encode("utf-8")) + 1
+        assert(list(readers.iter_ndjson_mapped(mm, start, start + 1)) ==
+               records[1:2])
+
+    json_file = tmp_path / "records.json"
+    json_file.write_text(json.dumps(records + ["\u00e9\u65e5"],
+                                    ensure_ascii=False), encoding="utf-8")
+    with readers.map_file(str(json_file)) as mm:
+        assert(readers.first_byte(mm) == b"[")
+        reader = readers.MappedTextReader(mm)
+        assert(list(iter_json_array(reader, chunk_size=1)) ==
+               records + ["\u00e9\u65e5"])
+
+    empty_file = tmp_path / "empty.ndjson"
+    empty_file.write_text("")
+    with readers.map_file(str(empty_file)) as mm:
+        assert(readers.first_byte(mm) == b"")
+        assert(list(readers.iter_ndjson_mapped(mm)) == [])
+
+
+def test_infer_from_files(tmp_path):
+    expected = getschema.infer_schema(records[1:])
+
+    json_file = tmp_path / "records.json"
+    json_file.write_text(json.dumps(records))
+    assert(getschema.infer_from_file(str(json_file), "json", skip=1) ==
+           expected)
+
+    ndjson_file = tmp_path / "records.ndjson"
+    ndjson_file.write_text("\n".join(json.dumps(r) for r in records))
+    assert(getschema.infer_from_file(str(ndjson_file), "ndjson", skip=1) ==
+           expected)
+
+
+def _pipe(path, data):
+    """Make a named pipe at path that a thread writes data to"""
+    import os, threading
+
+    def write():
+        with open(path, "wb") as f:
+            f.write(data)
+
+    os.mkfifo(path)
+    thread = threading.Thread(target=write, daemon=True)
+    thread.start()
+    return path
+
+
+def test_pipes(tmp_path):
+    import subprocess, sys
+    texts = {
+        "json": json.dumps(records),
+        "ndjson": "\n".join(json.dumps(r) for r in records),
+        "csv": "id,name\n1,a\n2.5,b\n",
+        "yaml": "- id: 1\n  name: a\n",
+    }
+    for fmt, text in texts.items():
+        plain = tmp_path / ("records." + fmt)
+        plain.write_text(text)
+        expected = getschema.infer_from_file(str(plain), fmt)
+        for options in ({}, {"workers": 2},
+                        {"cache_dir": str(tmp_path / "cache")}):
+            pipe = _pipe(str(tmp_path / "pipe"), text.encode("utf-8"))
+            assert(getschema.infer_from_file(pipe, fmt, **options) ==
+                   expected)
+            (tmp_path / "pipe").unlink()
+
+    # A JSON object rather than an array
+    pipe = _pipe(str(tmp_path / "pipe"), json.dumps(records[0]).encode())
+    assert(getschema.infer_from_file(pipe, "json") ==
+           getschema.infer_schema(records[0]))
+    (tmp_path / "pipe").unlink()
+
+    schema = getschema.infer_schema(records)
+    for fmt in ("json", "ndjson"):
+        pipe = _pipe(str(tmp_path / "pipe"), texts[fmt].encode("utf-8"))
+        out = io.StringIO()
+        assert(getschema.fix_file(pipe, schema, out, fmt) == len(records))
+        assert([json.loads(line) for line in out.getvalue().splitlines()] ==
+               getschema.fix_types(records, schema))
+        (tmp_path / "pipe").unlink()
+
+    out = subprocess.run(
+        [sys.executable, "-c", "import getschema; getschema.main()",
+         "/dev/stdin", "-t", "ndjson"], input=texts["ndjson"], check=True,
+        stdout=subprocess.PIPE, text=True).stdout
+    assert(json.loads(out) == getschema.infer_schema(records))
@@ -0,0 +1,46 @@
+import json
+import getschema
+from getschema import sampling
+
+
+records = [{"id": i, "name": "name %d" % i} for i in range(10000)]
+
+
+def test_head():
+    assert(list(sampling.head(records, 3)) == records[:3])
+
+
+def test_reservoir():
+    sample = sampling.reservoir(records, 100, seed=1)
+    assert(len(sample) == 100)
+    assert(sample == sampling.reservoir(records, 100, seed=1))
+    ids = [r["id"] for r in sample]
+    assert(ids == sorted(ids))
+    # Roughly uniform: not only from the beginning
+    assert(ids[-1] > 5000)
+    assert(sampling.reservoir(records[:5], 100) == records[:5])
+
+
+def test_coverage():
+    data = records[:2000] + [{"id": "abc", "extra": 1.5}] + records[2000:]
+    acc = getschema.SchemaAccumulator().add_many(data, patience=100)
+    assert(acc.count == 101)
+    assert(acc.finalize() == getschema.infer_schema(records[:1]))
+
+    data = records[:50] + [{"id": "abc", "extra": 1.5}] + records[50:]
+    schema = getschema.infer_schema(data, sample="coverage", sample_size=100)
+    assert(schema == getschema.infer_schema(data))
+
+
+def test_infer_from_file(tmp_path):
+    ndjson_file = tmp_path / "records.ndjson"
+    ndjson_file.write_text("\n".join(json.dumps(r) for r in records))
+    schema = getschema.infer_from_file(str(ndjson_file), "ndjson",
+                                       sample="reservoir", sample_size=10)
+    assert(schema == getschema.infer_schema(records))
+    try:
+        getschema.infer_from_file(str(ndjson_file), "ndjson", sample="foo")
+    except ValueError as e:
+        assert(str(e).startswith("Unknown sampling method: foo"))
+    else:
+        raise Exception("Supposed to fail with an unknown sampling method")
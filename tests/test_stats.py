@@ -0,0 +1,85 @@
+import os
+import pstats
+import tempfile
+
+import pytest
+
+import getschema
+from getschema import impl
+
+
+def test_collect_stats_infer():
+    records = [{"a": 1, "b": {"c": "1"}}, {"a": 1.5, "b": {"c": "x"}},
+               {"a": 2, "d": "2021-06-04T09:00:00"}]
+    with getschema.collect_stats() as stats:
+        getschema.infer_schema(records)
+    d = stats.to_dict()
+    assert(d["records"] == 3)
+    assert(d["calls"]["merge"] == 3)
+    assert(d["widenings"] == {"a": {"integer -> number": 1},
+                              "b.c": {"integer -> string": 1}})
+    assert(d["calls"]["datetime"] > 0)
+
+
+def test_collect_stats_fix():
+    schema = getschema.infer_schema([{"a": 1, "b": [1]}])
+    records = [{"a": "1", "b": ["2"]}, {"a": "x", "b": ["y"]}]
+    with getschema.collect_stats() as stats:
+        getschema.fix_type(records[0], schema)
+        getschema.fix_types(records * 3, schema,
+                            on_invalid_property="null")
+    d = stats.to_dict()
+    assert(d["fixed"] == 7)
+    assert(d["invalid"] == {"a": {"null": 3}, "b[]": {"null": 3}})
+
+
+def test_collect_stats_off():
+    original = impl._is_datetime
+    with getschema.collect_stats():
+        assert(impl._is_datetime is not original)
+        with pytest.raises(ValueError):
+            with getschema.collect_stats():
+                pass
+    assert(impl._is_datetime is original)
+    # Not counted outside of the block
+    with getschema.collect_stats() as stats:
+        pass
+    getschema.infer_schema([{"a": 1}])
+    assert(stats.records == 0)
+
+
+def test_collect_stats_profile():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        profile = os.path.join(tmp_dir, "infer.prof")
+        with getschema.collect_stats(profile):
+            getschema.infer_schema([{"a": 1}])
+        functions = [f[2] for f in pstats.Stats(profile).stats]
+    assert("infer_schema" in functions)
+
+
+def test_stats_jobs(tmp_path, monkeypatch, capsys):
+    # The workers of a process pool are not counted
+    data = str(tmp_path / "data.ndjson")
+    schema = str(tmp_path / "schema.json")
+    with open(data, "w") as f:
+        f.write('{"a": 1}\n')
+    with open(schema, "w") as f:
+        f.write('{"type": "object", "properties": {"a": {"type": "integer"}}}')
+    for main, argv in (
+            (getschema.fix_main, [data, "-S", schema, "-j", "2", "--stats"]),
+            (getschema.evolve_main,
+             [data, "-S", schema, "-t", "ndjson", "-j", "2", "--stats"])):
+        with pytest.raises(SystemExit):
+            main(argv)
+        assert("--stats counts only a single process" in
+               capsys.readouterr().err)
+    monkeypatch.setattr("sys.argv", ["getschema", data, "-t", "ndjson",
+                                     "-j", "0", "--stats"])
+    with pytest.raises(SystemExit):
+        getschema.main()
+    assert("--stats counts only a single process" in capsys.readouterr().err)
+
+    getschema.fix_main([data, "-S", schema, "-j", "1", "--stats"])
+    captured = capsys.readouterr()
+    assert(captured.out == '{"a": 1}\n')
+    assert('"fixed": 1' in captured.err)
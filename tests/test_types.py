@@ -42,3 +42,32 @@ def test_null_records():
     assert(schema["properties"]["nested_field"]["properties"]["number"]["type"] == ["null", "number"])
     assert(schema["properties"]["nested_field"]["properties"]["null_subfield"]["type"] == ["null", "string"])
 
+
+def test_array_items():
+    records = [
+        {
+            "ints_then_floats": [1, 2, 1.5],
+            "ints_then_strings": [1, "a", 2],
+            "objects": [{"a": 1}, {"b": "2021-06-04"}, {"a": 1.5}],
+            "dates": ["2021-06-04", "2021-06-05"],
+        },
+    ]
+    # Only the first item by default
+    schema = getschema.infer_schema(records)
+    props = schema["properties"]
+    assert(props["ints_then_floats"]["items"]["type"] == ["null", "integer"])
+    assert(list(props["objects"]["items"]["properties"].keys()) == ["a"])
+
+    schema = getschema.infer_schema(records, array_items=None)
+    props = schema["properties"]
+    assert(props["ints_then_floats"]["items"]["type"] == ["null", "number"])
+    assert(props["ints_then_strings"]["items"]["type"] == ["null", "string"])
+    objects = props["objects"]["items"]["properties"]
+    assert(objects["a"]["type"] == ["null", "number"])
+    assert(objects["b"]["format"] == "date-time")
+    assert(props["dates"]["items"]["format"] == "date-time")
+
+    schema = getschema.infer_schema(records, array_items=2)
+    props = schema["properties"]
+    assert(props["ints_then_floats"]["items"]["type"] == ["null", "integer"])
+    assert(props["ints_then_strings"]["items"]["type"] == ["null", "string"])